@@ -0,0 +1,32 @@
+"""unique website page url per source
+
+Revision ID: 003
+Revises: 57b17d1a2a1c
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '57b17d1a2a1c'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Concurrent crawls could previously insert the same URL twice; keep the oldest row
+    op.execute(
+        "DELETE FROM website_pages WHERE id NOT IN ("
+        "SELECT MIN(id) FROM website_pages GROUP BY website_source_id, url)"
+    )
+    # Unique so bulk ingest can use INSERT ... ON CONFLICT (website_source_id, url)
+    op.drop_index('idx_website_source_url', table_name='website_pages')
+    op.create_index('idx_website_source_url', 'website_pages', ['website_source_id', 'url'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('idx_website_source_url', table_name='website_pages')
+    op.create_index('idx_website_source_url', 'website_pages', ['website_source_id', 'url'], unique=False)
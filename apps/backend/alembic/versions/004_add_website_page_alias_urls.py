@@ -0,0 +1,24 @@
+"""add alias urls to website pages
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('website_pages', sa.Column('alias_urls', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('website_pages', 'alias_urls')
@@ -0,0 +1,26 @@
+"""add simhash and near duplicate marker to website pages
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('website_pages', sa.Column('simhash', sa.String(), nullable=True))
+    op.add_column('website_pages', sa.Column('near_duplicate_of', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('website_pages', 'near_duplicate_of')
+    op.drop_column('website_pages', 'simhash')
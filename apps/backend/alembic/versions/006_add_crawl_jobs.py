@@ -0,0 +1,52 @@
+"""add crawl jobs
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006'
+down_revision = '005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'crawl_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('website_source_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False, server_default='queued'),
+        sa.Column('request_id', sa.String(), nullable=True),
+        sa.Column('locked_by', sa.String(), nullable=True),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('frontier', sa.JSON(), nullable=True),
+        sa.Column('message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['website_source_id'], ['website_sources.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_crawl_jobs_id'), 'crawl_jobs', ['id'], unique=False)
+    op.create_index(op.f('ix_crawl_jobs_website_source_id'), 'crawl_jobs', ['website_source_id'], unique=False)
+    op.create_index(op.f('ix_crawl_jobs_status'), 'crawl_jobs', ['status'], unique=False)
+    op.create_index(
+        'uq_crawl_jobs_active_source', 'crawl_jobs', ['website_source_id'], unique=True,
+        sqlite_where=sa.text("status IN ('queued', 'running')"),
+        postgresql_where=sa.text("status IN ('queued', 'running')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('uq_crawl_jobs_active_source', table_name='crawl_jobs')
+    op.drop_index(op.f('ix_crawl_jobs_status'), table_name='crawl_jobs')
+    op.drop_index(op.f('ix_crawl_jobs_website_source_id'), table_name='crawl_jobs')
+    op.drop_index(op.f('ix_crawl_jobs_id'), table_name='crawl_jobs')
+    op.drop_table('crawl_jobs')
@@ -0,0 +1,24 @@
+"""add crawl job progress
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('crawl_jobs', sa.Column('progress', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('crawl_jobs', 'progress')
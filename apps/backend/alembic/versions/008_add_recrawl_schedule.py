@@ -0,0 +1,30 @@
+"""add recrawl schedule and conditional get validators
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('website_sources', sa.Column('recrawl_interval_hours', sa.Integer(), nullable=True))
+    op.add_column('crawl_jobs', sa.Column('run_after', sa.DateTime(timezone=True), nullable=True))
+    op.add_column('website_pages', sa.Column('etag', sa.String(), nullable=True))
+    op.add_column('website_pages', sa.Column('last_modified', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('website_pages', 'last_modified')
+    op.drop_column('website_pages', 'etag')
+    op.drop_column('crawl_jobs', 'run_after')
+    op.drop_column('website_sources', 'recrawl_interval_hours')
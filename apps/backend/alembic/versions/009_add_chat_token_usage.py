@@ -0,0 +1,53 @@
+"""add chat token usage
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-19 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '009'
+down_revision = '008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('chat_logs', sa.Column('answer_route', sa.String(), nullable=True))
+    op.add_column('chat_logs', sa.Column('llm_model', sa.String(), nullable=True))
+    op.add_column('chat_logs', sa.Column('prompt_tokens', sa.Integer(), nullable=True))
+    op.add_column('chat_logs', sa.Column('completion_tokens', sa.Integer(), nullable=True))
+    op.add_column('chat_logs', sa.Column('context_tokens_saved', sa.Integer(), nullable=True))
+
+    op.create_table(
+        'chat_usage_daily',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('session_id', sa.String(), nullable=False),
+        sa.Column('requests', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('llm_calls', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('refused', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('direct_answers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('prompt_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('completion_tokens', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('context_tokens_saved', sa.Integer(), nullable=False, server_default='0'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('day', 'session_id', name='uq_chat_usage_daily_day_session')
+    )
+    op.create_index(op.f('ix_chat_usage_daily_id'), 'chat_usage_daily', ['id'], unique=False)
+    op.create_index(op.f('ix_chat_usage_daily_day'), 'chat_usage_daily', ['day'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_chat_usage_daily_day'), table_name='chat_usage_daily')
+    op.drop_index(op.f('ix_chat_usage_daily_id'), table_name='chat_usage_daily')
+    op.drop_table('chat_usage_daily')
+    op.drop_column('chat_logs', 'context_tokens_saved')
+    op.drop_column('chat_logs', 'completion_tokens')
+    op.drop_column('chat_logs', 'prompt_tokens')
+    op.drop_column('chat_logs', 'llm_model')
+    op.drop_column('chat_logs', 'answer_route')
@@ -13,6 +13,7 @@ class Settings(BaseSettings):
     
     # OpenAI
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: Optional[str] = None  # OpenAI-compatible endpoint, e.g. app/testing/openai_stub.py
     
     # Security
     SESSION_SECRET: str = "change-this-secret-key-in-production"
@@ -31,13 +32,47 @@ class Settings(BaseSettings):
     # Website Crawling
     MAX_CRAWL_PAGES: int = 100
     CRAWL_TIMEOUT_SECONDS: int = 10
-    CRAWL_RATE_LIMIT_DELAY: float = 1.0
+    CRAWL_RATE_LIMIT_DELAY: float = 1.0  # Per-host delay unless robots.txt sets a Crawl-delay for the host
+    CRAWL_RESPECT_ROBOTS_TXT: bool = True
+    CRAWL_ROBOTS_TTL_SECONDS: int = 3600
+    CRAWL_MAX_CRAWL_DELAY: float = 30.0  # Cap on robots.txt Crawl-delay
+    CRAWL_MAX_PAGE_BYTES: int = 2 * 1024 * 1024  # Larger pages are skipped mid-download
+    CRAWL_STREAM_CHUNK_SIZE: int = 64 * 1024
+    CRAWL_SITEMAP_WORKERS: int = 4  # Nested sitemaps of a sitemap index fetched in parallel
+    CRAWL_SITEMAP_MAX_BYTES: int = 50 * 1024 * 1024  # Per sitemap, after gunzip (the sitemaps.org limit)
+    HTML_EXTRACTOR_ENGINE: str = "lxml"  # lxml | soup (BeautifulSoup html.parser)
+    INGEST_PARSE_WORKERS: int = 0  # >0 parses pages in a process pool while downloads continue
+    INGEST_MAX_IN_FLIGHT: int = 16  # Max downloaded pages waiting for the parse pool (caps memory)
+    INGEST_BATCH_SIZE: int = 50  # Pages written per upsert batch/commit
+    CRAWL_WORKER_ENABLED: bool = False  # Run the crawl job worker inside the API process (enable in one process only)
+    CRAWL_WORKER_POLL_SECONDS: float = 5.0
+    CRAWL_JOB_HEARTBEAT_SECONDS: int = 15
+    CRAWL_JOB_STALE_SECONDS: int = 120  # Running jobs without a heartbeat this long are resumed
+    CRAWL_JOB_MAX_ATTEMPTS: int = 3  # Stale jobs claimed this many times are failed, not resumed; 0 disables
+    CRAWL_SCHEDULER_ENABLED: bool = False  # Queue periodic recrawls inside the API process (enable in one process only)
+    CRAWL_SCHEDULER_POLL_SECONDS: float = 60.0
+    CRAWL_DEFAULT_RECRAWL_HOURS: int = 24  # Per-source recrawl_interval_hours overrides; 0 disables
+    CRAWL_SCHEDULE_STAGGER_SECONDS: int = 600  # Scheduled starts are spread over this window
+    NEAR_DUPLICATE_MAX_DISTANCE: int = 3  # SimHash bits; near-duplicate pages are skipped by retrieval (0 disables)
     
     # Retrieval
     KB_TOP_K: int = 5
     WEBSITE_TOP_K: int = 3
     MIN_CONFIDENCE_SCORE: float = 0.72  # Strict threshold: only answer if similarity >= 0.72
     MIN_SOURCES: int = 1  # Minimum number of sources required to answer
+    RETRIEVAL_VOCAB_PREFILTER: bool = True  # Refuse queries sharing no token with the corpus before scoring
+    RETRIEVAL_VOCAB_CHECK_SECONDS: float = 30  # How often other processes' corpus changes are looked for
+    
+    # Conversation history
+    SESSION_HISTORY_TURNS: int = 3  # Previous answered turns used for follow-ups; 0 disables
+    SESSION_HISTORY_MAX_SESSIONS: int = 1000  # Sessions kept in memory (LRU); older ones reload from chat_logs
+    SESSION_HISTORY_TTL_SECONDS: int = 1800  # A session idle this long starts a new conversation
+    SESSION_HISTORY_TOKEN_BUDGET: int = 300  # Max tokens of history in the LLM prompt
+    CONTEXT_TOKEN_BUDGET: int = 1500  # Max tokens of retrieved context sent to the LLM
+    CONTEXT_SOURCE_TOKEN_CAP: int = 500  # Max tokens from any single source
+    CONTEXT_MIN_SOURCE_TOKENS: int = 30  # Sources that would get less room than this are dropped
+    CONTEXT_PAGE_SCAN_CHARS: int = 8000  # Page text searched for relevant sentences
+    CONTEXT_TOKENIZER: str = "cl100k_base"  # tiktoken encoding, loaded at startup; empty estimates from byte length
     
     # Rate Limiting
     CHAT_RATE_LIMIT: int = 10
@@ -45,7 +80,30 @@ class Settings(BaseSettings):
     
     # OpenAI Model (optional, with default)
     OPENAI_MODEL: str = "gpt-3.5-turbo"
-    OPENAI_TIMEOUT: int = 30
+    OPENAI_FAST_MODEL: str = ""  # Cheaper model for short contexts; empty disables the fast route
+    LLM_FAST_MODEL_MAX_CONTEXT_TOKENS: int = 400
+    LLM_DIRECT_ANSWER_MIN_SCORE: float = 0  # e.g. 0.97: return the top KB answer verbatim, no LLM call; 0 disables
+    OPENAI_TIMEOUT: int = 30  # Per attempt
+    OPENAI_HEALTH_PROBE_ENABLED: bool = True  # Background connectivity check for /health/components
+    OPENAI_HEALTH_PROBE_INTERVAL_SECONDS: float = 30.0
+    OPENAI_HEALTH_PROBE_TIMEOUT: float = 3.0
+    LLM_HTTP_MAX_CONNECTIONS: int = 0  # 0: match the threadpool that runs LLM calls (plus hedge workers)
+    LLM_HTTP_KEEPALIVE_SECONDS: float = 30.0
+    LLM_HTTP_CONNECT_TIMEOUT: float = 5.0
+    LLM_HTTP2: bool = True  # Used when the h2 package is installed
+    LLM_TOTAL_TIMEOUT_SECONDS: float = 20.0  # Deadline across retries and hedges of one answer
+    LLM_MAX_RETRIES: int = 2  # Retries of transient errors (timeouts, 429, 5xx)
+    LLM_RETRY_BASE_BACKOFF_SECONDS: float = 0.5
+    LLM_RETRY_MAX_BACKOFF_SECONDS: float = 4.0
+    LLM_HEDGE_PERCENTILE: float = 0  # e.g. 95: send a duplicate request once a call outlives p95; 0 disables
+    LLM_HEDGE_MIN_SAMPLES: int = 20  # Successful calls observed before hedging starts
+    LLM_HEDGE_MAX_WORKERS: int = 16
+    LLM_BREAKER_FAILURE_THRESHOLD: int = 5  # Consecutive transient failures that open the circuit
+    LLM_BREAKER_OPEN_SECONDS: float = 30.0  # Fail fast this long before trying the upstream again
+    LLM_PROMPT_PRICE_PER_1K: float = 0.0005  # USD, for cost estimates in /admin/usage
+    LLM_COMPLETION_PRICE_PER_1K: float = 0.0015
+    LLM_ANSWER_CACHE_SIZE: int = 256  # Recent answers served while the circuit is open
+    LLM_ANSWER_CACHE_TTL_SECONDS: int = 3600
     
     # Greeting message (shown on first message in new session)
     GREETING_MESSAGE: str = "سلام! چطور می‌تونم کمکتون کنم؟"
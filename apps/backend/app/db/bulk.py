@@ -0,0 +1,78 @@
+from typing import Any, Dict, List
+from sqlalchemy import inspect, insert, update
+from sqlalchemy.orm import Session
+
+
+def dialect_insert(db: Session, model):
+    """
+    Return an INSERT for model that supports on_conflict_do_update/do_nothing
+    on PostgreSQL and SQLite, or None for other dialects.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as pg_insert
+        return pg_insert(model)
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+        return sqlite_insert(model)
+    return None
+
+
+def upsert_rows(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    index_elements: List[str],
+    update_columns: List[str]
+) -> None:
+    """
+    Insert rows in one statement, updating update_columns when a row with the same
+    index_elements (a unique index) already exists. Dialects without ON CONFLICT
+    support look up the existing rows first and update them by primary key.
+    """
+    if not rows:
+        return
+    stmt = dialect_insert(db, model)
+    if stmt is None:
+        _select_then_upsert(db, model, rows, index_elements, update_columns)
+        return
+    stmt = stmt.values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=index_elements,
+        set_={column: stmt.excluded[column] for column in update_columns}
+    )
+    db.execute(stmt)
+
+
+def _select_then_upsert(
+    db: Session,
+    model,
+    rows: List[Dict[str, Any]],
+    index_elements: List[str],
+    update_columns: List[str]
+) -> None:
+    """upsert_rows without ON CONFLICT: one SELECT of existing keys, then UPDATE and INSERT"""
+    primary_key = [column.key for column in inspect(model).primary_key]
+    key_columns = [getattr(model, name) for name in index_elements]
+    # Last row wins for repeated keys, as with ON CONFLICT DO UPDATE
+    by_key = {tuple(row[name] for name in index_elements): row for row in rows}
+    first_values = {key[0] for key in by_key}
+    existing = {}
+    for record in db.query(*[getattr(model, name) for name in primary_key], *key_columns).filter(
+        key_columns[0].in_(first_values)
+    ):
+        existing[tuple(record[len(primary_key):])] = record[:len(primary_key)]
+
+    updates = []
+    inserts = []
+    for key, row in by_key.items():
+        if key in existing:
+            values = {column: row[column] for column in update_columns if column in row}
+            values.update(zip(primary_key, existing[key]))
+            updates.append(values)
+        else:
+            inserts.append(row)
+    if updates:
+        db.execute(update(model), updates)
+    if inserts:
+        db.execute(insert(model), inserts)
@@ -1,11 +1,12 @@
 from contextlib import asynccontextmanager
+import anyio
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from app.core.config import settings
 from app.core.logging import setup_logging
 from app.middleware.request_id import RequestIDMiddleware
-from app.routers import auth, chat, admin_kb, admin_logs, admin_website, admin_greeting, admin_intent, health
+from app.routers import auth, chat, admin_kb, admin_logs, admin_website, admin_greeting, admin_intent, admin_usage, health
 import logging
 
 setup_logging()
@@ -41,10 +42,46 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Error checking database: {e}")
     
+    # One pooled OpenAI client for the app, sized to the threads that call it
+    from app.services.llm import llm_service
+    max_connections = settings.LLM_HTTP_MAX_CONNECTIONS
+    if not max_connections:
+        max_connections = anyio.to_thread.current_default_thread_limiter().total_tokens
+        if settings.LLM_HEDGE_PERCENTILE:
+            max_connections += settings.LLM_HEDGE_MAX_WORKERS
+    llm_service.open(max_connections=int(max_connections))
+    
+    # Load the tokenizer (tiktoken may download its BPE file) before the first chat request
+    from app.services.context_packer import ContextPackerService
+    logger.info("Context tokenizer ready", extra={"tokenizer": ContextPackerService.tokenizer_name()})
+    
+    from app.services.health_probe import openai_health_probe
+    if settings.OPENAI_HEALTH_PROBE_ENABLED:
+        openai_health_probe.start()
+    
+    crawl_worker = None
+    if settings.CRAWL_WORKER_ENABLED:
+        from app.services.crawl_worker import CrawlWorker
+        crawl_worker = CrawlWorker()
+        crawl_worker.start()
+    
+    crawl_scheduler = None
+    if settings.CRAWL_SCHEDULER_ENABLED:
+        from app.services.crawl_scheduler import CrawlScheduler
+        crawl_scheduler = CrawlScheduler()
+        crawl_scheduler.start()
+    
     yield
     
-    # Shutdown (if needed)
-    # Currently no shutdown logic required
+    # Shutdown
+    if crawl_scheduler:
+        crawl_scheduler.stop(timeout=5)
+    if crawl_worker:
+        # Don't block shutdown on a running crawl; it resumes from its checkpoint
+        crawl_worker.stop(timeout=5)
+    if settings.OPENAI_HEALTH_PROBE_ENABLED:
+        openai_health_probe.stop(timeout=5)
+    llm_service.close()
 
 
 app = FastAPI(
@@ -74,6 +111,7 @@ app.include_router(admin_logs.router, prefix="/admin/logs", tags=["admin-logs"])
 app.include_router(admin_website.router, prefix="/admin/website", tags=["admin-website"])
 app.include_router(admin_greeting.router, prefix="/admin/greeting", tags=["admin-greeting"])
 app.include_router(admin_intent.router, prefix="/admin/intent", tags=["admin-intent"])
+app.include_router(admin_usage.router, prefix="/admin/usage", tags=["admin-usage"])
 app.include_router(health.router, prefix="/health", tags=["health"])
 
 
@@ -1,18 +1,22 @@
 from app.models.admin_user import AdminUser
 from app.models.kb_qa import KBQA
 from app.models.chat_log import ChatLog
+from app.models.chat_usage import ChatUsageDaily
 from app.models.website_source import WebsiteSource
 from app.models.website_page import WebsitePage
 from app.models.greeting import Greeting
 from app.models.intent import Intent
+from app.models.crawl_job import CrawlJob
 
 __all__ = [
     "AdminUser",
     "KBQA",
     "ChatLog",
+    "ChatUsageDaily",
     "WebsiteSource",
     "WebsitePage",
     "Greeting",
-    "Intent"
+    "Intent",
+    "CrawlJob"
 ]
 
@@ -13,5 +13,10 @@ class ChatLog(Base):
     sources_json = Column(JSON, nullable=True)  # {"kb_ids": [1,2], "website_page_ids": [3,4]}
     refused = Column(String, default="false")  # Boolean stored as string for SQLite compatibility
     intent = Column(String, nullable=True)  # Intent name if matched, null otherwise
+    answer_route = Column(String, nullable=True)  # kb_direct, fast_model or default_model; null if not answered
+    llm_model = Column(String, nullable=True)
+    prompt_tokens = Column(Integer, nullable=True)  # From response.usage; null when no LLM call
+    completion_tokens = Column(Integer, nullable=True)
+    context_tokens_saved = Column(Integer, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
 
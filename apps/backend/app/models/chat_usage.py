@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, Date, UniqueConstraint
+from app.db.base import Base
+
+
+class ChatUsageDaily(Base):
+    """Per session and day rollup of chat requests and LLM token use"""
+    __tablename__ = "chat_usage_daily"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, nullable=False, index=True)  # UTC
+    session_id = Column(String, nullable=False)
+    requests = Column(Integer, nullable=False, default=0)
+    llm_calls = Column(Integer, nullable=False, default=0)
+    refused = Column(Integer, nullable=False, default=0)
+    direct_answers = Column(Integer, nullable=False, default=0)  # Answered from KB without an LLM call
+    prompt_tokens = Column(Integer, nullable=False, default=0)
+    completion_tokens = Column(Integer, nullable=False, default=0)
+    context_tokens_saved = Column(Integer, nullable=False, default=0)  # Trimmed by context packing
+    
+    __table_args__ = (
+        UniqueConstraint('day', 'session_id', name='uq_chat_usage_daily_day_session'),
+    )
@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, JSON, text
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db.base import Base
+
+
+class CrawlJob(Base):
+    __tablename__ = "crawl_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    website_source_id = Column(Integer, ForeignKey("website_sources.id"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, done, failed
+    request_id = Column(String, nullable=True)  # Request that enqueued the job (for log correlation)
+    locked_by = Column(String, nullable=True)  # Worker id holding the job while running
+    attempts = Column(Integer, nullable=False, default=0)
+    frontier = Column(JSON, nullable=True)  # URLs not yet processed; null until discovery finished
+    progress = Column(JSON, nullable=True)  # Last persisted CrawlProgress snapshot
+    message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    run_after = Column(DateTime(timezone=True), nullable=True)  # Not claimed before this time (scheduler stagger)
+    
+    website_source = relationship("WebsiteSource", back_populates="crawl_jobs")
+    
+    __table_args__ = (
+        # At most one queued/running job per source
+        Index(
+            'uq_crawl_jobs_active_source', 'website_source_id', unique=True,
+            sqlite_where=text("status IN ('queued', 'running')"),
+            postgresql_where=text("status IN ('queued', 'running')")
+        ),
+    )
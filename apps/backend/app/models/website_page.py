@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.base import Base
@@ -13,11 +13,16 @@ class WebsitePage(Base):
     title = Column(String, nullable=True)
     content_text = Column(Text, nullable=False)
     content_hash = Column(String, nullable=True, index=True)  # For deduplication
+    alias_urls = Column(JSON, nullable=True)  # Other URLs in the source serving identical content
+    simhash = Column(String, nullable=True)  # 64-bit SimHash (hex) for near-duplicate detection
+    near_duplicate_of = Column(String, nullable=True)  # Canonical URL if near-duplicate (excluded from retrieval)
+    etag = Column(String, nullable=True)  # Validators for conditional GET on recrawl
+    last_modified = Column(String, nullable=True)
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     
     website_source = relationship("WebsiteSource", back_populates="pages")
     
     __table_args__ = (
-        Index('idx_website_source_url', 'website_source_id', 'url'),
+        Index('idx_website_source_url', 'website_source_id', 'url', unique=True),
     )
 
@@ -12,7 +12,9 @@ class WebsiteSource(Base):
     enabled = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_crawled_at = Column(DateTime(timezone=True), nullable=True)
-    crawl_status = Column(String, default="idle")  # idle, running, failed, done
+    crawl_status = Column(String, default="idle")  # idle, queued, running, failed, done
+    recrawl_interval_hours = Column(Integer, nullable=True)  # None: CRAWL_DEFAULT_RECRAWL_HOURS, 0: never scheduled
     
     pages = relationship("WebsitePage", back_populates="website_source", cascade="all, delete-orphan")
+    crawl_jobs = relationship("CrawlJob", back_populates="website_source", cascade="all, delete-orphan")
 
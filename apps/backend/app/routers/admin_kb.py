@@ -5,6 +5,7 @@ from app.db.session import get_db
 from app.routers.dependencies import get_current_admin
 from app.models.admin_user import AdminUser
 from app.models.kb_qa import KBQA
+from app.services.retrieval import CorpusVocabulary
 from app.schemas.admin_kb import (
     KBQACreate, KBQAUpdate, KBQAResponse
 )
@@ -35,6 +36,7 @@ async def create_kb_qa(
     )
     db.add(qa)
     db.commit()
+    CorpusVocabulary.invalidate()
     db.refresh(qa)
     return qa
 
@@ -57,6 +59,7 @@ async def update_kb_qa(
         qa.answer = qa_data.answer
     
     db.commit()
+    CorpusVocabulary.invalidate()
     db.refresh(qa)
     return qa
 
@@ -74,5 +77,6 @@ async def delete_kb_qa(
     
     db.delete(qa)
     db.commit()
+    CorpusVocabulary.invalidate()
     return None
 
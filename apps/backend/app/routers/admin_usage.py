@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta, timezone
+from app.db.session import get_db
+from app.routers.dependencies import get_current_admin
+from app.models.admin_user import AdminUser
+from app.schemas.admin_usage import UsageSummaryResponse, SessionUsageResponse
+from app.services.usage import UsageService
+
+router = APIRouter()
+
+
+def _date_range(days: int):
+    end = datetime.now(timezone.utc).date()
+    return end - timedelta(days=days - 1), end
+
+
+@router.get("", response_model=UsageSummaryResponse)
+async def usage_summary(
+    days: int = Query(30, ge=1, le=366),
+    db: Session = Depends(get_db),
+    admin: AdminUser = Depends(get_current_admin)
+):
+    """Token use and estimated cost per day over the last N days"""
+    start, end = _date_range(days)
+    return UsageSummaryResponse(start=start, end=end, **UsageService.summary(db, start, end))
+
+
+@router.get("/sessions", response_model=SessionUsageResponse)
+async def usage_by_session(
+    days: int = Query(7, ge=1, le=366),
+    limit: int = Query(20, ge=1, le=200),
+    db: Session = Depends(get_db),
+    admin: AdminUser = Depends(get_current_admin)
+):
+    """Sessions with the highest token use over the last N days"""
+    start, end = _date_range(days)
+    return SessionUsageResponse(start=start, end=end, sessions=UsageService.top_sessions(db, start, end, limit))
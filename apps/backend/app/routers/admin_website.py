@@ -1,7 +1,6 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request
 from sqlalchemy.orm import Session
 from typing import List
-from app.db.session import SessionLocal
 from app.db.session import get_db
 from app.routers.dependencies import get_current_admin
 from app.models.admin_user import AdminUser
@@ -9,36 +8,17 @@ from app.models.website_source import WebsiteSource
 from app.models.website_page import WebsitePage
 from app.schemas.admin_website import (
     WebsiteSourceCreate, WebsiteSourceUpdate, WebsiteSourceResponse,
-    CrawlStatusResponse
+    CrawlStatusResponse, CrawlProgressResponse
 )
-from app.services.website_ingest import WebsiteIngestService
+from app.services.crawl_queue import CrawlQueueService
+from app.services.crawl_progress import CrawlProgressRegistry
+from app.services.retrieval import CorpusVocabulary
 import logging
 
 router = APIRouter()
-ingest_service = WebsiteIngestService()
 logger = logging.getLogger(__name__)
 
 
-def ingest_website_background(source_id: int, request_id: str = None):
-    """Background task wrapper that creates its own DB session"""
-    db = SessionLocal()
-    try:
-        ingest_service.ingest_website(db, source_id, request_id=request_id)
-    except Exception as e:
-        logger.error(
-            "Error in background website ingestion",
-            extra={
-                "request_id": request_id,
-                "website_source_id": source_id,
-                "error_type": type(e).__name__,
-                "error_message": str(e),
-            },
-            exc_info=True
-        )
-    finally:
-        db.close()
-
-
 @router.get("", response_model=List[WebsiteSourceResponse])
 async def list_website_sources(
     db: Session = Depends(get_db),
@@ -68,7 +48,8 @@ async def create_website_source(
     """Create a new website source"""
     source = WebsiteSource(
         base_url=source_data.base_url,
-        enabled=source_data.enabled
+        enabled=source_data.enabled,
+        recrawl_interval_hours=source_data.recrawl_interval_hours
     )
     db.add(source)
     db.commit()
@@ -81,6 +62,7 @@ async def create_website_source(
         created_at=source.created_at,
         last_crawled_at=source.last_crawled_at,
         crawl_status=source.crawl_status,
+        recrawl_interval_hours=source.recrawl_interval_hours,
         pages_count=0
     )
 
@@ -99,8 +81,12 @@ async def update_website_source(
     
     if source_data.enabled is not None:
         source.enabled = source_data.enabled
+    if "recrawl_interval_hours" in source_data.model_fields_set:
+        # Explicit null resets the source to CRAWL_DEFAULT_RECRAWL_HOURS
+        source.recrawl_interval_hours = source_data.recrawl_interval_hours
     
     db.commit()
+    CorpusVocabulary.invalidate()
     db.refresh(source)
     
     pages_count = db.query(WebsitePage).filter(
@@ -114,6 +100,7 @@ async def update_website_source(
         created_at=source.created_at,
         last_crawled_at=source.last_crawled_at,
         crawl_status=source.crawl_status,
+        recrawl_interval_hours=source.recrawl_interval_hours,
         pages_count=pages_count
     )
 
@@ -131,18 +118,18 @@ async def delete_website_source(
     
     db.delete(source)
     db.commit()
+    CorpusVocabulary.invalidate()
     return None
 
 
 @router.post("/{source_id}/recrawl", response_model=CrawlStatusResponse)
 async def recrawl_website(
     source_id: int,
-    background_tasks: BackgroundTasks,
     http_request: Request,
     db: Session = Depends(get_db),
     admin: AdminUser = Depends(get_current_admin)
 ):
-    """Trigger website re-crawl"""
+    """Queue a website re-crawl (at most one queued/running crawl per source)"""
     request_id = getattr(http_request.state, "request_id", "unknown")
     
     source = db.query(WebsiteSource).filter(WebsiteSource.id == source_id).first()
@@ -158,18 +145,17 @@ async def recrawl_website(
         }
     )
     
-    # Run ingestion in background with request_id
-    # Note: We pass source_id and request_id, but create a new DB session in the background task
-    # to avoid session closure issues
-    background_tasks.add_task(ingest_website_background, source_id, request_id)
+    # Persisted job - picked up by the crawl worker, survives restarts
+    job, created = CrawlQueueService.enqueue(db, source_id, request_id=request_id)
     
     return CrawlStatusResponse(
-        status="running",
+        status=job.status,
         last_crawled_at=source.last_crawled_at,
         pages_count=db.query(WebsitePage).filter(
             WebsitePage.website_source_id == source_id
         ).count(),
-        message="Crawl started in background"
+        message="Crawl queued" if created else "Crawl already in progress",
+        job_id=job.id
     )
 
 
@@ -179,7 +165,12 @@ async def get_crawl_status(
     db: Session = Depends(get_db),
     admin: AdminUser = Depends(get_current_admin)
 ):
-    """Get crawl status for a website source"""
+    """
+    Get crawl status for a website source.
+    
+    Progress comes from the in-memory counters when the crawl runs in this
+    process, otherwise from the snapshot the worker last persisted on the job.
+    """
     source = db.query(WebsiteSource).filter(WebsiteSource.id == source_id).first()
     if not source:
         raise HTTPException(status_code=404, detail="Website source not found")
@@ -188,9 +179,20 @@ async def get_crawl_status(
         WebsitePage.website_source_id == source_id
     ).count()
     
+    job = CrawlQueueService.get_latest_job(db, source_id)
+    progress = None
+    live_progress = CrawlProgressRegistry.get(source_id)
+    if live_progress:
+        progress = CrawlProgressResponse(**live_progress.snapshot(), live=True)
+    elif job and job.progress:
+        progress = CrawlProgressResponse(**job.progress)
+    
     return CrawlStatusResponse(
         status=source.crawl_status,
         last_crawled_at=source.last_crawled_at,
-        pages_count=pages_count
+        pages_count=pages_count,
+        message=job.message if job else None,
+        job_id=job.id if job else None,
+        progress=progress
     )
 
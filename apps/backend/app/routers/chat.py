@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import JSONResponse
 from sqlalchemy.orm import Session
 from app.db.session import get_db
@@ -6,7 +7,9 @@ from app.models.chat_log import ChatLog
 from app.schemas.chat import ChatRequest, ChatResponse, SourceInfo
 from app.services.retrieval import RetrievalService
 from app.services.answer_guard import AnswerGuardService
-from app.services.llm import LLMService
+from app.services.llm import LLMRouteStats, LLMService, llm_service
+from app.services.usage import UsageService
+from app.services.session_history import SessionHistoryStore, session_history
 from app.services.intent_matcher import IntentMatcherService
 from app.services.greeting_detector import GreetingDetectorService
 from app.core.config import settings
@@ -19,7 +22,6 @@ logger = logging.getLogger(__name__)
 GENERIC_ERROR_MESSAGE = "متأسفانه خطایی رخ داد. لطفا دوباره تلاش کنید."
 
 router = APIRouter()
-llm_service = LLMService()
 
 
 @router.get("/greeting")
@@ -75,6 +77,7 @@ async def chat(
                 intent=intent_name
             )
             db.add(chat_log)
+            UsageService.record(db, session_id)
             db.commit()
             
             return ChatResponse(
@@ -86,9 +89,22 @@ async def chat(
                 debug={"is_greeting": True} if settings.ENV == "development" else None
             )
         
+        # Earlier answered turns of this session (empty for new sessions)
+        history = session_history.get(db, request.session_id)
+        
         # STRICT: Bot only answers from KB or website sources, never from intents
         # Retrieve relevant sources
         retrieval_result = RetrievalService.retrieve_all(db, request.message)
+        retrieval_query = request.message
+        
+        # Follow-ups ("and the price?") rarely match on their own: retry with
+        # the previous question prepended, keeping the result only if it passes
+        if history and AnswerGuardService.should_refuse(retrieval_result):
+            expanded_query = SessionHistoryStore.expand_query(request.message, history)
+            expanded_result = RetrievalService.retrieve_all(db, expanded_query)
+            if not AnswerGuardService.should_refuse(expanded_result):
+                retrieval_result, retrieval_query = expanded_result, expanded_query
+        query_expanded = retrieval_query != request.message
         
         # Collect retrieval hits for metering
         retrieval_hits = {
@@ -136,6 +152,7 @@ async def chat(
                 intent=intent_name
             )
             db.add(chat_log)
+            UsageService.record(db, session_id, refused=True)
             db.commit()
             
             # Build debug info (only in development)
@@ -164,7 +181,8 @@ async def chat(
             )
         
         # Build context from retrieved sources
-        context = AnswerGuardService.build_context(retrieval_result)
+        context_stats = {}
+        context = AnswerGuardService.build_context(retrieval_result, query=retrieval_query, stats=context_stats)
         
         # Build source info list with scores and snippets
         sources = []
@@ -189,20 +207,35 @@ async def chat(
                 score=round(score, 3)
             ))
         
-        # Generate answer using LLM
-        openai_called = True
+        # Generate answer (stored KB answer, fast model or default model)
         logger.info(
-            "Calling OpenAI for answer generation",
+            "Generating answer",
             extra={
                 "session_id": session_id,
                 "query_preview": request.message[:100],
                 "kb_results": retrieval_hits['kb'],
                 "website_results": retrieval_hits['website'],
-                "openai_called": openai_called,
+                "context_tokens": context_stats.get("context_tokens"),
+                "context_tokens_saved": context_stats.get("tokens_saved"),
+                "context_sources_dropped": context_stats.get("sources_dropped"),
+                "history_turns": len(history),
+                "query_expanded": query_expanded,
             }
         )
         
-        answer = llm_service.generate_answer(request.message, context, sources, request_id=request_id)
+        # Off the event loop: retries and backoff can take several seconds
+        routed = await run_in_threadpool(
+            llm_service.generate_routed_answer,
+            request.message,
+            context,
+            sources,
+            retrieval_result,
+            context_tokens=context_stats.get("context_tokens"),
+            request_id=request_id,
+            history=SessionHistoryStore.for_prompt(history)
+        )
+        answer = routed["answer"]
+        openai_called = routed["llm_called"]
         
         # Build sources JSON for logging (include all source info)
         sources_json = {
@@ -226,6 +259,11 @@ async def chat(
             extra={
                 "session_id": session_id,
                 "llm_called": openai_called,
+                "route": routed["route"],
+                "model": routed["model"],
+                "answer_latency_ms": routed["latency_ms"],
+                "prompt_tokens": routed["prompt_tokens"],
+                "completion_tokens": routed["completion_tokens"],
                 "retrieval_hits": retrieval_hits,
                 "answer_length": len(answer),
                 "sources_count": len(sources),
@@ -239,17 +277,38 @@ async def chat(
             bot_message=answer,
             sources_json=sources_json,
             refused="false",
-            intent=intent_name
+            intent=intent_name,
+            answer_route=routed["route"],
+            llm_model=routed["model"],
+            prompt_tokens=routed["prompt_tokens"],
+            completion_tokens=routed["completion_tokens"],
+            context_tokens_saved=context_stats.get("tokens_saved")
         )
         db.add(chat_log)
+        UsageService.record(
+            db,
+            session_id,
+            llm_called=openai_called,
+            direct_answer=routed["route"] == LLMService.ROUTE_KB_DIRECT,
+            prompt_tokens=routed["prompt_tokens"],
+            completion_tokens=routed["completion_tokens"],
+            context_tokens_saved=context_stats.get("tokens_saved")
+        )
         db.commit()
+        if routed["answered"]:
+            session_history.append(session_id, request.message, answer)
         
         # Build debug info (only in development)
         debug_info = None
         if settings.ENV == "development":
             debug_info = {
                 "llm_called": openai_called,
-                "retrieval_hits": retrieval_hits
+                "retrieval_hits": retrieval_hits,
+                "context": context_stats,
+                "history_turns": len(history),
+                "query_expanded": query_expanded,
+                "route": {key: value for key, value in routed.items() if key != "answer"},
+                "route_stats": LLMRouteStats.snapshot()
             }
         
         return ChatResponse(
@@ -4,12 +4,11 @@ from sqlalchemy import text
 from datetime import datetime, timedelta
 from app.db.session import get_db
 from app.schemas.health import HealthResponse, ComponentStatus
-from app.services.llm import LLMService
+from app.services.health_probe import openai_health_probe
 from app.models.website_source import WebsiteSource
 import logging
 
 router = APIRouter()
-llm_service = LLMService()
 logger = logging.getLogger(__name__)
 
 
@@ -20,8 +19,11 @@ async def health():
 
 
 @router.get("/components", response_model=HealthResponse)
-async def health_components(db: Session = Depends(get_db)):
-    """Detailed component health check with real checks"""
+def health_components(db: Session = Depends(get_db)):
+    """
+    Detailed component health check. OpenAI status comes from the cached
+    background probe; sync so the DB checks run in the threadpool.
+    """
     
     # Backend - always ok if we reach here
     backend_status = ComponentStatus(status="ok", message="Backend is running")
@@ -39,15 +41,15 @@ async def health_components(db: Session = Depends(get_db)):
         logger.error(f"Database health check failed: {e}")
         db_status = ComponentStatus(status="error", message=f"Database error: {str(e)}")
     
-    # OpenAI - lightweight ping with short timeout
+    # OpenAI - cached result of the background probe
     openai_status = ComponentStatus(status="ok")
     try:
-        # Use a lightweight ping with short timeout (3 seconds)
-        ok, msg = llm_service.test_connection(timeout=3)
-        if not ok:
-            openai_status = ComponentStatus(status="error", message=msg)
+        probe = openai_health_probe.get_status()
+        checked = f"checked {probe['age_seconds']:.0f}s ago"
+        if not probe["ok"]:
+            openai_status = ComponentStatus(status="error", message=f"{probe['message']} ({checked})")
         else:
-            openai_status = ComponentStatus(status="ok", message="OpenAI API accessible")
+            openai_status = ComponentStatus(status="ok", message=f"OpenAI API accessible ({checked})")
     except Exception as e:
         logger.error(f"OpenAI health check failed: {e}")
         openai_status = ComponentStatus(status="error", message=f"OpenAI error: {str(e)}")
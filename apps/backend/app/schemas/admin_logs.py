@@ -11,6 +11,11 @@ class ChatLogResponse(BaseModel):
     sources_json: Optional[Dict[str, Any]] = None
     refused: bool
     intent: Optional[str] = None
+    answer_route: Optional[str] = None
+    llm_model: Optional[str] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    context_tokens_saved: Optional[int] = None
     created_at: datetime
     
     model_config = ConfigDict(from_attributes=True)
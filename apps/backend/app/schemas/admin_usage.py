@@ -0,0 +1,37 @@
+from pydantic import BaseModel
+from typing import List
+from datetime import date
+
+
+class UsageTotals(BaseModel):
+    requests: int
+    llm_calls: int
+    refused: int
+    direct_answers: int  # Answered from KB without an LLM call
+    prompt_tokens: int
+    completion_tokens: int
+    total_tokens: int
+    avg_prompt_tokens: float  # Per LLM call
+    context_tokens_saved: int  # Trimmed by context packing
+    estimated_cost_usd: float
+
+
+class DailyUsage(UsageTotals):
+    day: date
+
+
+class SessionUsage(UsageTotals):
+    session_id: str
+
+
+class UsageSummaryResponse(BaseModel):
+    start: date
+    end: date
+    totals: UsageTotals
+    days: List[DailyUsage]
+
+
+class SessionUsageResponse(BaseModel):
+    start: date
+    end: date
+    sessions: List[SessionUsage]
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from typing import List, Optional
 from datetime import datetime
 
@@ -6,10 +6,12 @@ from datetime import datetime
 class WebsiteSourceCreate(BaseModel):
     base_url: str
     enabled: bool = True
+    recrawl_interval_hours: Optional[int] = Field(default=None, ge=0)
 
 
 class WebsiteSourceUpdate(BaseModel):
     enabled: Optional[bool] = None
+    recrawl_interval_hours: Optional[int] = Field(default=None, ge=0)
 
 
 class WebsiteSourceResponse(BaseModel):
@@ -21,6 +23,7 @@ class WebsiteSourceResponse(BaseModel):
     created_at: datetime
     last_crawled_at: Optional[datetime]
     crawl_status: str
+    recrawl_interval_hours: Optional[int] = None
     pages_count: Optional[int] = None
 
 
@@ -34,9 +37,24 @@ class WebsitePageResponse(BaseModel):
     updated_at: datetime
 
 
+class CrawlProgressResponse(BaseModel):
+    phase: str
+    urls_discovered: int = 0
+    pages_fetched: int = 0
+    pages_unchanged: int = 0
+    pages_failed: int = 0
+    bytes_downloaded: int = 0
+    pages_per_sec: Optional[float] = None
+    eta_seconds: Optional[float] = None
+    elapsed_seconds: Optional[float] = None
+    live: bool = False  # False when read from the last persisted snapshot
+
+
 class CrawlStatusResponse(BaseModel):
     status: str
     last_crawled_at: Optional[datetime]
     pages_count: int
     message: Optional[str] = None
+    job_id: Optional[int] = None
+    progress: Optional[CrawlProgressResponse] = None
 
@@ -1,4 +1,5 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
+from app.services.context_packer import ContextPackerService
 from app.services.retrieval import RetrievalService
 from app.core.config import settings
 
@@ -38,6 +39,9 @@ class AnswerGuardService:
     @staticmethod
     def get_refusal_reason(retrieval_result: Dict[str, Any]) -> str:
         """Get detailed reason for refusal (for logging)"""
+        if retrieval_result.get("refusal_reason"):
+            return retrieval_result["refusal_reason"]
+        
         if not retrieval_result["has_results"]:
             return "NO_MATCHING_SOURCE"
         
@@ -47,32 +51,20 @@ class AnswerGuardService:
         return "UNKNOWN"
     
     @staticmethod
-    def build_context(retrieval_result: Dict[str, Any]) -> str:
-        """Build context string from retrieved sources"""
-        context_parts = []
-        
-        # Add KB context
-        kb_results = retrieval_result["kb_results"]
-        if kb_results:
-            context_parts.append("=== Knowledge Base ===")
-            for kb_item, score in kb_results:
-                context_parts.append(f"Q: {kb_item.question}")
-                context_parts.append(f"A: {kb_item.answer}")
-                context_parts.append("")
-        
-        # Add website context
-        website_results = retrieval_result["website_results"]
-        if website_results:
-            context_parts.append("=== Website Content ===")
-            for page, score in website_results:
-                context_parts.append(f"Title: {page.title or 'Untitled'}")
-                context_parts.append(f"URL: {page.url}")
-                # Use first 500 chars of content
-                content_preview = page.content_text[:500] + ("..." if len(page.content_text) > 500 else "")
-                context_parts.append(f"Content: {content_preview}")
-                context_parts.append("")
-        
-        return "\n".join(context_parts)
+    def build_context(
+        retrieval_result: Dict[str, Any],
+        query: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """
+        Build context string from retrieved sources, packed into
+        CONTEXT_TOKEN_BUDGET (see ContextPackerService). Packing stats are
+        written into stats when given.
+        """
+        context, packing = ContextPackerService.pack(retrieval_result, query)
+        if stats is not None:
+            stats.update(packing)
+        return context
     
     @staticmethod
     def extract_source_ids(retrieval_result: Dict[str, Any]) -> Dict[str, List[int]]:
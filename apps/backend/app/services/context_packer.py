@@ -0,0 +1,224 @@
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+import math
+import re
+import threading
+from app.core.config import settings
+from app.services.retrieval import RetrievalService
+
+logger = logging.getLogger(__name__)
+
+_encoding = None
+_encoding_name: Optional[str] = None
+_encoding_lock = threading.Lock()
+
+
+class ContextPackerService:
+    """Fit retrieved sources into a token budget: best sources first, most query-relevant sentences within each"""
+
+    KB_HEADER = "=== Knowledge Base ==="
+    WEBSITE_HEADER = "=== Website Content ==="
+    GAP = " ... "
+
+    _SENTENCE_SPLIT_RE = re.compile(r'(?<=[.!?؟۔])\s+|\n+')
+
+    @staticmethod
+    def _get_encoding():
+        """tiktoken encoding named by CONTEXT_TOKENIZER, or None to use the byte-length estimate"""
+        global _encoding, _encoding_name
+        name = settings.CONTEXT_TOKENIZER
+        if _encoding_name == name:
+            return _encoding
+        with _encoding_lock:
+            if _encoding_name != name:
+                encoding = None
+                if name:
+                    try:
+                        import tiktoken
+                        encoding = tiktoken.get_encoding(name)
+                    except Exception as e:
+                        # tiktoken missing, or its BPE file cannot be downloaded
+                        logger.warning(
+                            "Tokenizer unavailable, estimating token counts",
+                            extra={"tokenizer": name, "error": str(e)}
+                        )
+                _encoding = encoding
+                _encoding_name = name
+        return _encoding
+
+    @staticmethod
+    def tokenizer_name() -> str:
+        return settings.CONTEXT_TOKENIZER if ContextPackerService._get_encoding() else "estimate"
+
+    @staticmethod
+    def count_tokens(text: str) -> int:
+        """Token count of text; without tiktoken, UTF-8 bytes / 3 (errs high for both English and Persian)"""
+        if not text:
+            return 0
+        encoding = ContextPackerService._get_encoding()
+        if encoding is not None:
+            return len(encoding.encode(text, disallowed_special=()))
+        return math.ceil(len(text.encode("utf-8")) / 3)
+
+    @staticmethod
+    def truncate(text: str, max_tokens: int) -> str:
+        """Longest prefix of text (cut at a word boundary where possible) within max_tokens"""
+        count = ContextPackerService.count_tokens
+        if count(text) <= max_tokens:
+            return text
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if count(text[:middle]) <= max_tokens:
+                low = middle
+            else:
+                high = middle - 1
+        prefix = text[:low]
+        if " " in prefix:
+            prefix = prefix.rsplit(" ", 1)[0]
+        return prefix
+
+    @staticmethod
+    def split_sentences(text: str) -> List[str]:
+        return [s.strip() for s in ContextPackerService._SENTENCE_SPLIT_RE.split(text) if s and s.strip()]
+
+    @staticmethod
+    def select_sentences(text: str, query_tokens: set, max_tokens: int) -> Tuple[str, bool]:
+        """
+        Return (excerpt, trimmed): the whole text if it fits, otherwise the
+        sentences sharing most words with the query (earlier ones on ties),
+        in their original order with gaps marked
+        """
+        count = ContextPackerService.count_tokens
+        if count(text) <= max_tokens:
+            return text, False
+
+        sentences = ContextPackerService.split_sentences(text)
+
+        def relevance(index: int) -> float:
+            if not query_tokens:
+                return 0.0
+            return len(RetrievalService.tokenize(sentences[index]) & query_tokens) / len(query_tokens)
+
+        ranked = sorted(range(len(sentences)), key=lambda i: (-relevance(i), i))
+        chosen = []
+        used = 0
+        gap_cost = count(ContextPackerService.GAP)
+        for index in ranked:
+            cost = count(sentences[index]) + (gap_cost if chosen else 0)
+            if used + cost <= max_tokens:
+                chosen.append(index)
+                used += cost
+
+        if not chosen:
+            # Not even the best sentence fits: keep its beginning
+            best = sentences[ranked[0]] if sentences else text
+            return ContextPackerService.truncate(best, max_tokens - gap_cost) + ContextPackerService.GAP.rstrip(), True
+
+        chosen.sort()
+        parts = [sentences[chosen[0]]]
+        for previous, index in zip(chosen, chosen[1:]):
+            parts.append((" " if index == previous + 1 else ContextPackerService.GAP) + sentences[index])
+        excerpt = "".join(parts)
+        if chosen[-1] != len(sentences) - 1:
+            excerpt += ContextPackerService.GAP.rstrip()
+        return excerpt, True
+
+    @staticmethod
+    def baseline_context(retrieval_result: Dict[str, Any]) -> str:
+        """
+        Context as built before packing (every KB answer in full, the first
+        500 characters of each page); tokens_saved is measured against it
+        """
+        lines = []
+        kb_results = retrieval_result.get("kb_results", [])
+        if kb_results:
+            lines.append(ContextPackerService.KB_HEADER)
+            for kb_item, _ in kb_results:
+                lines.extend([f"Q: {kb_item.question}", f"A: {kb_item.answer}", ""])
+        website_results = retrieval_result.get("website_results", [])
+        if website_results:
+            lines.append(ContextPackerService.WEBSITE_HEADER)
+            for page, _ in website_results:
+                content = page.content_text or ""
+                preview = content[:500] + ("..." if len(content) > 500 else "")
+                lines.extend([f"Title: {page.title or 'Untitled'}", f"URL: {page.url}", f"Content: {preview}", ""])
+        return "\n".join(lines)
+
+    @staticmethod
+    def pack(
+        retrieval_result: Dict[str, Any],
+        query: Optional[str] = None,
+        budget: Optional[int] = None
+    ) -> Tuple[str, Dict[str, Any]]:
+        """Build the prompt context within budget tokens; returns (context, packing stats)"""
+        if budget is None:
+            budget = settings.CONTEXT_TOKEN_BUDGET
+        count = ContextPackerService.count_tokens
+        query_tokens = RetrievalService.tokenize(query) if query else set()
+
+        candidates = []
+        for kb_item, score in retrieval_result.get("kb_results", []):
+            candidates.append({
+                "type": "kb",
+                "score": score,
+                "header": [f"Q: {kb_item.question}"],
+                "label": "A: ",
+                "body": kb_item.answer or "",
+            })
+        for page, score in retrieval_result.get("website_results", []):
+            candidates.append({
+                "type": "web",
+                "score": score,
+                "header": [f"Title: {page.title or 'Untitled'}", f"URL: {page.url}"],
+                "label": "Content: ",
+                "body": (page.content_text or "")[:settings.CONTEXT_PAGE_SCAN_CHARS],
+            })
+        # Stable sort: KB entries stay ahead of pages with the same score
+        candidates.sort(key=lambda c: c["score"], reverse=True)
+
+        section_cost = {
+            "kb": count(ContextPackerService.KB_HEADER) + 1,
+            "web": count(ContextPackerService.WEBSITE_HEADER) + 1,
+        }
+        remaining = budget
+        included = {"kb": [], "web": []}
+        trimmed = 0
+        dropped = 0
+        for candidate in candidates:
+            # One token per line for the newline joins
+            header_cost = sum(count(line) + 1 for line in candidate["header"]) + count(candidate["label"]) + 2
+            overhead = header_cost + (0 if included[candidate["type"]] else section_cost[candidate["type"]])
+            room = min(remaining - overhead, settings.CONTEXT_SOURCE_TOKEN_CAP)
+            if room < settings.CONTEXT_MIN_SOURCE_TOKENS:
+                dropped += 1
+                continue
+            excerpt, was_trimmed = ContextPackerService.select_sentences(candidate["body"], query_tokens, room)
+            trimmed += was_trimmed
+            included[candidate["type"]].append((candidate, excerpt))
+            remaining -= overhead + count(excerpt)
+
+        lines = []
+        for source_type, header in (("kb", ContextPackerService.KB_HEADER), ("web", ContextPackerService.WEBSITE_HEADER)):
+            if not included[source_type]:
+                continue
+            lines.append(header)
+            for candidate, excerpt in included[source_type]:
+                lines.extend(candidate["header"])
+                lines.append(candidate["label"] + excerpt)
+                lines.append("")
+        context = "\n".join(lines)
+
+        context_tokens = count(context)
+        baseline_tokens = count(ContextPackerService.baseline_context(retrieval_result))
+        stats = {
+            "tokenizer": ContextPackerService.tokenizer_name(),
+            "budget": budget,
+            "context_tokens": context_tokens,
+            "baseline_tokens": baseline_tokens,
+            "tokens_saved": max(0, baseline_tokens - context_tokens),
+            "sources_included": len(included["kb"]) + len(included["web"]),
+            "sources_trimmed": trimmed,
+            "sources_dropped": dropped,
+        }
+        return context, stats
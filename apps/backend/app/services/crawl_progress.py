@@ -0,0 +1,87 @@
+from typing import Dict, Optional
+from collections import Counter
+import threading
+import time
+
+
+class CrawlProgress:
+    """
+    Live counters for one crawl.
+
+    Only the ingesting thread writes; status requests and the job heartbeat read
+    snapshots. Plain int attributes keep updates free of locks and DB writes.
+    """
+
+    def __init__(self, website_source_id: int, fetch_stats: Optional[Counter] = None):
+        self.website_source_id = website_source_id
+        self.phase = "discovering"  # discovering, fetching, finished
+        self.urls_discovered = 0
+        self.pages_fetched = 0
+        self.pages_unchanged = 0
+        self.pages_failed = 0
+        # Shared with the fetcher, which counts bytes as they stream in
+        self.fetch_stats = fetch_stats if fetch_stats is not None else Counter()
+        self.started_at = time.time()
+        self.fetch_started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def start_fetching(self, urls_discovered: int) -> None:
+        self.urls_discovered = urls_discovered
+        self.phase = "fetching"
+        self.fetch_started_at = time.time()
+
+    def finish(self) -> None:
+        self.phase = "finished"
+        self.finished_at = time.time()
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable view of the counters with throughput and ETA"""
+        processed = self.pages_fetched + self.pages_failed
+        end = self.finished_at or time.time()
+        pages_per_sec = None
+        eta_seconds = None
+        if self.fetch_started_at is not None:
+            elapsed = end - self.fetch_started_at
+            if elapsed > 0 and processed:
+                pages_per_sec = round(processed / elapsed, 2)
+            remaining = max(self.urls_discovered - processed, 0)
+            if self.phase == "finished" or not remaining:
+                eta_seconds = 0.0
+            elif pages_per_sec:
+                eta_seconds = round(remaining / pages_per_sec, 1)
+        return {
+            "phase": self.phase,
+            "urls_discovered": self.urls_discovered,
+            "pages_fetched": self.pages_fetched,
+            "pages_unchanged": self.pages_unchanged,
+            "pages_failed": self.pages_failed,
+            "bytes_downloaded": self.fetch_stats["bytes_downloaded"],
+            "pages_per_sec": pages_per_sec,
+            "eta_seconds": eta_seconds,
+            "elapsed_seconds": round(end - self.started_at, 1),
+        }
+
+
+class CrawlProgressRegistry:
+    """Process-wide map of website_source_id -> progress of the crawl running here"""
+
+    _lock = threading.Lock()
+    _active: Dict[int, CrawlProgress] = {}
+
+    @staticmethod
+    def start(website_source_id: int, fetch_stats: Optional[Counter] = None) -> CrawlProgress:
+        progress = CrawlProgress(website_source_id, fetch_stats=fetch_stats)
+        with CrawlProgressRegistry._lock:
+            CrawlProgressRegistry._active[website_source_id] = progress
+        return progress
+
+    @staticmethod
+    def get(website_source_id: int) -> Optional[CrawlProgress]:
+        with CrawlProgressRegistry._lock:
+            return CrawlProgressRegistry._active.get(website_source_id)
+
+    @staticmethod
+    def remove(website_source_id: int, progress: CrawlProgress) -> None:
+        with CrawlProgressRegistry._lock:
+            if CrawlProgressRegistry._active.get(website_source_id) is progress:
+                del CrawlProgressRegistry._active[website_source_id]
@@ -0,0 +1,231 @@
+from typing import List, Optional, Tuple
+from datetime import datetime, timedelta
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models.crawl_job import CrawlJob
+from app.models.website_source import WebsiteSource
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlJobLostError(Exception):
+    """Raised when a worker no longer holds the lock on its crawl job"""
+
+
+class CrawlQueueService:
+    """Persistent crawl job queue backed by the crawl_jobs table"""
+
+    ACTIVE_STATUSES = ("queued", "running")
+
+    @staticmethod
+    def get_active_job(db: Session, website_source_id: int) -> Optional[CrawlJob]:
+        return db.query(CrawlJob).filter(
+            CrawlJob.website_source_id == website_source_id,
+            CrawlJob.status.in_(CrawlQueueService.ACTIVE_STATUSES)
+        ).first()
+
+    @staticmethod
+    def enqueue(
+        db: Session,
+        website_source_id: int,
+        request_id: str = None,
+        run_after: Optional[datetime] = None
+    ) -> Tuple[CrawlJob, bool]:
+        """
+        Queue a crawl for a source unless one is already queued or running.
+
+        Returns (job, created). The partial unique index on active jobs settles
+        races between two admins enqueueing at the same moment. Workers don't
+        claim the job before run_after, if given.
+        """
+        existing = CrawlQueueService.get_active_job(db, website_source_id)
+        if existing:
+            return existing, False
+
+        job = CrawlJob(
+            website_source_id=website_source_id, status="queued", request_id=request_id, run_after=run_after
+        )
+        db.add(job)
+        try:
+            db.flush()
+        except IntegrityError:
+            db.rollback()
+            existing = CrawlQueueService.get_active_job(db, website_source_id)
+            if existing:
+                return existing, False
+            raise
+
+        db.query(WebsiteSource).filter(
+            WebsiteSource.id == website_source_id
+        ).update({"crawl_status": "queued"}, synchronize_session=False)
+        db.commit()
+        db.refresh(job)
+
+        logger.info(
+            "Crawl job queued",
+            extra={
+                "request_id": request_id,
+                "crawl_job_id": job.id,
+                "website_source_id": website_source_id,
+            }
+        )
+        return job, True
+
+    @staticmethod
+    def get_latest_job(db: Session, website_source_id: int) -> Optional[CrawlJob]:
+        return db.query(CrawlJob).filter(
+            CrawlJob.website_source_id == website_source_id
+        ).order_by(CrawlJob.id.desc()).first()
+
+    @staticmethod
+    def claim_next(db: Session, worker_id: str) -> Optional[CrawlJob]:
+        """
+        Claim the oldest queued job for worker_id.
+
+        Claiming is a compare-and-set UPDATE (status still 'queued'), so concurrent
+        workers - threads, processes or hosts - never run the same job twice.
+        """
+        now = datetime.utcnow()
+        candidate_ids = [
+            job_id for (job_id,) in db.query(CrawlJob.id).filter(
+                CrawlJob.status == "queued",
+                or_(CrawlJob.run_after.is_(None), CrawlJob.run_after <= now)
+            ).order_by(CrawlJob.created_at, CrawlJob.id).limit(5)
+        ]
+        for job_id in candidate_ids:
+            result = db.execute(
+                update(CrawlJob).where(
+                    CrawlJob.id == job_id,
+                    CrawlJob.status == "queued"
+                ).values(
+                    status="running",
+                    locked_by=worker_id,
+                    started_at=now,
+                    heartbeat_at=now,
+                    attempts=CrawlJob.attempts + 1
+                )
+            )
+            db.commit()
+            if result.rowcount == 1:
+                return db.query(CrawlJob).filter(CrawlJob.id == job_id).first()
+        return None
+
+    @staticmethod
+    def requeue_stale(db: Session, stale_seconds: int, max_attempts: int = 0) -> int:
+        """
+        Put running jobs whose worker stopped heartbeating back in the queue,
+        and their sources' crawl_status from "running" back to "queued". Jobs
+        already claimed max_attempts times (0: no limit) are failed instead.
+        Returns the number of jobs requeued.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=stale_seconds)
+        stale = db.query(CrawlJob.id, CrawlJob.website_source_id, CrawlJob.attempts).filter(
+            CrawlJob.status == "running",
+            CrawlJob.heartbeat_at < cutoff
+        ).all()
+        if not stale:
+            return 0
+        exhausted = [row for row in stale if max_attempts and row.attempts >= max_attempts]
+        retry = [row for row in stale if row not in exhausted]
+        
+        requeued = 0
+        if retry:
+            result = db.execute(
+                update(CrawlJob).where(
+                    CrawlJob.id.in_([row.id for row in retry]),
+                    CrawlJob.status == "running",
+                    CrawlJob.heartbeat_at < cutoff
+                ).values(status="queued", locked_by=None)
+            )
+            requeued = result.rowcount
+            db.query(WebsiteSource).filter(
+                WebsiteSource.id.in_([row.website_source_id for row in retry]),
+                WebsiteSource.crawl_status == "running"
+            ).update({"crawl_status": "queued"}, synchronize_session=False)
+        failed = 0
+        if exhausted:
+            result = db.execute(
+                update(CrawlJob).where(
+                    CrawlJob.id.in_([row.id for row in exhausted]),
+                    CrawlJob.status == "running",
+                    CrawlJob.heartbeat_at < cutoff
+                ).values(
+                    status="failed",
+                    locked_by=None,
+                    message=f"Abandoned after {max_attempts} attempts",
+                    finished_at=datetime.utcnow(),
+                    frontier=None
+                )
+            )
+            failed = result.rowcount
+            db.query(WebsiteSource).filter(
+                WebsiteSource.id.in_([row.website_source_id for row in exhausted]),
+                WebsiteSource.crawl_status == "running"
+            ).update({"crawl_status": "failed"}, synchronize_session=False)
+        db.commit()
+        if requeued:
+            logger.warning(
+                "Requeued stale crawl jobs",
+                extra={"jobs_count": requeued, "stale_seconds": stale_seconds}
+            )
+        if failed:
+            logger.error(
+                "Failed stale crawl jobs out of attempts",
+                extra={"jobs_count": failed, "max_attempts": max_attempts}
+            )
+        return requeued
+
+    @staticmethod
+    def heartbeat(
+        db: Session,
+        job_id: int,
+        worker_id: str,
+        frontier: Optional[List[str]] = None,
+        progress: Optional[dict] = None
+    ) -> None:
+        """Refresh the job's heartbeat (and checkpoint its frontier/progress if given)"""
+        values = {"heartbeat_at": datetime.utcnow()}
+        if frontier is not None:
+            values["frontier"] = frontier
+        if progress is not None:
+            values["progress"] = progress
+        result = db.execute(
+            update(CrawlJob).where(
+                CrawlJob.id == job_id,
+                CrawlJob.locked_by == worker_id,
+                CrawlJob.status == "running"
+            ).values(**values)
+        )
+        db.commit()
+        if result.rowcount != 1:
+            raise CrawlJobLostError(f"Crawl job {job_id} is no longer held by {worker_id}")
+
+    @staticmethod
+    def finish(
+        db: Session,
+        job_id: int,
+        worker_id: str,
+        status: str,
+        message: str = None,
+        progress: Optional[dict] = None
+    ) -> bool:
+        """Mark a held job done or failed; returns False if the lock was lost"""
+        values = {
+            "status": status,
+            "message": message,
+            "finished_at": datetime.utcnow(),
+            "frontier": None,
+        }
+        if progress is not None:
+            values["progress"] = progress
+        result = db.execute(
+            update(CrawlJob).where(
+                CrawlJob.id == job_id,
+                CrawlJob.locked_by == worker_id,
+                CrawlJob.status == "running"
+            ).values(**values)
+        )
+        db.commit()
+        return result.rowcount == 1
@@ -0,0 +1,141 @@
+"""
+Periodic recrawl scheduler
+
+Queues crawl jobs for enabled website sources whose recrawl interval has
+elapsed. Start times are staggered with CrawlJob.run_after so sources that
+fall due together don't all hit the crawl worker (and their sites) at once.
+With CRAWL_SCHEDULER_ENABLED it runs as a thread inside the API process
+(single-process deployments only); otherwise run it as one dedicated process:
+
+Usage:
+    python -m app.services.crawl_scheduler
+"""
+
+from typing import Callable, List, Optional
+from datetime import datetime, timedelta, timezone
+import threading
+import zlib
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.models.website_source import WebsiteSource
+from app.services.crawl_queue import CrawlQueueService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlScheduler:
+    """Enqueues due recrawls on a fixed poll interval"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal):
+        self.session_factory = session_factory
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @staticmethod
+    def interval_for(source: WebsiteSource) -> Optional[timedelta]:
+        """Recrawl interval for a source, or None if it is not scheduled"""
+        hours = source.recrawl_interval_hours
+        if hours is None:
+            hours = settings.CRAWL_DEFAULT_RECRAWL_HOURS
+        return timedelta(hours=hours) if hours and hours > 0 else None
+
+    @staticmethod
+    def stagger_offset(source_id: int) -> timedelta:
+        """Stable per-source offset within CRAWL_SCHEDULE_STAGGER_SECONDS"""
+        window = settings.CRAWL_SCHEDULE_STAGGER_SECONDS
+        if window <= 0:
+            return timedelta(0)
+        return timedelta(seconds=zlib.crc32(str(source_id).encode()) % window)
+
+    @staticmethod
+    def is_due(source: WebsiteSource, now: datetime) -> bool:
+        interval = CrawlScheduler.interval_for(source)
+        if interval is None:
+            return False
+        last_crawled_at = source.last_crawled_at
+        if last_crawled_at is None:
+            return True
+        if last_crawled_at.tzinfo is not None:
+            last_crawled_at = last_crawled_at.astimezone(timezone.utc).replace(tzinfo=None)
+        return now - last_crawled_at >= interval
+
+    @staticmethod
+    def schedule_due(db: Session, now: datetime = None) -> List[int]:
+        """Queue a staggered crawl job for every due source; returns the job ids created"""
+        now = now or datetime.utcnow()
+        created_ids = []
+        for source in db.query(WebsiteSource).filter(
+            WebsiteSource.enabled.is_(True)
+        ).order_by(WebsiteSource.id).all():
+            # Sources crawled recently (manually or by schedule) are skipped
+            if not CrawlScheduler.is_due(source, now):
+                continue
+            if CrawlQueueService.get_active_job(db, source.id):
+                continue
+            job, created = CrawlQueueService.enqueue(
+                db,
+                source.id,
+                request_id="scheduler",
+                run_after=now + CrawlScheduler.stagger_offset(source.id)
+            )
+            if created:
+                created_ids.append(job.id)
+        if created_ids:
+            logger.info(
+                "Scheduled recrawls queued",
+                extra={
+                    "jobs_count": len(created_ids),
+                    "stagger_seconds": settings.CRAWL_SCHEDULE_STAGGER_SECONDS,
+                }
+            )
+        return created_ids
+
+    def run_once(self) -> List[int]:
+        db = self.session_factory()
+        try:
+            return self.schedule_due(db)
+        finally:
+            db.close()
+
+    def run_forever(self):
+        """Schedule due recrawls until stop() is called"""
+        logger.info("Crawl scheduler started")
+        while not self._stop_event.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error(
+                    "Crawl scheduler loop error",
+                    extra={
+                        "error_type": type(e).__name__,
+                        "error_message": str(e),
+                    },
+                    exc_info=True
+                )
+            self._stop_event.wait(settings.CRAWL_SCHEDULER_POLL_SECONDS)
+        logger.info("Crawl scheduler stopped")
+
+    def start(self):
+        """Run the scheduler loop in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="crawl-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    from app.core.logging import setup_logging
+    setup_logging()
+    scheduler = CrawlScheduler()
+    try:
+        scheduler.run_forever()
+    except KeyboardInterrupt:
+        scheduler.stop()
@@ -0,0 +1,236 @@
+"""
+Crawl job worker
+
+Claims queued crawl jobs, runs them through WebsiteIngestService and checkpoints
+the remaining frontier so a job resumes after a restart. With
+CRAWL_WORKER_ENABLED it runs as a thread inside the API process (single-process
+deployments only); otherwise run it as one dedicated process:
+
+Usage:
+    python -m app.services.crawl_worker
+"""
+
+from typing import Callable, Optional
+import os
+import socket
+import threading
+import uuid
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.crawl_queue import CrawlQueueService, CrawlJobLostError
+from app.services.crawl_progress import CrawlProgressRegistry
+from app.services.website_ingest import WebsiteIngestService
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class CrawlWorker:
+    """Polls the crawl_jobs table and runs one job at a time"""
+
+    def __init__(
+        self,
+        ingest_service: WebsiteIngestService = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        worker_id: str = None
+    ):
+        self.ingest_service = ingest_service or WebsiteIngestService()
+        self.session_factory = session_factory
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> bool:
+        """Requeue stale jobs, then claim and run one job. Returns True if a job ran."""
+        db = self.session_factory()
+        try:
+            CrawlQueueService.requeue_stale(
+                db, settings.CRAWL_JOB_STALE_SECONDS, max_attempts=settings.CRAWL_JOB_MAX_ATTEMPTS
+            )
+            job = CrawlQueueService.claim_next(db, self.worker_id)
+            if not job:
+                return False
+            job_id = job.id
+            source_id = job.website_source_id
+            request_id = job.request_id
+            frontier = job.frontier
+            attempts = job.attempts
+        finally:
+            db.close()
+
+        logger.info(
+            "Crawl job claimed",
+            extra={
+                "request_id": request_id,
+                "crawl_job_id": job_id,
+                "website_source_id": source_id,
+                "worker_id": self.worker_id,
+                "attempt": attempts,
+                "resumed": frontier is not None,
+            }
+        )
+        self._run_job(job_id, source_id, request_id, frontier)
+        return True
+
+    def _run_job(self, job_id: int, source_id: int, request_id: str, frontier):
+        heartbeat_stop = threading.Event()
+        # Set by the heartbeat thread when another worker has taken the job over
+        job_lost = threading.Event()
+        heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop,
+            args=(job_id, source_id, heartbeat_stop, job_lost),
+            name=f"crawl-job-{job_id}-heartbeat",
+            daemon=True
+        )
+        heartbeat_thread.start()
+
+        db = self.session_factory()
+        try:
+            def checkpoint(remaining_urls):
+                CrawlQueueService.heartbeat(
+                    db, job_id, self.worker_id,
+                    frontier=remaining_urls, progress=self._progress_snapshot(source_id)
+                )
+
+            result = self.ingest_service.ingest_website(
+                db, source_id, request_id=request_id, frontier=frontier, checkpoint=checkpoint,
+                cancelled=job_lost
+            )
+            status = "done" if result.get("success") else "failed"
+            if not CrawlQueueService.finish(
+                db, job_id, self.worker_id, status, result.get("message"), progress=result.get("progress")
+            ):
+                logger.warning(
+                    "Crawl job lock lost before it could be marked finished",
+                    extra={
+                        "request_id": request_id,
+                        "crawl_job_id": job_id,
+                        "website_source_id": source_id,
+                        "worker_id": self.worker_id,
+                        "status": status,
+                    }
+                )
+                return
+            logger.info(
+                "Crawl job finished",
+                extra={
+                    "request_id": request_id,
+                    "crawl_job_id": job_id,
+                    "website_source_id": source_id,
+                    "status": status,
+                }
+            )
+        except CrawlJobLostError:
+            logger.warning(
+                "Crawl job lock lost, abandoning",
+                extra={
+                    "request_id": request_id,
+                    "crawl_job_id": job_id,
+                    "worker_id": self.worker_id,
+                }
+            )
+        except Exception as e:
+            logger.error(
+                "Error running crawl job",
+                extra={
+                    "request_id": request_id,
+                    "crawl_job_id": job_id,
+                    "website_source_id": source_id,
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                },
+                exc_info=True
+            )
+            db.rollback()
+            CrawlQueueService.finish(db, job_id, self.worker_id, "failed", str(e))
+        finally:
+            heartbeat_stop.set()
+            heartbeat_thread.join()
+            db.close()
+
+    @staticmethod
+    def _progress_snapshot(source_id: int):
+        progress = CrawlProgressRegistry.get(source_id)
+        return progress.snapshot() if progress else None
+
+    def _heartbeat_loop(
+        self,
+        job_id: int,
+        source_id: int,
+        stop_event: threading.Event,
+        lost_event: threading.Event
+    ):
+        """
+        Keep the job alive during long phases without checkpoints (e.g. link
+        discovery) and persist live progress for status readers in other
+        processes. Sets lost_event if the job is no longer held by this worker.
+        """
+        while not stop_event.wait(settings.CRAWL_JOB_HEARTBEAT_SECONDS):
+            db = self.session_factory()
+            try:
+                CrawlQueueService.heartbeat(
+                    db, job_id, self.worker_id, progress=self._progress_snapshot(source_id)
+                )
+            except CrawlJobLostError:
+                lost_event.set()
+                return
+            except Exception as e:
+                logger.warning(
+                    "Crawl job heartbeat failed",
+                    extra={
+                        "crawl_job_id": job_id,
+                        "error_type": type(e).__name__,
+                        "error_message": str(e),
+                    }
+                )
+            finally:
+                db.close()
+
+    def run_forever(self):
+        """Process jobs until stop() is called"""
+        logger.info("Crawl worker started", extra={"worker_id": self.worker_id})
+        while not self._stop_event.is_set():
+            try:
+                ran = self.run_once()
+            except Exception as e:
+                logger.error(
+                    "Crawl worker loop error",
+                    extra={
+                        "worker_id": self.worker_id,
+                        "error_type": type(e).__name__,
+                        "error_message": str(e),
+                    },
+                    exc_info=True
+                )
+                ran = False
+            if not ran:
+                self._stop_event.wait(settings.CRAWL_WORKER_POLL_SECONDS)
+        logger.info("Crawl worker stopped", extra={"worker_id": self.worker_id})
+
+    def start(self):
+        """Run the worker loop in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="crawl-worker", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        """
+        Ask the worker loop to stop. A crawl in progress is not interrupted; if the
+        process exits first, the job is resumed from its checkpoint once stale.
+        """
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+if __name__ == "__main__":
+    from app.core.logging import setup_logging
+    setup_logging()
+    worker = CrawlWorker()
+    try:
+        worker.run_forever()
+    except KeyboardInterrupt:
+        worker.stop()
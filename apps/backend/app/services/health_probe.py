@@ -0,0 +1,101 @@
+"""
+Background OpenAI health probe
+
+Calls LLMService.test_connection every OPENAI_HEALTH_PROBE_INTERVAL_SECONDS
+in a background thread and caches the outcome, so /health/components can
+answer load-balancer probes without an upstream round trip each time.
+"""
+
+from typing import Any, Dict, Optional
+from datetime import datetime, timezone
+import threading
+import time
+from app.core.config import settings
+from app.services.llm import LLMService, llm_service
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class OpenAIHealthProbe:
+    """Periodic OpenAI connectivity check with a cached result"""
+
+    def __init__(self, service: LLMService):
+        self.service = service
+        self._result: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self._probe_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def probe_once(self) -> Dict[str, Any]:
+        """Run one check and cache it; concurrent callers share a single upstream call"""
+        requested = time.monotonic()
+        with self._probe_lock:
+            with self._lock:
+                if self._result and self._result["checked_monotonic"] >= requested:
+                    return dict(self._result)
+            started = time.monotonic()
+            try:
+                ok, message = self.service.test_connection(timeout=settings.OPENAI_HEALTH_PROBE_TIMEOUT)
+            except Exception as e:
+                ok, message = False, f"OpenAI error: {str(e)}"
+            result = {
+                "ok": ok,
+                "message": message,
+                "checked_at": datetime.now(timezone.utc),
+                "checked_monotonic": time.monotonic(),
+                "latency_ms": round((time.monotonic() - started) * 1000, 1),
+            }
+            with self._lock:
+                previous = self._result
+                self._result = result
+        if previous is None or previous["ok"] != ok:
+            log = logger.info if ok else logger.warning
+            log(
+                "OpenAI health changed",
+                extra={"ok": ok, "probe_message": message, "latency_ms": result["latency_ms"]}
+            )
+        return result
+
+    def cached(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return dict(self._result) if self._result else None
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Cached result with its age in seconds. Probes inline only when there is
+        no result yet or it is older than two intervals (probe thread not running).
+        """
+        result = self.cached()
+        max_age = settings.OPENAI_HEALTH_PROBE_INTERVAL_SECONDS * 2
+        if result is None or time.monotonic() - result["checked_monotonic"] > max_age:
+            result = dict(self.probe_once())
+        result["age_seconds"] = round(time.monotonic() - result.pop("checked_monotonic"), 1)
+        return result
+
+    def run_forever(self):
+        """Probe on a fixed interval until stop() is called"""
+        logger.info(
+            "OpenAI health probe started",
+            extra={"interval_seconds": settings.OPENAI_HEALTH_PROBE_INTERVAL_SECONDS}
+        )
+        while not self._stop_event.is_set():
+            self.probe_once()
+            self._stop_event.wait(settings.OPENAI_HEALTH_PROBE_INTERVAL_SECONDS)
+
+    def start(self):
+        """Run the probe loop in a background thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self.run_forever, name="openai-health-probe", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = None):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+
+openai_health_probe = OpenAIHealthProbe(llm_service)
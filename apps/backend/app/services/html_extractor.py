@@ -0,0 +1,178 @@
+from typing import Iterator, Optional, Tuple
+from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class HTMLExtractorService:
+    """Extract (title, content_text) from raw HTML.
+
+    Two engines are available:
+    - "lxml": libxml2 parser, unwanted tags and ad/analytics classes are skipped
+      in a single traversal without mutating the tree
+    - "soup": the original BeautifulSoup/html.parser implementation, kept as the
+      reference for parity tests and as a fallback
+    """
+
+    # Remove unwanted elements: scripts, styles, navigation, headers, footers, ads, etc.
+    UNWANTED_TAGS = frozenset([
+        'script', 'style', 'nav', 'footer', 'header',
+        'aside', 'iframe', 'noscript', 'meta', 'link',
+        'form', 'button', 'input', 'select', 'textarea'
+    ])
+
+    # Elements with common ad/analytics classes are removed
+    UNWANTED_CLASS_KEYWORDS = ('ad', 'advertisement', 'ads', 'analytics', 'tracking', 'cookie')
+
+    ENGINES = ("lxml", "soup")
+
+    @staticmethod
+    def extract(html: str, engine: str = None) -> Optional[Tuple[str, str]]:
+        """Extract (title, content_text) using the configured engine"""
+        if engine is None:
+            engine = settings.HTML_EXTRACTOR_ENGINE
+        if engine == "soup":
+            return HTMLExtractorService.extract_with_soup(html)
+        if engine != "lxml":
+            logger.warning(
+                "Unknown HTML extractor engine, using lxml",
+                extra={"engine": engine}
+            )
+        return HTMLExtractorService.extract_with_lxml(html)
+
+    @staticmethod
+    def _has_unwanted_class(class_value: Optional[str]) -> bool:
+        if not class_value:
+            return False
+        class_value = class_value.lower()
+        return any(keyword in class_value for keyword in HTMLExtractorService.UNWANTED_CLASS_KEYWORDS)
+
+    @staticmethod
+    def _is_unwanted(element) -> bool:
+        return (
+            element.tag in HTMLExtractorService.UNWANTED_TAGS or
+            HTMLExtractorService._has_unwanted_class(element.get('class'))
+        )
+
+    @staticmethod
+    def _iter_text(element) -> Iterator[str]:
+        """Yield text chunks of element, skipping unwanted subtrees (tails are kept)"""
+        stack = [(element, False)]
+        while stack:
+            node, emit_tail = stack.pop()
+            if emit_tail:
+                if node.tail:
+                    yield node.tail
+                continue
+            if node.text:
+                yield node.text
+            # Push children in reverse so they pop in document order; each child's
+            # tail is emitted after its subtree, whether or not the subtree is skipped
+            for child in reversed(node):
+                stack.append((child, True))
+                if isinstance(child.tag, str) and not HTMLExtractorService._is_unwanted(child):
+                    stack.append((child, False))
+
+    @staticmethod
+    def _parse_lxml(html: str):
+        try:
+            return lxml.html.document_fromstring(html)
+        except ValueError:
+            # Unicode strings with an XML encoding declaration are rejected by lxml
+            return lxml.html.document_fromstring(html.encode('utf-8'))
+
+    @staticmethod
+    def extract_with_lxml(html: str) -> Optional[Tuple[str, str]]:
+        """Extract (title, content_text) with lxml in a single traversal"""
+        if not html or not html.strip():
+            return None
+        try:
+            root = HTMLExtractorService._parse_lxml(html)
+        except (etree.ParserError, etree.XMLSyntaxError):
+            return None
+
+        title_el = main_el = article_el = content_class_el = content_id_el = body_el = None
+
+        # Depth-first walk in document order that never descends into unwanted
+        # subtrees, recording the first candidate of each kind on the way
+        stack = [root]
+        while stack:
+            el = stack.pop()
+            if not isinstance(el.tag, str) or HTMLExtractorService._is_unwanted(el):
+                continue
+            tag = el.tag
+            if tag == 'title':
+                if title_el is None:
+                    title_el = el
+            elif tag == 'main':
+                if main_el is None:
+                    main_el = el
+            elif tag == 'article':
+                if article_el is None:
+                    article_el = el
+            elif tag == 'div':
+                if content_class_el is None and 'content' in (el.get('class') or '').lower():
+                    content_class_el = el
+                if content_id_el is None and 'content' in (el.get('id') or '').lower():
+                    content_id_el = el
+            elif tag == 'body':
+                if body_el is None:
+                    body_el = el
+            stack.extend(reversed(el))
+
+        # Extract title
+        title = ''.join(title_el.itertext()).strip() if title_el is not None else "Untitled"
+
+        # Extract main content - prioritize semantic HTML5 elements
+        main_content = next(
+            (el for el in (main_el, article_el, content_class_el, content_id_el, body_el) if el is not None),
+            root
+        )
+
+        # Chunks are joined and whitespace-normalized, matching get_text(separator=' ', strip=True)
+        content_text = ' '.join(' '.join(HTMLExtractorService._iter_text(main_content)).split())
+
+        return title, content_text
+
+    @staticmethod
+    def extract_with_soup(html: str) -> Optional[Tuple[str, str]]:
+        """Extract (title, content_text) with BeautifulSoup's html.parser"""
+        soup = BeautifulSoup(html, 'html.parser')
+
+        for tag in HTMLExtractorService.UNWANTED_TAGS:
+            for element in soup.find_all(tag):
+                element.decompose()
+
+        for element in soup.find_all(class_=lambda x: x and any(
+            keyword in x.lower() for keyword in HTMLExtractorService.UNWANTED_CLASS_KEYWORDS
+        )):
+            element.decompose()
+
+        # Extract title
+        title_tag = soup.find('title')
+        title = title_tag.get_text().strip() if title_tag else "Untitled"
+
+        # Extract main content - prioritize semantic HTML5 elements
+        main_content = (
+            soup.find('main') or
+            soup.find('article') or
+            soup.find('div', class_=lambda x: x and 'content' in x.lower()) or
+            soup.find('div', id=lambda x: x and 'content' in x.lower()) or
+            soup.find('body')
+        )
+
+        if main_content:
+            # Get text from main content only
+            content_text = main_content.get_text(separator=' ', strip=True)
+        else:
+            # Fallback: get all text but still clean
+            content_text = soup.get_text(separator=' ', strip=True)
+
+        # Clean up whitespace and normalize
+        content_text = ' '.join(content_text.split())
+
+        return title, content_text
@@ -1,99 +1,326 @@
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from openai import OpenAI
 from openai import APITimeoutError, APIError
 from app.core.config import settings
 from app.schemas.chat import SourceInfo
+from app.services.context_packer import ContextPackerService
+from app.services.llm_client import create_http_client, create_openai_client
+from app.services.llm_resilience import AnswerCache, CircuitOpenError, ResilientCaller
+from app.services.retrieval import RetrievalService
+import hashlib
+import httpx
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
+class LLMRouteStats:
+    """Process-wide call count, latency and token totals per answer route"""
+    
+    _routes: Dict[str, Dict[str, float]] = {}
+    _lock = threading.Lock()
+    
+    @classmethod
+    def record(cls, route: str, latency_ms: float, prompt_tokens: Optional[int], completion_tokens: Optional[int]):
+        with cls._lock:
+            totals = cls._routes.setdefault(
+                route, {"calls": 0, "latency_ms": 0.0, "prompt_tokens": 0, "completion_tokens": 0}
+            )
+            totals["calls"] += 1
+            totals["latency_ms"] += latency_ms
+            totals["prompt_tokens"] += prompt_tokens or 0
+            totals["completion_tokens"] += completion_tokens or 0
+    
+    @classmethod
+    def snapshot(cls) -> Dict[str, Dict[str, float]]:
+        with cls._lock:
+            return {
+                route: {
+                    "calls": totals["calls"],
+                    "avg_latency_ms": round(totals["latency_ms"] / totals["calls"], 1),
+                    "prompt_tokens": totals["prompt_tokens"],
+                    "completion_tokens": totals["completion_tokens"],
+                }
+                for route, totals in cls._routes.items()
+            }
+    
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._routes.clear()
+
+
 class LLMService:
     """Service for OpenAI API calls with strict context enforcement"""
     
+    # Static instructions only, so every request shares a byte-identical prefix
+    # that providers can cache. Per-request context goes in CONTEXT_PROMPT.
     SYSTEM_PROMPT = """شما یک ربات چت با محدودیت دامنه هستید. شما باید STRICTLY فقط از اطلاعات موجود در پایگاه دانش و منابع وب‌سایت استفاده کنید.
 
 قوانین STRICT (بدون استثنا):
-1. فقط از اطلاعات ارائه شده در متن زیر استفاده کنید
-2. اگر پاسخ به سوال در متن زیر نیست، باید بگویید: "در منابع موجود نیست"
+1. فقط از اطلاعات ارائه شده در پیام "متن" استفاده کنید
+2. اگر پاسخ به سوال در متن نیست، باید بگویید: "در منابع موجود نیست"
 3. از دانش عمومی استفاده نکنید - حتی اگر می‌دانید پاسخ چیست
 4. فرضیات نسازید - فقط از متن ارائه شده استفاده کنید
 5. توضیحات اضافی یا پیش‌فرض‌ها اضافه نکنید
 6. اگر متن شامل اطلاعات کافی برای پاسخ نیست، صراحتاً بگویید "در منابع موجود نیست"
 7. باید منابع را در پاسخ خود ذکر کنید (مثلاً "طبق پایگاه دانش" یا "بر اساس صفحه وب‌سایت [URL]")
 
-متن:
-{context}
-
-منابع استفاده شده:
-{sources_list}
-
 یادآوری CRITICAL: 
-- اگر نمی‌توانید پاسخ را مستقیماً از متن بالا استخراج کنید، باید بگویید "در منابع موجود نیست"
+- اگر نمی‌توانید پاسخ را مستقیماً از متن استخراج کنید، باید بگویید "در منابع موجود نیست"
 - همیشه منابع را در پاسخ خود ذکر کنید
 - هیچ استثنایی وجود ندارد - فقط از منابع ارائه شده استفاده کنید."""
     
+    CONTEXT_PROMPT = """متن:
+{context}
+
+منابع استفاده شده:
+{sources_list}"""
+    
+    ROUTE_KB_DIRECT = "kb_direct"
+    ROUTE_FAST_MODEL = "fast_model"
+    ROUTE_DEFAULT_MODEL = "default_model"
+    
+    TIMEOUT_MESSAGE = "زمان اتصال به پایان رسید. لطفا دوباره تلاش کنید."
+    ERROR_MESSAGE = "خطایی رخ داده است. لطفا دوباره تلاش کنید."
+    UNAVAILABLE_MESSAGE = "سرویس پاسخ‌گویی موقتاً در دسترس نیست. لطفا چند لحظه دیگر دوباره تلاش کنید."
+    NOT_IN_SOURCES_MESSAGE = "در منابع موجود نیست"
+    
     def __init__(self):
         if not settings.OPENAI_API_KEY:
             logger.warning("OPENAI_API_KEY not set")
-        self.client = OpenAI(
-            api_key=settings.OPENAI_API_KEY,
-            timeout=settings.OPENAI_TIMEOUT
-        )
+        self._client: Optional[OpenAI] = None
+        self._http_client: Optional[httpx.Client] = None
+        self._client_lock = threading.Lock()
+        self.resilience = ResilientCaller()
+        self.answer_cache = AnswerCache(settings.LLM_ANSWER_CACHE_SIZE, settings.LLM_ANSWER_CACHE_TTL_SECONDS)
+    
+    @property
+    def client(self) -> OpenAI:
+        """OpenAI client over the pool from open(), or a default pool if open() was not called"""
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = create_openai_client(self._http_client)
+        return self._client
+    
+    @client.setter
+    def client(self, value):
+        self._client = value
+    
+    @client.deleter
+    def client(self):
+        # Rebuilt on next use (unittest.mock.patch deletes the attribute on exit)
+        self._client = None
+    
+    def open(self, max_connections: Optional[int] = None):
+        """Create the application-scoped pooled client (called from lifespan)"""
+        with self._client_lock:
+            self._http_client = create_http_client(max_connections)
+            self._client = create_openai_client(self._http_client)
+    
+    def close(self):
+        """Close pooled connections and the hedge pool (called on shutdown)"""
+        with self._client_lock:
+            if self._http_client is not None:
+                self._http_client.close()
+            self._http_client = None
+            self._client = None
+        self.resilience.close()
+    
+    @staticmethod
+    def _cache_key(user_message: str, context: str, history: Optional[List[Tuple[str, str]]] = None) -> str:
+        normalized = RetrievalService.normalize_text(user_message)
+        key = hashlib.sha1(f"{normalized}\0{context}".encode("utf-8"))
+        # Follow-up answers depend on the conversation, not just the question
+        for previous_message, previous_answer in history or []:
+            key.update(f"\0{previous_message}\0{previous_answer}".encode("utf-8"))
+        return key.hexdigest()
+    
+    def _degraded_answer(self, cache_key: str, message: str) -> str:
+        """Recent answer to the same question and context if there is one, else message"""
+        cached = self.answer_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Serving cached answer while LLM is unavailable", extra={"cache_key": cache_key[:12]})
+            return cached
+        return message
+    
+    @staticmethod
+    def _usage(response) -> Dict[str, Optional[int]]:
+        """Token counts from response.usage (None where the response has none)"""
+        usage = getattr(response, "usage", None)
+        counts = {}
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            value = getattr(usage, field, None)
+            counts[field] = value if isinstance(value, int) else None
+        # Prompt tokens served from the provider's prompt cache
+        cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+        counts["cached_tokens"] = cached if isinstance(cached, int) else None
+        return counts
+    
+    @classmethod
+    def build_messages(
+        cls,
+        user_message: str,
+        context: str,
+        sources: List[SourceInfo],
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> List[Dict[str, str]]:
+        """
+        Chat messages for one request: the static SYSTEM_PROMPT first, then
+        the retrieved context and source list, earlier turns of the session,
+        then the question. Keeping the variable parts after the static prefix
+        lets provider prompt caching reuse it across requests.
+        """
+        sources_list = []
+        for i, source in enumerate(sources, 1):
+            if source.type == "kb":
+                sources_list.append(f"{i}. پایگاه دانش: {source.title} (ID: {source.id})")
+            elif source.type == "web":
+                sources_list.append(f"{i}. وب‌سایت: {source.title} (URL: {source.url})")
+        
+        sources_text = "\n".join(sources_list) if sources_list else "هیچ منبعی یافت نشد"
+        
+        messages = [
+            {"role": "system", "content": cls.SYSTEM_PROMPT},
+            {"role": "system", "content": cls.CONTEXT_PROMPT.format(context=context, sources_list=sources_text)},
+        ]
+        for previous_message, previous_answer in history or []:
+            messages.append({"role": "user", "content": previous_message})
+            messages.append({"role": "assistant", "content": previous_answer})
+        messages.append({"role": "user", "content": user_message})
+        return messages
+    
+    @staticmethod
+    def choose_route(retrieval_result: Dict[str, Any], context_tokens: int) -> Tuple[str, Optional[str]]:
+        """
+        Pick (route, model) for an answer:
+        - kb_direct: the top source is a KB entry scoring at least
+          LLM_DIRECT_ANSWER_MIN_SCORE; its stored answer is returned as is
+        - fast_model: OPENAI_FAST_MODEL for contexts up to
+          LLM_FAST_MODEL_MAX_CONTEXT_TOKENS
+        - default_model: OPENAI_MODEL
+        """
+        threshold = settings.LLM_DIRECT_ANSWER_MIN_SCORE
+        kb_results = retrieval_result.get("kb_results", [])
+        if threshold and kb_results:
+            kb_item, score = kb_results[0]
+            top_website = max((s for _, s in retrieval_result.get("website_results", [])), default=0.0)
+            if score >= threshold and score >= top_website and kb_item.answer:
+                return LLMService.ROUTE_KB_DIRECT, None
+        
+        if settings.OPENAI_FAST_MODEL and context_tokens <= settings.LLM_FAST_MODEL_MAX_CONTEXT_TOKENS:
+            return LLMService.ROUTE_FAST_MODEL, settings.OPENAI_FAST_MODEL
+        return LLMService.ROUTE_DEFAULT_MODEL, settings.OPENAI_MODEL
+    
+    def generate_routed_answer(
+        self,
+        user_message: str,
+        context: str,
+        sources: List[SourceInfo],
+        retrieval_result: Dict[str, Any],
+        context_tokens: Optional[int] = None,
+        request_id: str = None,
+        history: Optional[List[Tuple[str, str]]] = None
+    ) -> Dict[str, Any]:
+        """
+        Answer via the route picked by choose_route. Returns answer, route,
+        model, llm_called, latency_ms and token usage, and adds them to
+        LLMRouteStats. history is passed on to generate_answer.
+        """
+        if context_tokens is None:
+            context_tokens = ContextPackerService.count_tokens(context)
+        route, model = self.choose_route(retrieval_result, context_tokens)
+        
+        started = time.perf_counter()
+        call_stats = {}
+        if route == self.ROUTE_KB_DIRECT:
+            answer = retrieval_result["kb_results"][0][0].answer.strip()
+        else:
+            answer = self.generate_answer(
+                user_message, context, sources, request_id=request_id, model=model, stats=call_stats,
+                history=history
+            )
+        latency_ms = round((time.perf_counter() - started) * 1000, 1)
+        
+        result = {
+            "answer": answer,
+            "route": route,
+            "model": model,
+            # False when the breaker was open and no request reached the LLM
+            "llm_called": bool(call_stats.get("attempts")),
+            # Grounded answer from the KB or a successful LLM call (not a fallback or error message)
+            "answered": route == self.ROUTE_KB_DIRECT or call_stats.get("answered", False),
+            "latency_ms": latency_ms,
+            "prompt_tokens": call_stats.get("prompt_tokens"),
+            "completion_tokens": call_stats.get("completion_tokens"),
+        }
+        LLMRouteStats.record(route, latency_ms, result["prompt_tokens"], result["completion_tokens"])
+        return result
     
     def generate_answer(
         self,
         user_message: str,
         context: str,
         sources: List[SourceInfo],
-        request_id: str = None
+        request_id: str = None,
+        model: Optional[str] = None,
+        stats: Optional[Dict[str, Any]] = None,
+        history: Optional[List[Tuple[str, str]]] = None
     ) -> str:
-        """Generate answer using OpenAI with strict context enforcement"""
+        """
+        Generate answer using OpenAI with strict context enforcement.
+        model defaults to OPENAI_MODEL; stats, when given, receives the
+        model, token usage and attempt counts of the call, and answered:
+        whether the reply came from a successful call and is not a "not in
+        sources" refusal. history holds earlier (question, answer) turns of
+        the session, oldest first.
+        """
+        model = model or settings.OPENAI_MODEL
+        cache_key = self._cache_key(user_message, context, history)
+        call_stats = stats if stats is not None else {}
+        call_stats["model"] = model
+        call_stats["answered"] = False
         try:
-            # Build sources list for prompt
-            sources_list = []
-            for i, source in enumerate(sources, 1):
-                if source.type == "kb":
-                    sources_list.append(f"{i}. پایگاه دانش: {source.title} (ID: {source.id})")
-                elif source.type == "web":
-                    sources_list.append(f"{i}. وب‌سایت: {source.title} (URL: {source.url})")
-            
-            sources_text = "\n".join(sources_list) if sources_list else "هیچ منبعی یافت نشد"
-            
-            system_prompt = self.SYSTEM_PROMPT.format(
-                context=context,
-                sources_list=sources_text
-            )
+            messages = self.build_messages(user_message, context, sources, history=history)
             
             logger.info(
                 "Calling OpenAI API",
                 extra={
-                    "model": settings.OPENAI_MODEL,
+                    "model": model,
                     "timeout": settings.OPENAI_TIMEOUT,
                     "message_length": len(user_message),
                     "context_length": len(context),
                     "sources_count": len(sources),
+                    "history_turns": len(history or []),
                 }
             )
             
-            response = self.client.chat.completions.create(
-                model=settings.OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_message}
-                ],
-                temperature=0.3,  # Lower temperature for more focused answers
-                max_tokens=500
+            response = self.resilience.call(
+                lambda timeout: self.client.chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    temperature=0.3,  # Lower temperature for more focused answers
+                    max_tokens=500,
+                    timeout=timeout
+                ),
+                stats=call_stats
             )
             
             answer = response.choices[0].message.content.strip()
+            call_stats.update(self._usage(response))
             
             logger.info(
                 "OpenAI API call successful",
                 extra={
-                    "model": settings.OPENAI_MODEL,
+                    "model": model,
                     "answer_length": len(answer),
-                    "tokens_used": getattr(response.usage, "total_tokens", None),
+                    "tokens_used": call_stats.get("total_tokens"),
+                    "cached_tokens": call_stats.get("cached_tokens"),
+                    "attempts": call_stats.get("attempts"),
+                    "hedged": call_stats.get("hedged"),
                 }
             )
             
@@ -117,21 +344,33 @@ class LLMService:
             
             # Post-process: ensure answer doesn't violate rules
             if not self._validate_answer(answer, context):
-                return "در منابع موجود نیست"
+                return self.NOT_IN_SOURCES_MESSAGE
             
+            self.answer_cache.put(cache_key, answer)
+            call_stats["answered"] = self.NOT_IN_SOURCES_MESSAGE not in answer
             return answer
             
+        except CircuitOpenError:
+            logger.warning(
+                "OpenAI API skipped - circuit open",
+                extra={
+                    "model": model,
+                    "breaker_state": self.resilience.breaker.state,
+                }
+            )
+            return self._degraded_answer(cache_key, self.UNAVAILABLE_MESSAGE)
         except APITimeoutError as e:
             logger.error(
                 "OpenAI API timeout",
                 extra={
                     "error_type": "APITimeoutError",
                     "timeout_seconds": settings.OPENAI_TIMEOUT,
-                    "model": settings.OPENAI_MODEL,
+                    "model": model,
                     "error_message": str(e),
+                    "attempts": call_stats.get("attempts"),
                 }
             )
-            return "زمان اتصال به پایان رسید. لطفا دوباره تلاش کنید."
+            return self._degraded_answer(cache_key, self.TIMEOUT_MESSAGE)
         except APIError as e:
             logger.error(
                 "OpenAI API error",
@@ -139,21 +378,22 @@ class LLMService:
                     "error_type": "APIError",
                     "error_code": getattr(e, "code", None),
                     "error_message": str(e),
-                    "model": settings.OPENAI_MODEL,
+                    "model": model,
+                    "attempts": call_stats.get("attempts"),
                 }
             )
-            return "خطایی رخ داده است. لطفا دوباره تلاش کنید."
+            return self._degraded_answer(cache_key, self.ERROR_MESSAGE)
         except Exception as e:
             logger.error(
                 "Unexpected error in LLM service",
                 extra={
                     "error_type": type(e).__name__,
                     "error_message": str(e),
-                    "model": settings.OPENAI_MODEL,
+                    "model": model,
                 },
                 exc_info=True
             )
-            return "خطایی رخ داده است. لطفا دوباره تلاش کنید."
+            return self.ERROR_MESSAGE
     
     def _validate_answer(self, answer: str, context: str) -> bool:
         """
@@ -178,8 +418,6 @@ class LLMService:
         
         # Check if answer contains significant overlap with context
         # Normalize both for comparison
-        from app.services.retrieval import RetrievalService
-        
         context_normalized = RetrievalService.normalize_text(context)
         answer_normalized = RetrievalService.normalize_text(answer)
         
@@ -243,3 +481,6 @@ class LLMService:
             )
             return False, f"Connection error: {str(e)}"
 
+
+# Shared by the chat and health routers; lifespan opens and closes its pooled client
+llm_service = LLMService()
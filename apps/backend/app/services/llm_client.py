@@ -0,0 +1,52 @@
+from typing import Optional
+from openai import OpenAI
+from app.core.config import settings
+import importlib.util
+import httpx
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def http2_available() -> bool:
+    """HTTP/2 needs the optional h2 package (pip install httpx[http2])"""
+    return importlib.util.find_spec("h2") is not None
+
+
+def create_http_client(max_connections: Optional[int] = None) -> httpx.Client:
+    """
+    Pooled HTTP client for OpenAI calls. max_connections should cover the
+    threads that call the LLM concurrently; keep-alive connections are kept
+    for LLM_HTTP_KEEPALIVE_SECONDS so bursts don't pay a new TLS handshake.
+    """
+    if max_connections is None:
+        max_connections = settings.LLM_HTTP_MAX_CONNECTIONS or 20
+    http2 = settings.LLM_HTTP2 and http2_available()
+    logger.info(
+        "Creating LLM HTTP client",
+        extra={
+            "max_connections": max_connections,
+            "keepalive_seconds": settings.LLM_HTTP_KEEPALIVE_SECONDS,
+            "http2": http2,
+        }
+    )
+    return httpx.Client(
+        http2=http2,
+        limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_connections,
+            keepalive_expiry=settings.LLM_HTTP_KEEPALIVE_SECONDS
+        ),
+        timeout=httpx.Timeout(settings.OPENAI_TIMEOUT, connect=settings.LLM_HTTP_CONNECT_TIMEOUT),
+        follow_redirects=True
+    )
+
+
+def create_openai_client(http_client: Optional[httpx.Client] = None) -> OpenAI:
+    return OpenAI(
+        api_key=settings.OPENAI_API_KEY,
+        base_url=settings.OPENAI_BASE_URL,
+        timeout=settings.OPENAI_TIMEOUT,
+        max_retries=0,  # Retries are handled by ResilientCaller under one deadline
+        http_client=http_client
+    )
@@ -0,0 +1,269 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from openai import APIConnectionError, APIStatusError, APITimeoutError
+from app.core.config import settings
+import logging
+import random
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(Exception):
+    """The circuit breaker is open; the upstream was not called"""
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker.
+
+    closed: calls pass; LLM_BREAKER_FAILURE_THRESHOLD transient failures in
+    a row open it. open: calls fail fast for LLM_BREAKER_OPEN_SECONDS.
+    half_open: one trial call is let through; success closes, failure reopens.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int, open_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.open_seconds = open_seconds
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.open_seconds:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("LLM circuit closed", extra={"previous_state": self.state})
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_flight = False
+            if self.state == self.HALF_OPEN or (
+                self.state == self.CLOSED and self.failures >= self.failure_threshold
+            ):
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                logger.warning(
+                    "LLM circuit opened",
+                    extra={"consecutive_failures": self.failures, "open_seconds": self.open_seconds}
+                )
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies"""
+
+    def __init__(self, size: int = 200):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float, min_samples: int) -> Optional[float]:
+        with self._lock:
+            if len(self._samples) < min_samples:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+
+class AnswerCache:
+    """Small LRU of recent successful answers, served only while the upstream is failing"""
+
+    def __init__(self, size: int, ttl_seconds: float):
+        self.size = size
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Any, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, answer = entry
+            if time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return answer
+
+    def put(self, key, answer: str):
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+
+def is_transient(error: Exception) -> bool:
+    """Timeouts, connection failures, 408/409/429 and 5xx are worth retrying"""
+    if isinstance(error, (APITimeoutError, APIConnectionError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    return False
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    value = response.headers.get("retry-after") if response is not None else None
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
+
+class ResilientCaller:
+    """
+    Runs upstream calls with bounded, jittered retries of transient errors,
+    optional hedging once a call outlives the recent latency percentile,
+    and a circuit breaker. All attempts share one LLM_TOTAL_TIMEOUT_SECONDS
+    deadline so a degraded provider cannot hold a worker much longer than that.
+    """
+
+    def __init__(self):
+        self.breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURE_THRESHOLD, settings.LLM_BREAKER_OPEN_SECONDS)
+        self.latency = LatencyTracker()
+        self._hedge_pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+
+    def _pool(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._hedge_pool is None:
+                self._hedge_pool = ThreadPoolExecutor(
+                    max_workers=settings.LLM_HEDGE_MAX_WORKERS, thread_name_prefix="llm-hedge"
+                )
+            return self._hedge_pool
+
+    def close(self):
+        with self._pool_lock:
+            if self._hedge_pool is not None:
+                # Don't wait for hedged requests whose results nobody needs
+                self._hedge_pool.shutdown(wait=False, cancel_futures=True)
+            self._hedge_pool = None
+
+    def _attempt(self, fn: Callable[[float], Any], timeout: float, stats: Dict[str, Any]):
+        """
+        One attempt, run in the caller's thread. If it is still running past
+        the latency percentile, a duplicate request is started in the hedge
+        pool; when the primary then fails, the hedge's result is used.
+        """
+        hedge_after = None
+        if settings.LLM_HEDGE_PERCENTILE:
+            hedge_after = self.latency.percentile(settings.LLM_HEDGE_PERCENTILE, settings.LLM_HEDGE_MIN_SAMPLES)
+        if hedge_after is None or hedge_after >= timeout:
+            return fn(timeout)
+
+        lock = threading.Lock()
+        hedge: Dict[str, Any] = {"future": None, "finished": False}
+        started = time.monotonic()
+
+        def launch():
+            with lock:
+                if hedge["finished"]:
+                    return
+                stats["hedged"] = True
+                hedge["future"] = self._pool().submit(fn, max(0.1, timeout - (time.monotonic() - started)))
+
+        # The hedge clock starts with the primary call itself
+        timer = threading.Timer(hedge_after, launch)
+        timer.daemon = True
+        timer.start()
+        try:
+            return fn(timeout)
+        except Exception as primary_error:
+            with lock:
+                hedge["finished"] = True
+                future = hedge["future"]
+            if future is None:
+                raise
+            try:
+                return future.result(timeout=max(0.1, timeout - (time.monotonic() - started)))
+            except Exception:
+                raise primary_error
+        finally:
+            timer.cancel()
+            with lock:
+                # A hedge still running after a primary success is discarded
+                hedge["finished"] = True
+
+    def call(self, fn: Callable[[float], Any], stats: Optional[Dict[str, Any]] = None):
+        """
+        Call fn(timeout_seconds) until it succeeds, a non-transient error is
+        raised, LLM_MAX_RETRIES retries are used or the deadline passes.
+        Raises CircuitOpenError without calling fn while the breaker is open.
+        stats, when given, receives attempts/hedged/latency.
+        """
+        if stats is None:
+            stats = {}
+        stats.update({"attempts": 0, "hedged": False})
+        if not self.breaker.allow():
+            raise CircuitOpenError("LLM circuit breaker is open")
+
+        deadline = time.monotonic() + settings.LLM_TOTAL_TIMEOUT_SECONDS
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            timeout = max(0.1, min(settings.OPENAI_TIMEOUT, remaining))
+            stats["attempts"] += 1
+            started = time.monotonic()
+            try:
+                result = self._attempt(fn, timeout, stats)
+            except Exception as e:
+                if not is_transient(e):
+                    # A 4xx answer still shows the upstream is reachable
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+                # Full jitter, but never sooner than the server's Retry-After
+                cap = settings.LLM_RETRY_MAX_BACKOFF_SECONDS
+                backoff = random.uniform(0, min(cap, settings.LLM_RETRY_BASE_BACKOFF_SECONDS * (2 ** attempt)))
+                backoff = max(backoff, min(_retry_after(e) or 0, cap))
+                out_of_time = time.monotonic() + backoff >= deadline - 0.1
+                if attempt >= settings.LLM_MAX_RETRIES or out_of_time or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+                logger.warning(
+                    "Retrying LLM call after transient error",
+                    extra={
+                        "error_type": type(e).__name__,
+                        "attempt": stats["attempts"],
+                        "backoff_seconds": round(backoff, 3),
+                    }
+                )
+                time.sleep(backoff)
+                attempt += 1
+                continue
+
+            elapsed = time.monotonic() - started
+            self.latency.record(elapsed)
+            self.breaker.record_success()
+            stats["latency_seconds"] = round(elapsed, 3)
+            return result
@@ -0,0 +1,131 @@
+from typing import Dict, List, Optional, Set, Tuple
+from collections import Counter
+import hashlib
+import re
+
+# Start offset of each digest byte position in the flat byte-count table
+_BYTE_SLOTS = tuple(position * 256 for position in range(8))
+
+
+class SimHashService:
+    """64-bit SimHash signatures over word shingles for near-duplicate detection"""
+
+    BITS = 64
+    SHINGLE_SIZE = 3
+    MIN_TOKENS = 20  # Shorter texts give unstable signatures
+
+    _TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+    @staticmethod
+    def compute(text: str) -> Optional[int]:
+        """Return the SimHash of text, or None if it is too short to be meaningful"""
+        tokens = SimHashService._TOKEN_RE.findall(text.lower())
+        if len(tokens) < SimHashService.MIN_TOKENS:
+            return None
+
+        size = SimHashService.SHINGLE_SIZE
+        shingles = Counter(
+            ' '.join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)
+        )
+
+        # Count shingle weight per (byte position, byte value) rather than per bit:
+        # 8 list increments per shingle instead of 64 bit tests
+        byte_counts = [0] * (8 * 256)
+        total = 0
+        blake2b = hashlib.blake2b
+        for shingle, count in shingles.items():
+            digest = blake2b(shingle.encode(), digest_size=8).digest()
+            for slot in _BYTE_SLOTS:
+                byte_counts[slot + digest[slot >> 8]] += count
+            total += count
+
+        # weight(bit) = (count with bit set) - (count with bit clear)
+        weights = [-total] * SimHashService.BITS
+        for slot, count in enumerate(byte_counts):
+            if not count:
+                continue
+            position, byte = divmod(slot, 256)
+            # digest byte 0 is the most significant byte of the 64-bit value
+            base = (7 - position) * 8
+            for offset in range(8):
+                if byte & (1 << offset):
+                    weights[base + offset] += 2 * count
+
+        simhash = 0
+        for bit, weight in enumerate(weights):
+            if weight > 0:
+                simhash |= 1 << bit
+        return simhash
+
+    @staticmethod
+    def to_hex(simhash: Optional[int]) -> Optional[str]:
+        return f"{simhash:016x}" if simhash is not None else None
+
+    @staticmethod
+    def from_hex(value: Optional[str]) -> Optional[int]:
+        return int(value, 16) if value else None
+
+    @staticmethod
+    def hamming_distance(a: int, b: int) -> int:
+        return bin(a ^ b).count('1')
+
+
+class SimHashIndex:
+    """
+    LSH index over SimHash signatures.
+
+    The 64 bits are split into max_distance + 1 bands; two signatures within
+    max_distance bits must agree exactly on at least one band (pigeonhole), so
+    only keys sharing a band value are compared.
+    """
+
+    def __init__(self, max_distance: int):
+        self.max_distance = max_distance
+        bands = max_distance + 1
+        width, extra = divmod(SimHashService.BITS, bands)
+        self._bands: List[Tuple[int, int]] = []  # (shift, mask)
+        shift = 0
+        for i in range(bands):
+            band_width = width + (1 if i < extra else 0)
+            self._bands.append((shift, (1 << band_width) - 1))
+            shift += band_width
+        self._tables: List[Dict[int, Set[str]]] = [{} for _ in self._bands]
+        self._signatures: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    def add(self, key: str, simhash: int) -> None:
+        self.remove(key)
+        self._signatures[key] = simhash
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            table.setdefault((simhash >> shift) & mask, set()).add(key)
+
+    def remove(self, key: str) -> None:
+        simhash = self._signatures.pop(key, None)
+        if simhash is None:
+            return
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            bucket = table.get((simhash >> shift) & mask)
+            if bucket:
+                bucket.discard(key)
+
+    def matches(self, key: str, simhash: int) -> bool:
+        """True if key is indexed with a signature within max_distance bits of simhash"""
+        indexed = self._signatures.get(key)
+        return indexed is not None and SimHashService.hamming_distance(simhash, indexed) <= self.max_distance
+
+    def find(self, simhash: int, exclude: str = None) -> Optional[str]:
+        """Return the closest indexed key within max_distance bits, if any"""
+        candidates = set()
+        for table, (shift, mask) in zip(self._tables, self._bands):
+            candidates |= table.get((simhash >> shift) & mask, set())
+        candidates.discard(exclude)
+
+        best_key = None
+        best_distance = self.max_distance + 1
+        for key in sorted(candidates):
+            distance = SimHashService.hamming_distance(simhash, self._signatures[key])
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
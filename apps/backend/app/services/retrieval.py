@@ -1,13 +1,18 @@
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, FrozenSet, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy import func, or_
 from app.models.kb_qa import KBQA
 from app.models.website_page import WebsitePage
 from app.models.website_source import WebsiteSource
 from app.core.config import settings
 import re
+import threading
+import time
 import unicodedata
 import difflib
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class RetrievalService:
@@ -197,8 +202,10 @@ class RetrievalService:
             return []
         
         # Get pages from enabled sources
+        # Near-duplicates are collapsed into their canonical page at ingest
         pages = db.query(WebsitePage).filter(
-            WebsitePage.website_source_id.in_(source_ids)
+            WebsitePage.website_source_id.in_(source_ids),
+            WebsitePage.near_duplicate_of.is_(None)
         ).all()
         
         # Score each page
@@ -219,7 +226,20 @@ class RetrievalService:
     
     @staticmethod
     def retrieve_all(db: Session, query: str) -> Dict[str, Any]:
-        """Retrieve from both KB and website sources"""
+        """
+        Retrieve from both KB and website sources. Queries that share no
+        token with the corpus are refused without scoring (refusal_reason
+        NO_VOCAB_OVERLAP, see CorpusVocabulary).
+        """
+        if settings.RETRIEVAL_VOCAB_PREFILTER and not CorpusVocabulary.may_match(db, query):
+            return {
+                "kb_results": [],
+                "website_results": [],
+                "has_results": False,
+                "max_confidence": 0.0,
+                "refusal_reason": CorpusVocabulary.REFUSAL_REASON
+            }
+        
         kb_results = RetrievalService.retrieve_kb(db, query)
         website_results = RetrievalService.retrieve_website(db, query)
         
@@ -240,3 +260,90 @@ class RetrievalService:
             "max_confidence": max_confidence
         }
 
+
+
+class CorpusVocabulary:
+    """
+    Token set of every text retrieval scores, cached per process. A query
+    with no token in it cannot reach MIN_CONFIDENCE_SCORE, so it can be
+    refused with a set lookup instead of scoring every document.
+    
+    KB and website writes in this process call invalidate(); changes made
+    by other processes (e.g. a separate crawl worker) are picked up by a
+    count/max(updated_at) check run at most every RETRIEVAL_VOCAB_CHECK_SECONDS.
+    """
+    
+    REFUSAL_REASON = "NO_VOCAB_OVERLAP"
+    # Highest calculate_score without a shared token: trigram (0.25) +
+    # difflib (0.20) + substring (0.10). Token Jaccard and overlap need one.
+    NO_OVERLAP_MAX_SCORE = 0.55
+    
+    _lock = threading.Lock()
+    _signature: Optional[tuple] = None
+    _checked_at: float = 0.0
+    _tokens: FrozenSet[str] = frozenset()
+    
+    @staticmethod
+    def _pages_query(db: Session):
+        """Pages retrieve_website scores: enabled sources, canonical pages only"""
+        return db.query(WebsitePage).join(
+            WebsiteSource, WebsiteSource.id == WebsitePage.website_source_id
+        ).filter(
+            WebsiteSource.enabled == True,
+            WebsitePage.near_duplicate_of.is_(None)
+        )
+    
+    @staticmethod
+    def signature(db: Session) -> tuple:
+        """Row counts and latest updated_at of the scored KB items and pages"""
+        kb = db.query(func.count(KBQA.id), func.max(KBQA.updated_at)).one()
+        pages = CorpusVocabulary._pages_query(db).with_entities(
+            func.count(WebsitePage.id),
+            func.max(WebsitePage.updated_at)
+        ).one()
+        return tuple(kb) + tuple(pages)
+    
+    @staticmethod
+    def build(db: Session) -> FrozenSet[str]:
+        """Tokens of the same fields (and page prefix) the retrieve_* methods score"""
+        tokens = set()
+        for question, answer in db.query(KBQA.question, KBQA.answer):
+            tokens |= RetrievalService.tokenize(question)
+            tokens |= RetrievalService.tokenize(answer)
+        pages = CorpusVocabulary._pages_query(db).with_entities(WebsitePage.title, WebsitePage.content_text)
+        for title, content_text in pages:
+            tokens |= RetrievalService.tokenize(title or "")
+            tokens |= RetrievalService.tokenize(content_text[:1000])
+        return frozenset(tokens)
+    
+    @classmethod
+    def get(cls, db: Session) -> FrozenSet[str]:
+        """Cached vocabulary; the corpus signature is rechecked every RETRIEVAL_VOCAB_CHECK_SECONDS"""
+        with cls._lock:
+            if cls._signature is not None and time.monotonic() - cls._checked_at < settings.RETRIEVAL_VOCAB_CHECK_SECONDS:
+                return cls._tokens
+        signature = cls.signature(db)
+        with cls._lock:
+            cls._checked_at = time.monotonic()
+            if signature == cls._signature:
+                return cls._tokens
+            tokens = cls.build(db)
+            cls._signature = signature
+            cls._tokens = tokens
+        logger.info("Corpus vocabulary rebuilt", extra={"vocabulary_size": len(tokens)})
+        return tokens
+    
+    @classmethod
+    def may_match(cls, db: Session, query: str) -> bool:
+        """False only when no document can score at or above MIN_CONFIDENCE_SCORE"""
+        if settings.MIN_CONFIDENCE_SCORE <= cls.NO_OVERLAP_MAX_SCORE:
+            return True
+        query_tokens = RetrievalService.tokenize(query)
+        return not query_tokens.isdisjoint(cls.get(db))
+    
+    @classmethod
+    def invalidate(cls):
+        """Rebuild on next use; call after committing KB or website page changes"""
+        with cls._lock:
+            cls._signature = None
+            cls._tokens = frozenset()
@@ -0,0 +1,101 @@
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+import threading
+import time
+import requests
+from app.core.config import settings
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class RobotsCache:
+    """
+    Per-host robots.txt rules and request pacing for the crawler.
+
+    robots.txt is fetched once per host and cached for CRAWL_ROBOTS_TTL_SECONDS.
+    Its Crawl-delay (or Request-rate) sets the minimum interval between requests
+    to that host; hosts without one use CRAWL_RATE_LIMIT_DELAY. Safe to share
+    between threads.
+    """
+
+    def __init__(self, session: requests.Session, user_agent: str):
+        self.session = session
+        self.user_agent = user_agent
+        self._lock = threading.Lock()
+        self._parsers: Dict[str, Tuple[RobotFileParser, float]] = {}  # host -> (parser, expires_at)
+        self._next_request_at: Dict[str, float] = {}  # host -> monotonic time of the next free slot
+
+    @staticmethod
+    def _origin(url: str) -> str:
+        parsed = urlparse(url)
+        return f"{parsed.scheme}://{parsed.netloc}"
+
+    def _fetch(self, origin: str) -> RobotFileParser:
+        """Download and parse robots.txt for one origin"""
+        parser = RobotFileParser(f"{origin}/robots.txt")
+        try:
+            response = self.session.get(f"{origin}/robots.txt", timeout=settings.CRAWL_TIMEOUT_SECONDS)
+            if response.status_code in (401, 403):
+                # Same convention as urllib.robotparser: access-controlled robots.txt disallows all
+                parser.disallow_all = True
+            elif response.status_code >= 400:
+                parser.allow_all = True
+            else:
+                parser.parse(response.text.splitlines())
+        except requests.RequestException as e:
+            # Unreachable robots.txt: crawl, but retry the fetch after the TTL
+            logger.warning(
+                "Could not fetch robots.txt",
+                extra={
+                    "url": f"{origin}/robots.txt",
+                    "error_type": type(e).__name__,
+                    "error_message": str(e),
+                }
+            )
+            parser.allow_all = True
+        return parser
+
+    def get_parser(self, url: str) -> RobotFileParser:
+        origin = self._origin(url)
+        now = time.monotonic()
+        with self._lock:
+            cached = self._parsers.get(origin)
+            if cached and cached[1] > now:
+                return cached[0]
+        # Fetched outside the lock; two threads may race on a cold host, which is harmless
+        parser = self._fetch(origin)
+        with self._lock:
+            self._parsers[origin] = (parser, now + settings.CRAWL_ROBOTS_TTL_SECONDS)
+        return parser
+
+    def can_fetch(self, url: str) -> bool:
+        if not settings.CRAWL_RESPECT_ROBOTS_TXT:
+            return True
+        return self.get_parser(url).can_fetch(self.user_agent, url)
+
+    def crawl_delay(self, url: str) -> float:
+        """Seconds between requests to url's host"""
+        delay: Optional[float] = None
+        if settings.CRAWL_RESPECT_ROBOTS_TXT:
+            parser = self.get_parser(url)
+            delay = parser.crawl_delay(self.user_agent)
+            if delay is None:
+                rate = parser.request_rate(self.user_agent)
+                if rate and rate.requests:
+                    delay = rate.seconds / rate.requests
+        if delay is None:
+            return settings.CRAWL_RATE_LIMIT_DELAY
+        return min(float(delay), settings.CRAWL_MAX_CRAWL_DELAY)
+
+    def wait(self, url: str) -> None:
+        """Block until the next request to url's host is allowed, and reserve that slot"""
+        delay = self.crawl_delay(url)
+        origin = self._origin(url)
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_request_at.get(origin, now))
+            self._next_request_at[origin] = start + delay
+        if start > now:
+            time.sleep(start - now)
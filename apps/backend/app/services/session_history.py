@@ -0,0 +1,138 @@
+"""
+Per-session conversation history
+
+Keeps the last SESSION_HISTORY_TURNS answered turns of recently active
+sessions in an in-memory LRU (at most SESSION_HISTORY_MAX_SESSIONS
+sessions). A session idle for longer than SESSION_HISTORY_TTL_SECONDS
+starts a new conversation. Misses are loaded from chat_logs, so history
+survives restarts and sessions that moved between workers.
+"""
+
+from typing import Dict, List, Optional, Tuple
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+import threading
+import time
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.chat_log import ChatLog
+from app.services.context_packer import ContextPackerService
+from app.services.llm import LLMService
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (user message, bot answer), oldest first
+Turn = Tuple[str, str]
+
+
+class SessionHistoryStore:
+    """Bounded LRU of recent turns per session, backed by chat_logs"""
+
+    def __init__(self):
+        # session_id -> (turns, last activity as time.monotonic())
+        self._sessions: "OrderedDict[str, Tuple[List[Turn], float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(db: Session, session_id: str) -> List[Turn]:
+        """
+        Last answered turns from chat_logs; empty if the latest is older than
+        the TTL. Like the routed "answered" flag, only stored KB answers and
+        LLM replies with recorded usage count, minus "not in sources" replies,
+        so error and degraded messages are never replayed.
+        """
+        rows = db.query(ChatLog.user_message, ChatLog.bot_message, ChatLog.created_at).filter(
+            ChatLog.session_id == session_id,
+            ChatLog.refused == "false",
+            or_(
+                ChatLog.answer_route == LLMService.ROUTE_KB_DIRECT,
+                ChatLog.prompt_tokens.isnot(None)
+            ),
+            ~ChatLog.bot_message.contains(LLMService.NOT_IN_SOURCES_MESSAGE)
+        ).order_by(ChatLog.id.desc()).limit(settings.SESSION_HISTORY_TURNS).all()
+        if not rows:
+            return []
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SESSION_HISTORY_TTL_SECONDS)
+        latest = rows[0].created_at
+        if latest is not None and latest.tzinfo is not None:
+            latest = latest.astimezone(timezone.utc).replace(tzinfo=None)
+        if latest is not None and latest < cutoff:
+            return []
+        return [(row.user_message, row.bot_message) for row in reversed(rows)]
+
+    def _put(self, session_id: str, turns: List[Turn]):
+        with self._lock:
+            self._sessions[session_id] = (turns, time.monotonic())
+            self._sessions.move_to_end(session_id)
+            while len(self._sessions) > settings.SESSION_HISTORY_MAX_SESSIONS:
+                self._sessions.popitem(last=False)
+
+    def get(self, db: Session, session_id: Optional[str]) -> List[Turn]:
+        """Recent turns of session_id, oldest first ([] when disabled or new)"""
+        if not session_id or settings.SESSION_HISTORY_TURNS <= 0:
+            return []
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is not None:
+                turns, last_active = entry
+                if time.monotonic() - last_active <= settings.SESSION_HISTORY_TTL_SECONDS:
+                    self._sessions.move_to_end(session_id)
+                    return list(turns)
+                del self._sessions[session_id]
+        turns = self.load(db, session_id)
+        self._put(session_id, turns)
+        return list(turns)
+
+    def append(self, session_id: str, user_message: str, answer: str):
+        """
+        Add an answered turn to a cached session. Sessions not in memory
+        are left alone; their next get() reads the turn from chat_logs.
+        """
+        if settings.SESSION_HISTORY_TURNS <= 0:
+            return
+        with self._lock:
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                return
+            turns = (entry[0] + [(user_message, answer)])[-settings.SESSION_HISTORY_TURNS:]
+            self._sessions[session_id] = (turns, time.monotonic())
+            self._sessions.move_to_end(session_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "turns": sum(len(turns) for turns, _ in self._sessions.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._sessions.clear()
+
+    @staticmethod
+    def expand_query(query: str, turns: List[Turn]) -> str:
+        """Follow-up query with the previous question prepended, for retrieval"""
+        if not turns:
+            return query
+        return f"{turns[-1][0]} {query}"
+
+    @staticmethod
+    def for_prompt(turns: List[Turn], budget: Optional[int] = None) -> List[Turn]:
+        """Most recent turns that fit in budget tokens (SESSION_HISTORY_TOKEN_BUDGET), oldest first"""
+        if budget is None:
+            budget = settings.SESSION_HISTORY_TOKEN_BUDGET
+        count = ContextPackerService.count_tokens
+        kept = []
+        for user_message, answer in reversed(turns):
+            cost = count(user_message) + count(answer)
+            if cost > budget:
+                break
+            kept.append((user_message, answer))
+            budget -= cost
+        kept.reverse()
+        return kept
+
+
+session_history = SessionHistoryStore()
@@ -0,0 +1,118 @@
+from typing import Any, Dict, List, Optional
+from datetime import date, datetime, timezone
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.db.bulk import dialect_insert
+from app.models.chat_usage import ChatUsageDaily
+
+COUNTER_COLUMNS = (
+    "requests", "llm_calls", "refused", "direct_answers",
+    "prompt_tokens", "completion_tokens", "context_tokens_saved",
+)
+
+
+class UsageService:
+    """Per session/day rollup of chat requests and LLM token use"""
+
+    @staticmethod
+    def record(
+        db: Session,
+        session_id: str,
+        llm_called: bool = False,
+        refused: bool = False,
+        direct_answer: bool = False,
+        prompt_tokens: Optional[int] = None,
+        completion_tokens: Optional[int] = None,
+        context_tokens_saved: Optional[int] = None,
+        day: Optional[date] = None
+    ) -> None:
+        """
+        Add one chat request to the (day, session) rollup row. Runs in the
+        caller's transaction, so it is committed together with the ChatLog.
+        """
+        row = {
+            "day": day or datetime.now(timezone.utc).date(),
+            "session_id": session_id,
+            "requests": 1,
+            "llm_calls": int(llm_called),
+            "refused": int(refused),
+            "direct_answers": int(direct_answer),
+            "prompt_tokens": prompt_tokens or 0,
+            "completion_tokens": completion_tokens or 0,
+            "context_tokens_saved": context_tokens_saved or 0,
+        }
+        stmt = dialect_insert(db, ChatUsageDaily)
+        if stmt is not None:
+            stmt = stmt.values(row)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["day", "session_id"],
+                set_={
+                    column: getattr(ChatUsageDaily, column) + stmt.excluded[column]
+                    for column in COUNTER_COLUMNS
+                }
+            )
+            db.execute(stmt)
+            return
+
+        existing = db.query(ChatUsageDaily).filter(
+            ChatUsageDaily.day == row["day"],
+            ChatUsageDaily.session_id == session_id
+        ).with_for_update().first()
+        if existing is None:
+            db.add(ChatUsageDaily(**row))
+            return
+        for column in COUNTER_COLUMNS:
+            setattr(existing, column, getattr(existing, column) + row[column])
+
+    @staticmethod
+    def estimate_cost(prompt_tokens: int, completion_tokens: int) -> float:
+        """USD estimate at LLM_PROMPT_PRICE_PER_1K / LLM_COMPLETION_PRICE_PER_1K"""
+        return round(
+            prompt_tokens / 1000 * settings.LLM_PROMPT_PRICE_PER_1K
+            + completion_tokens / 1000 * settings.LLM_COMPLETION_PRICE_PER_1K,
+            6
+        )
+
+    @staticmethod
+    def totals(counts) -> Dict[str, Any]:
+        """Counters from a mapping plus derived totals, average prompt size and cost"""
+        totals = {column: int(counts.get(column) or 0) for column in COUNTER_COLUMNS}
+        totals["total_tokens"] = totals["prompt_tokens"] + totals["completion_tokens"]
+        llm_calls = totals["llm_calls"]
+        totals["avg_prompt_tokens"] = round(totals["prompt_tokens"] / llm_calls, 1) if llm_calls else 0.0
+        totals["estimated_cost_usd"] = UsageService.estimate_cost(totals["prompt_tokens"], totals["completion_tokens"])
+        return totals
+
+    @staticmethod
+    def _summed(db: Session, *group_by):
+        return db.query(
+            *group_by,
+            *[func.sum(getattr(ChatUsageDaily, column)).label(column) for column in COUNTER_COLUMNS]
+        )
+
+    @staticmethod
+    def daily(db: Session, start: date, end: date) -> List[Dict[str, Any]]:
+        """Totals per day between start and end (inclusive), oldest first"""
+        rows = UsageService._summed(db, ChatUsageDaily.day).filter(
+            ChatUsageDaily.day >= start,
+            ChatUsageDaily.day <= end
+        ).group_by(ChatUsageDaily.day).order_by(ChatUsageDaily.day).all()
+        return [{"day": row.day, **UsageService.totals(row._mapping)} for row in rows]
+
+    @staticmethod
+    def summary(db: Session, start: date, end: date) -> Dict[str, Any]:
+        """Per-day totals and their sum between start and end (inclusive)"""
+        days = UsageService.daily(db, start, end)
+        summed = {column: sum(day[column] for day in days) for column in COUNTER_COLUMNS}
+        return {"totals": UsageService.totals(summed), "days": days}
+
+    @staticmethod
+    def top_sessions(db: Session, start: date, end: date, limit: int = 20) -> List[Dict[str, Any]]:
+        """Sessions with the most LLM tokens between start and end (inclusive)"""
+        total_tokens = func.sum(ChatUsageDaily.prompt_tokens + ChatUsageDaily.completion_tokens)
+        rows = UsageService._summed(db, ChatUsageDaily.session_id).filter(
+            ChatUsageDaily.day >= start,
+            ChatUsageDaily.day <= end
+        ).group_by(ChatUsageDaily.session_id).order_by(total_tokens.desc()).limit(limit).all()
+        return [{"session_id": row.session_id, **UsageService.totals(row._mapping)} for row in rows]
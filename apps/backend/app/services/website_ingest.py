@@ -1,9 +1,19 @@
-from typing import List
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import bindparam, update
 from sqlalchemy.orm import Session
 from datetime import datetime
+import multiprocessing
+import threading
 from app.models.website_source import WebsiteSource
 from app.models.website_page import WebsitePage
-from app.services.website_fetcher import WebsiteFetcherService
+from app.db.bulk import upsert_rows
+from app.services.website_fetcher import NOT_MODIFIED, WebsiteFetcherService
+from app.services.near_duplicate import SimHashIndex, SimHashService
+from app.services.crawl_queue import CrawlJobLostError
+from app.services.crawl_progress import CrawlProgressRegistry
+from app.services.retrieval import CorpusVocabulary
 from app.core.config import settings
 import logging
 
@@ -16,8 +26,187 @@ class WebsiteIngestService:
     def __init__(self):
         self.fetcher = WebsiteFetcherService()
     
-    def ingest_website(self, db: Session, website_source_id: int, request_id: str = None) -> dict:
-        """Ingest all pages from a website source"""
+    def _iter_fetched_pages(
+        self,
+        urls: List[str],
+        request_id: str = None,
+        stats: Optional[Counter] = None,
+        validators: Optional[Dict[str, dict]] = None
+    ) -> Iterator[Tuple[str, Optional[Tuple[str, str, str, Optional[str]]]]]:
+        """
+        Yield (url, fetch_page result) for each URL, in order.
+        
+        validators maps url -> conditional GET validators (see download_page).
+        
+        With INGEST_PARSE_WORKERS > 0, downloads stay in this thread while extraction
+        and hashing run in a process pool, so parsing doesn't hold the GIL against
+        chat requests. At most INGEST_MAX_IN_FLIGHT raw pages wait for the pool.
+        """
+        workers = settings.INGEST_PARSE_WORKERS
+        if workers <= 0:
+            for url in urls:
+                yield url, self.fetcher.fetch_page(
+                    url, request_id=request_id, stats=stats, validators=validators.get(url) if validators else None
+                )
+            return
+        
+        max_in_flight = max(settings.INGEST_MAX_IN_FLIGHT, workers)
+        engine = settings.HTML_EXTRACTOR_ENGINE
+        in_flight = deque()
+        
+        def collect(url, future):
+            try:
+                return url, future.result()
+            except Exception as e:
+                logger.error(
+                    "Error in parse worker",
+                    extra={
+                        "request_id": request_id,
+                        "url": url,
+                        "error_type": type(e).__name__,
+                        "error_message": str(e),
+                    }
+                )
+                return url, None
+        
+        # spawn avoids forking a process that may hold server threads and locks
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            for url in urls:
+                html = self.fetcher.download_page(
+                    url, request_id=request_id, stats=stats, validators=validators.get(url) if validators else None
+                )
+                if html is None or html is NOT_MODIFIED:
+                    yield url, html
+                    continue
+                
+                in_flight.append((url, pool.submit(
+                    WebsiteFetcherService.parse_page, html, url, request_id, engine
+                )))
+                del html
+                
+                # Block on the oldest page once the in-flight cap is reached
+                while len(in_flight) >= max_in_flight:
+                    yield collect(*in_flight.popleft())
+                # Hand back anything already parsed without waiting
+                while in_flight and in_flight[0][1].done():
+                    yield collect(*in_flight.popleft())
+            
+            while in_flight:
+                yield collect(*in_flight.popleft())
+    
+    @staticmethod
+    def _flush_pages(
+        db: Session,
+        pending_inserts: List[dict],
+        pending_updates: List[dict],
+        pending_deletes: List[int],
+        website_source_id: Optional[int] = None,
+        alias_changes: Optional[Dict[str, List[str]]] = None
+    ) -> None:
+        """
+        Write one batch: a single upsert for new pages, an executemany UPDATE by
+        id for changed ones, and alias lists, committed together so duplicate
+        rows are never deleted without their alias being recorded
+        """
+        if pending_inserts:
+            upsert_rows(
+                db,
+                WebsitePage,
+                pending_inserts,
+                index_elements=["website_source_id", "url"],
+                update_columns=[
+                    "title", "content_text", "content_hash", "simhash", "near_duplicate_of",
+                    "etag", "last_modified", "updated_at"
+                ]
+            )
+        if pending_updates:
+            db.execute(update(WebsitePage), pending_updates)
+        if pending_deletes:
+            db.query(WebsitePage).filter(
+                WebsitePage.id.in_(pending_deletes)
+            ).delete(synchronize_session=False)
+        if alias_changes:
+            WebsiteIngestService._write_aliases(db, website_source_id, alias_changes)
+        db.commit()
+        CorpusVocabulary.invalidate()
+        pending_inserts.clear()
+        pending_updates.clear()
+        pending_deletes.clear()
+    
+    @staticmethod
+    def _write_aliases(db: Session, website_source_id: int, alias_changes: Dict[str, List[str]]) -> None:
+        """Store alias URL lists on their canonical pages (in the caller's transaction)"""
+        page_ids = dict(db.query(WebsitePage.url, WebsitePage.id).filter(
+            WebsitePage.website_source_id == website_source_id,
+            WebsitePage.url.in_(list(alias_changes))
+        ))
+        rows = [
+            {"id": page_ids[url], "alias_urls": aliases or None}
+            for url, aliases in alias_changes.items()
+            if url in page_ids
+        ]
+        if rows:
+            db.execute(update(WebsitePage), rows)
+    
+    @staticmethod
+    def _rematch_near_duplicates(
+        db: Session,
+        website_source_id: int,
+        simhash_index: SimHashIndex,
+        near_duplicates: Dict[str, Tuple[str, str]]
+    ) -> int:
+        """
+        Re-match near-duplicates (url -> (simhash, canonical url)) whose canonical
+        was deleted, changed or is no longer canonical against the final index,
+        so they are not hidden from retrieval for good. Pages with no close
+        canonical left become canonical. Returns the number of pages changed.
+        """
+        changes = []
+        for url, (simhash, canonical_url) in sorted(near_duplicates.items()):
+            simhash_value = SimHashService.from_hex(simhash)
+            if simhash_value is None or simhash_index.matches(canonical_url, simhash_value):
+                continue
+            new_canonical = simhash_index.find(simhash_value, exclude=url)
+            if new_canonical is None:
+                simhash_index.add(url, simhash_value)
+            changes.append({"page_url": url, "canonical_url": new_canonical})
+        if changes:
+            pages = WebsitePage.__table__
+            db.execute(
+                update(pages).where(
+                    pages.c.website_source_id == website_source_id,
+                    pages.c.url == bindparam("page_url")
+                ).values(near_duplicate_of=bindparam("canonical_url")),
+                changes
+            )
+            db.commit()
+            CorpusVocabulary.invalidate()
+        return len(changes)
+    
+    def ingest_website(
+        self,
+        db: Session,
+        website_source_id: int,
+        request_id: str = None,
+        frontier: Optional[List[str]] = None,
+        checkpoint: Optional[Callable[[List[str]], None]] = None,
+        cancelled: Optional[threading.Event] = None
+    ) -> dict:
+        """
+        Ingest all pages from a website source.
+        
+        frontier resumes an interrupted crawl from its remaining URLs instead of
+        rediscovering them. checkpoint, if given, is called with the URLs still to
+        process after discovery and after every written batch. Once cancelled is
+        set (the job was taken over by another worker) the crawl raises
+        CrawlJobLostError before writing anything else.
+        
+        Live progress is published in CrawlProgressRegistry while the crawl runs
+        and returned as "progress" in the result.
+        """
         website_source = db.query(WebsiteSource).filter(
             WebsiteSource.id == website_source_id
         ).first()
@@ -45,6 +234,8 @@ class WebsiteIngestService:
         website_source.crawl_status = "running"
         db.commit()
         
+        fetch_stats = Counter()
+        progress = CrawlProgressRegistry.start(website_source_id, fetch_stats=fetch_stats)
         try:
             # Validate base_url domain
             from urllib.parse import urlparse
@@ -66,9 +257,13 @@ class WebsiteIngestService:
             base_domain = parsed_base.netloc
             
             # Get URLs to crawl (already limited by MAX_CRAWL_PAGES)
-            urls = self.fetcher.crawl_from_base(website_source.base_url)
+            resuming = frontier is not None
+            if resuming:
+                urls = list(frontier)
+            else:
+                urls = self.fetcher.crawl_from_base(website_source.base_url)
             
-            if not urls:
+            if not urls and not resuming:
                 logger.warning(
                     "No URLs found to crawl",
                     extra={
@@ -89,6 +284,8 @@ class WebsiteIngestService:
                     "website_source_id": website_source_id,
                     "urls_count": len(urls),
                     "max_pages": settings.MAX_CRAWL_PAGES,
+                    "parse_workers": settings.INGEST_PARSE_WORKERS,
+                    "resumed": resuming,
                 }
             )
             
@@ -96,9 +293,79 @@ class WebsiteIngestService:
             pages_ingested = 0
             pages_updated = 0
             pages_failed = 0
+            pages_unchanged = 0
+            db_batches = 0
+            pending_inserts = []
+            pending_updates = []
+            pending_deletes = []
+            pages_deduplicated = 0
+            dedupe_bytes_saved = 0
+            pages_near_duplicate = 0
+            
+            # Near-duplicate pages are matched against canonical pages of this source
+            simhash_index = None
+            if settings.NEAR_DUPLICATE_MAX_DISTANCE > 0:
+                simhash_index = SimHashIndex(settings.NEAR_DUPLICATE_MAX_DISTANCE)
             
+            # Preload url -> (id, content_hash) once instead of a SELECT per page,
+            # plus content_hash -> canonical url for cross-URL deduplication
+            existing_pages = {}
+            canonical_by_hash = {}
+            stored_aliases = {}
+            stored_signatures = {}
+            stored_validators = {}
+            # url -> (simhash, canonical url) of pages currently marked near-duplicate
+            near_duplicates = {}
+            for url, page_id, content_hash, alias_urls, simhash, near_duplicate_of, etag, last_modified in db.query(
+                WebsitePage.url, WebsitePage.id, WebsitePage.content_hash, WebsitePage.alias_urls,
+                WebsitePage.simhash, WebsitePage.near_duplicate_of, WebsitePage.etag, WebsitePage.last_modified
+            ).filter(
+                WebsitePage.website_source_id == website_source_id
+            ).order_by(WebsitePage.id):
+                existing_pages[url] = (page_id, content_hash)
+                if content_hash:
+                    canonical_by_hash.setdefault(content_hash, url)
+                stored_aliases[url] = sorted(alias_urls or [])
+                stored_signatures[url] = (simhash, near_duplicate_of)
+                if simhash and near_duplicate_of:
+                    near_duplicates[url] = (simhash, near_duplicate_of)
+                stored_validators[url] = {"etag": etag, "last_modified": last_modified}
+                if simhash_index is not None and simhash and near_duplicate_of is None:
+                    simhash_index.add(url, SimHashService.from_hex(simhash))
+            # canonical url -> alias urls seen in this crawl
+            run_aliases = defaultdict(set)
+            canonical_seen = set()
+            fetched_urls = set()
+            # canonical url -> {alias url: (fetch result, deleted duplicate row)} for
+            # aliases matched before the canonical itself was fetched this crawl
+            provisional_aliases = defaultdict(dict)
+            # canonical url -> aliases dropped because the canonical's content changed
+            released_aliases = defaultdict(set)
+            # Alias lists as currently stored, updated with every flushed batch
+            persisted_aliases = dict(stored_aliases)
+            
+            def added_aliases() -> Dict[str, List[str]]:
+                """Canonical pages with aliases found this crawl that are not stored yet"""
+                changes = {}
+                for canonical in set(run_aliases) | set(released_aliases):
+                    current = persisted_aliases.get(canonical, [])
+                    merged = sorted(
+                        (set(current) | run_aliases.get(canonical, set())) - released_aliases.get(canonical, set())
+                    )
+                    if merged != current:
+                        changes[canonical] = merged
+                return changes
+            
+            def flush(alias_changes: Dict[str, List[str]]):
+                self._flush_pages(
+                    db, pending_inserts, pending_updates, pending_deletes,
+                    website_source_id=website_source_id, alias_changes=alias_changes
+                )
+                persisted_aliases.update(alias_changes)
+            
+            # Double-check domain restriction before fetching anything
+            allowed_urls = []
             for url in urls:
-                # Double-check domain restriction
                 parsed_url = urlparse(url)
                 if parsed_url.netloc != base_domain:
                     logger.warning(
@@ -112,8 +379,43 @@ class WebsiteIngestService:
                     )
                     pages_failed += 1
                     continue
+                allowed_urls.append(url)
+            
+            # Stored pages are fetched with a conditional GET; the dicts receive the
+            # validators of fresh responses for storing
+            page_validators = {url: dict(stored_validators.get(url, {})) for url in allowed_urls}
+            
+            progress.start_fetching(len(allowed_urls))
+            if checkpoint:
+                checkpoint(allowed_urls)
+            processed = 0
+            last_checkpoint = 0
+            
+            def ensure_held():
+                if cancelled is not None and cancelled.is_set():
+                    raise CrawlJobLostError(f"Crawl of website source {website_source_id} was cancelled")
+            
+            ensure_held()
+            for url, result in self._iter_fetched_pages(
+                allowed_urls, request_id=request_id, stats=fetch_stats, validators=page_validators
+            ):
+                ensure_held()
+                # Write in batches to keep transactions short and round trips low;
+                # everything before this URL is then durable, so checkpoint the rest
+                pending_count = len(pending_inserts) + len(pending_updates) + len(pending_deletes)
+                if pending_count >= settings.INGEST_BATCH_SIZE or (
+                    checkpoint and processed - last_checkpoint >= settings.INGEST_BATCH_SIZE
+                ):
+                    # Aliases go out with the batch that deletes their duplicate rows
+                    alias_changes = added_aliases()
+                    if pending_count or alias_changes:
+                        flush(alias_changes)
+                        db_batches += 1
+                    if checkpoint:
+                        checkpoint(allowed_urls[processed:])
+                        last_checkpoint = processed
+                processed += 1
                 
-                result = self.fetcher.fetch_page(url, request_id=request_id)
                 if not result:
                     logger.debug(
                         "Failed to fetch page",
@@ -123,51 +425,172 @@ class WebsiteIngestService:
                         }
                     )
                     pages_failed += 1
+                    progress.pages_failed += 1
                     continue
                 
-                title, content_text, content_hash = result
+                progress.pages_fetched += 1
+                if result is NOT_MODIFIED:
+                    # Server confirmed the stored copy is current; nothing to parse or write
+                    pages_unchanged += 1
+                    progress.pages_unchanged += 1
+                    canonical_seen.add(url)
+                    fetched_urls.add(url)
+                    provisional_aliases.pop(url, None)
+                    continue
                 
-                # Check if page already exists
-                existing_page = db.query(WebsitePage).filter(
-                    WebsitePage.website_source_id == website_source_id,
-                    WebsitePage.url == url
-                ).first()
+                # A page may release aliases recorded against its old content, which
+                # are then stored in their own right
+                work = [(url, result)]
+                while work:
+                    url, result = work.pop()
                 
-                if existing_page:
-                    # Update if content changed
-                    if existing_page.content_hash != content_hash:
-                        existing_page.title = title
-                        existing_page.content_text = content_text
-                        existing_page.content_hash = content_hash
-                        existing_page.updated_at = datetime.utcnow()
+                    title, content_text, content_hash, simhash = result
+                    validators = page_validators.get(url, {})
+                    etag = validators.get("etag")
+                    last_modified = validators.get("last_modified")
+                    now = datetime.utcnow()
+                    known = existing_pages.get(url)
+                    fetched_urls.add(url)
+                    
+                    released = provisional_aliases.pop(url, {})
+                    if released and (known is None or known[1] != content_hash):
+                        for alias_url, (alias_result, deleted_row) in released.items():
+                            run_aliases[url].discard(alias_url)
+                            released_aliases[url].add(alias_url)
+                            pages_deduplicated -= 1
+                            dedupe_bytes_saved -= len(alias_result[1].encode())
+                            if deleted_row is not None and deleted_row[0] in pending_deletes:
+                                # Duplicate row not written yet: keep it and update it in place
+                                pending_deletes.remove(deleted_row[0])
+                                existing_pages[alias_url] = deleted_row
+                            work.append((alias_url, alias_result))
+                    
+                    # Same content already stored under another URL: record an alias only
+                    canonical_url = canonical_by_hash.get(content_hash)
+                    if canonical_url is not None and canonical_url != url:
+                        run_aliases[canonical_url].add(url)
+                        canonical_seen.add(canonical_url)
+                        pages_deduplicated += 1
+                        dedupe_bytes_saved += len(content_text.encode())
+                        if canonical_url not in fetched_urls:
+                            # Matched the canonical's stored content; kept until the
+                            # canonical is fetched in case its content has changed
+                            provisional_aliases[canonical_url][url] = (
+                                result, known if known and known[0] is not None else None
+                            )
+                        if known and known[0] is not None:
+                            # Previously stored as its own page - drop the duplicate row
+                            pending_deletes.append(known[0])
+                            if canonical_by_hash.get(known[1]) == url:
+                                del canonical_by_hash[known[1]]
+                            del existing_pages[url]
+                            near_duplicates.pop(url, None)
+                            if simhash_index is not None:
+                                simhash_index.remove(url)
+                        continue
+                    
+                    canonical_seen.add(url)
+                    canonical_by_hash[content_hash] = url
+                    
+                    # Near-duplicate of another canonical page: stored, but skipped by retrieval
+                    near_duplicate_of = None
+                    simhash_value = SimHashService.from_hex(simhash)
+                    if simhash_index is not None and simhash_value is not None:
+                        near_duplicate_of = simhash_index.find(simhash_value, exclude=url)
+                        if near_duplicate_of is None:
+                            simhash_index.add(url, simhash_value)
+                        else:
+                            simhash_index.remove(url)
+                            pages_near_duplicate += 1
+                    elif simhash_index is not None:
+                        # Too short to sign now: drop any signature of its old content
+                        simhash_index.remove(url)
+                    if near_duplicate_of is None:
+                        near_duplicates.pop(url, None)
+                    else:
+                        near_duplicates[url] = (simhash, near_duplicate_of)
+                    
+                    if known:
+                        page_id, existing_hash = known
+                        if page_id is None or existing_hash == content_hash:
+                            # Unchanged (or a repeated URL already queued for insert)
+                            pages_unchanged += 1
+                            progress.pages_unchanged += 1
+                            if page_id is not None and (
+                                stored_signatures.get(url) != (simhash, near_duplicate_of)
+                                or stored_validators.get(url) != {"etag": etag, "last_modified": last_modified}
+                            ):
+                                pending_updates.append({
+                                    "id": page_id,
+                                    "simhash": simhash,
+                                    "near_duplicate_of": near_duplicate_of,
+                                    "etag": etag,
+                                    "last_modified": last_modified,
+                                })
+                            continue
+                        pending_updates.append({
+                            "id": page_id,
+                            "title": title,
+                            "content_text": content_text,
+                            "content_hash": content_hash,
+                            "simhash": simhash,
+                            "near_duplicate_of": near_duplicate_of,
+                            "etag": etag,
+                            "last_modified": last_modified,
+                            "updated_at": now,
+                        })
+                        if canonical_by_hash.get(existing_hash) == url:
+                            del canonical_by_hash[existing_hash]
+                        existing_pages[url] = (page_id, content_hash)
                         pages_updated += 1
-                else:
-                    # Create new page
-                    new_page = WebsitePage(
-                        website_source_id=website_source_id,
-                        url=url,
-                        title=title,
-                        content_text=content_text,
-                        content_hash=content_hash
-                    )
-                    db.add(new_page)
-                    pages_ingested += 1
+                    else:
+                        pending_inserts.append({
+                            "website_source_id": website_source_id,
+                            "url": url,
+                            "title": title,
+                            "content_text": content_text,
+                            "content_hash": content_hash,
+                            "simhash": simhash,
+                            "near_duplicate_of": near_duplicate_of,
+                            "etag": etag,
+                            "last_modified": last_modified,
+                            "updated_at": now,
+                        })
+                        existing_pages[url] = (None, content_hash)
+                        pages_ingested += 1
                 
-                # Commit periodically to avoid long transactions
-                if (pages_ingested + pages_updated) % 10 == 0:
-                    db.commit()
             
-            # Final commit
-            db.commit()
+            # Final batch. A full crawl recomputes the aliases of every canonical
+            # page it reached; a resumed one only saw part of the site, so it adds
+            if resuming:
+                alias_changes = added_aliases()
+            else:
+                alias_changes = {
+                    url: sorted(run_aliases.get(url, ()))
+                    for url in canonical_seen
+                    if sorted(run_aliases.get(url, ())) != persisted_aliases.get(url, [])
+                }
+            ensure_held()
+            if pending_inserts or pending_updates or pending_deletes or alias_changes:
+                flush(alias_changes)
+                db_batches += 1
+            
+            near_duplicates_rematched = 0
+            if simhash_index is not None and near_duplicates:
+                near_duplicates_rematched = self._rematch_near_duplicates(
+                    db, website_source_id, simhash_index, near_duplicates
+                )
             
             # Update website source status
-            if pages_ingested > 0 or pages_updated > 0:
+            # A resumed crawl with nothing left to fetch finished before it was interrupted
+            if pages_ingested > 0 or pages_updated > 0 or pages_unchanged > 0 or (resuming and not allowed_urls):
                 website_source.crawl_status = "done"
             else:
                 website_source.crawl_status = "failed"
             
             website_source.last_crawled_at = datetime.utcnow()
             db.commit()
+            progress.finish()
             
             logger.info(
                 "Website ingestion completed",
@@ -176,17 +599,42 @@ class WebsiteIngestService:
                     "website_source_id": website_source_id,
                     "pages_ingested": pages_ingested,
                     "pages_updated": pages_updated,
+                    "pages_unchanged": pages_unchanged,
                     "pages_failed": pages_failed,
+                    "pages_deduplicated": pages_deduplicated,
+                    "dedupe_bytes_saved": dedupe_bytes_saved,
+                    "pages_near_duplicate": pages_near_duplicate,
+                    "near_duplicates_rematched": near_duplicates_rematched,
+                    "db_batches": db_batches,
+                    "pages_skipped_oversize": fetch_stats["skipped_oversize"],
+                    "pages_skipped_non_html": fetch_stats["skipped_non_html"],
+                    "pages_skipped_robots": fetch_stats["skipped_robots"],
+                    "bytes_downloaded": fetch_stats["bytes_downloaded"],
+                    "pages_not_modified": fetch_stats["not_modified"],
+                    "pages_per_sec": progress.snapshot()["pages_per_sec"],
                     "status": website_source.crawl_status,
                 }
             )
             
             return {
                 "success": True,
-                "message": f"Ingested {pages_ingested} new pages, updated {pages_updated} pages, failed {pages_failed} pages",
-                "pages_count": pages_ingested + pages_updated
+                "message": f"Ingested {pages_ingested} new pages, updated {pages_updated} pages, unchanged {pages_unchanged} pages, deduplicated {pages_deduplicated} pages, failed {pages_failed} pages",
+                "pages_count": pages_ingested + pages_updated,
+                "pages_unchanged": pages_unchanged,
+                "pages_deduplicated": pages_deduplicated,
+                "dedupe_bytes_saved": dedupe_bytes_saved,
+                "pages_near_duplicate": pages_near_duplicate,
+                "pages_skipped_oversize": fetch_stats["skipped_oversize"],
+                "pages_skipped_non_html": fetch_stats["skipped_non_html"],
+                "pages_skipped_robots": fetch_stats["skipped_robots"],
+                "bytes_downloaded": fetch_stats["bytes_downloaded"],
+                "pages_not_modified": fetch_stats["not_modified"],
+                "progress": progress.snapshot()
             }
             
+        except CrawlJobLostError:
+            # Another worker resumed this crawl; leave the source status to it
+            raise
         except Exception as e:
             logger.error(
                 "Error ingesting website",
@@ -202,5 +650,8 @@ class WebsiteIngestService:
             website_source.crawl_status = "failed"
             website_source.last_crawled_at = datetime.utcnow()
             db.commit()
-            return {"success": False, "message": str(e)}
+            progress.finish()
+            return {"success": False, "message": str(e), "progress": progress.snapshot()}
+        finally:
+            CrawlProgressRegistry.remove(website_source_id, progress)
 
@@ -0,0 +1,243 @@
+"""
+Local stub of the OpenAI chat completions API for tests and load tests
+
+Serves POST /v1/chat/completions (plain and stream=True server-sent events)
+and GET /v1/models with configurable latency, completion token rate, error
+rate and stalls, so the LLM path can be exercised without spending real
+tokens. Answers are deterministic: the context line (KB "A: ..." or page
+"Content: ...") sharing most words with the user message, so they pass
+LLMService's context-overlap validation. Point the backend at it with
+OPENAI_BASE_URL=http://127.0.0.1:<port>/v1.
+
+Usage:
+    python -m app.testing.openai_stub --port 8099 --latency-ms 300 --tokens-per-sec 50 --error-rate 0.02
+    python -m app.testing.openai_stub --stall-rate 0.1 --stall-ms 60000   # requests that outlive client timeouts
+"""
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List, Optional, Tuple
+
+ANSWER_PREFIX = "پاسخ:"
+NO_ANSWER = "در منابع موجود نیست"
+CONTEXT_LINE_RE = re.compile(r'^(?:A|Content): (.+)$', re.MULTILINE)
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+
+class StubConfig:
+    def __init__(
+        self,
+        latency_ms: float = 200,
+        tokens_per_sec: float = 0,
+        error_rate: float = 0,
+        completion_tokens: int = 40,
+        seed: Optional[int] = None,
+        stall_rate: float = 0,
+        stall_ms: float = 30000
+    ):
+        self.latency_ms = latency_ms
+        self.tokens_per_sec = tokens_per_sec  # 0: completion is returned without generation delay
+        self.error_rate = error_rate
+        self.completion_tokens = completion_tokens  # Upper bound on answer length
+        self.stall_rate = stall_rate
+        self.stall_ms = stall_ms
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.stats = {"requests": 0, "errors": 0, "stalls": 0, "prompt_tokens": 0, "completion_tokens": 0}
+
+    def should_fail(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.error_rate
+
+    def should_stall(self) -> bool:
+        with self.lock:
+            return self.random.random() < self.stall_rate
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token) for usage reporting"""
+    return max(1, len(text) // 4)
+
+
+def build_answer(messages: List[dict], max_tokens: int) -> str:
+    """Deterministic answer: the context line sharing most words with the last user message"""
+    user_text = next((str(m.get("content", "")) for m in reversed(messages) if m.get("role") == "user"), "")
+    all_text = "\n".join(str(m.get("content", "")) for m in messages)
+    snippets = CONTEXT_LINE_RE.findall(all_text)
+    if not snippets:
+        return NO_ANSWER
+    user_words = set(WORD_RE.findall(user_text.lower()))
+    best = max(snippets, key=lambda snippet: len(set(WORD_RE.findall(snippet.lower())) & user_words))
+    words = best.split()
+    answer = ANSWER_PREFIX
+    for word in words:
+        if estimate_tokens(f"{answer} {word}") > max_tokens:
+            break
+        answer = f"{answer} {word}"
+    return answer
+
+
+def build_completion(body: dict, config: StubConfig) -> Tuple[dict, int]:
+    """Return (chat.completion payload, completion token count) for a request body"""
+    messages = body.get("messages", [])
+    prompt_text = "".join(str(m.get("content", "")) for m in messages)
+    max_tokens = min(body.get("max_tokens") or config.completion_tokens, config.completion_tokens)
+    answer = build_answer(messages, max_tokens)
+    completion_tokens = estimate_tokens(answer)
+    prompt_tokens = estimate_tokens(prompt_text)
+    return {
+        "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "stub"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": answer},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }, completion_tokens
+
+
+def stream_chunks(payload: dict, include_usage: bool) -> Iterator[dict]:
+    """chat.completion.chunk events for a completion payload, one per word"""
+    base = {"id": payload["id"], "object": "chat.completion.chunk", "created": payload["created"], "model": payload["model"]}
+    words = payload["choices"][0]["message"]["content"].split(" ")
+    yield {**base, "choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]}
+    for i, word in enumerate(words):
+        piece = word if i == 0 else f" {word}"
+        yield {**base, "choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]}
+    yield {**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+    if include_usage:
+        yield {**base, "choices": [], "usage": payload["usage"]}
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status: int, payload: dict):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path.rstrip("/").endswith("/models"):
+                return self._send_json(200, {"object": "list", "data": [{"id": "stub", "object": "model"}]})
+            self._send_json(404, {"error": {"message": "not found"}})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b"{}"
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                return self._send_json(404, {"error": {"message": "not found"}})
+
+            with config.lock:
+                config.stats["requests"] += 1
+            if config.latency_ms:
+                time.sleep(config.latency_ms / 1000)
+            if config.should_stall():
+                with config.lock:
+                    config.stats["stalls"] += 1
+                time.sleep(config.stall_ms / 1000)
+            if config.should_fail():
+                with config.lock:
+                    config.stats["errors"] += 1
+                status = config.random.choice((429, 500, 503))
+                return self._send_json(status, {"error": {"message": "stub injected error", "type": "server_error"}})
+
+            body = json.loads(raw or b"{}")
+            payload, completion_tokens = build_completion(body, config)
+            with config.lock:
+                config.stats["prompt_tokens"] += payload["usage"]["prompt_tokens"]
+                config.stats["completion_tokens"] += completion_tokens
+            if body.get("stream"):
+                include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+                return self._send_stream(payload, include_usage)
+            if config.tokens_per_sec:
+                time.sleep(completion_tokens / config.tokens_per_sec)
+            self._send_json(200, payload)
+
+        def _send_stream(self, payload: dict, include_usage: bool):
+            """Server-sent events paced at tokens_per_sec; the connection closes after [DONE]"""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            for chunk in stream_chunks(payload, include_usage):
+                if config.tokens_per_sec and chunk["choices"] and chunk["choices"][0]["delta"].get("content"):
+                    time.sleep(estimate_tokens(chunk["choices"][0]["delta"]["content"]) / config.tokens_per_sec)
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub(config: StubConfig, host: str = "127.0.0.1", port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Start the stub in a background thread; returns (server, base_url ending in /v1)"""
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="openai-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/v1"
+
+
+def add_stub_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency-ms", type=float, default=200, help="Fixed latency per completion")
+    parser.add_argument("--tokens-per-sec", type=float, default=0, help="Completion generation rate (0: instant)")
+    parser.add_argument("--error-rate", type=float, default=0, help="Fraction of requests answered 429/5xx")
+    parser.add_argument("--completion-tokens", type=int, default=40, help="Max answer length in tokens")
+    parser.add_argument("--stall-rate", type=float, default=0, help="Fraction of requests held for --stall-ms")
+    parser.add_argument("--stall-ms", type=float, default=30000)
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def config_from_args(args) -> StubConfig:
+    return StubConfig(
+        latency_ms=args.latency_ms,
+        tokens_per_sec=args.tokens_per_sec,
+        error_rate=args.error_rate,
+        completion_tokens=args.completion_tokens,
+        seed=args.seed,
+        stall_rate=args.stall_rate,
+        stall_ms=args.stall_ms,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub OpenAI chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    server, base_url = start_stub(config_from_args(args), args.host, args.port)
+    print(f"OpenAI stub listening on {base_url} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
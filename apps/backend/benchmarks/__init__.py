@@ -0,0 +1 @@
+# Benchmark scripts (run from apps/backend, e.g. python -m benchmarks.bench_html_extraction)
@@ -0,0 +1,250 @@
+"""
+Benchmark end-to-end website ingestion against a local generated site
+
+Starts an HTTP server on 127.0.0.1 serving a synthetic site, runs
+WebsiteIngestService.ingest_website against it with a throwaway SQLite
+database, and reports pages/sec, bytes, CPU time and peak RSS. No real
+sites are contacted.
+
+Usage:
+    python -m benchmarks.bench_crawl
+    python -m benchmarks.bench_crawl --pages 500 --page-kb 40 --fanout 8 --latency-ms 20
+    python -m benchmarks.bench_crawl --no-sitemap --parse-workers 2 --recrawl
+"""
+
+import argparse
+import hashlib
+import logging
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+try:
+    import resource  # Unix only
+except ImportError:
+    resource = None
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models import *  # noqa: F401,F403 - register all tables
+from app.models.website_source import WebsiteSource
+from app.services.website_ingest import WebsiteIngestService
+
+WORDS = (
+    "سفارش ارسال پرداخت پشتیبانی محصول قیمت گارانتی مرجوعی تخفیف فروشگاه "
+    "order shipping payment support product price warranty return discount store"
+).split()
+
+
+class GeneratedSite:
+    """Deterministic synthetic site: /page/<i> pages linking to each other, plus an optional sitemap"""
+
+    def __init__(self, pages: int, page_kb: float, fanout: int, sitemap: bool, crawl_delay: int = None):
+        self.pages = pages
+        self.page_bytes = int(page_kb * 1024)
+        self.fanout = fanout
+        self.sitemap = sitemap
+        self.crawl_delay = crawl_delay
+
+    def page(self, index: int) -> bytes:
+        links = "".join(
+            f'<a href="/page/{(index * self.fanout + j + 1) % self.pages}">link {j}</a> '
+            for j in range(self.fanout)
+        )
+        paragraphs = []
+        size = 0
+        n = 0
+        while size < self.page_bytes:
+            # Vary words per page so pages don't collapse as duplicates at ingest
+            words = " ".join(WORDS[(index * 7 + n * 3 + k) % len(WORDS)] for k in range(40))
+            paragraph = f"<p>Page {index} paragraph {n}: {words}</p>"
+            paragraphs.append(paragraph)
+            size += len(paragraph.encode("utf-8"))
+            n += 1
+        return (
+            f"<html><head><title>Page {index}</title></head><body>"
+            f"<nav>{links}</nav><main>{''.join(paragraphs)}</main></body></html>"
+        ).encode("utf-8")
+
+    def sitemap_xml(self, base_url: str) -> bytes:
+        entries = "".join(f"<url><loc>{base_url}/page/{i}</loc></url>" for i in range(self.pages))
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>'
+            f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{entries}</urlset>'
+        ).encode("utf-8")
+
+    def robots_txt(self) -> bytes:
+        lines = ["User-agent: *", "Disallow:"]
+        if self.crawl_delay is not None:
+            lines.append(f"Crawl-delay: {self.crawl_delay}")
+        return ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def start_server(site: GeneratedSite, latency_ms: float):
+    """Serve site on an ephemeral port; returns (server, base_url, request counter)"""
+    requests_served = {"count": 0, "not_modified": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; Nagle + delayed ACK would add ~40ms each
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, body=b"", content_type="text/html; charset=utf-8", headers=None):
+            self.send_response(status)
+            if status != 304:
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            if status != 304:
+                self.wfile.write(body)
+
+        def do_GET(self):
+            if latency_ms:
+                time.sleep(latency_ms / 1000)
+            with lock:
+                requests_served["count"] += 1
+            path = self.path.split("?")[0]
+            base_url = f"http://{self.headers.get('Host')}"
+
+            if path == "/robots.txt":
+                return self._send(200, site.robots_txt(), "text/plain")
+            if path == "/sitemap.xml" and site.sitemap:
+                return self._send(200, site.sitemap_xml(base_url), "application/xml")
+            if path in ("/", "/page/0"):
+                path = "/page/0"
+            if path.startswith("/page/"):
+                try:
+                    index = int(path.rsplit("/", 1)[1])
+                except ValueError:
+                    return self._send(404)
+                if 0 <= index < site.pages:
+                    body = site.page(index)
+                    etag = '"%s"' % hashlib.md5(body).hexdigest()
+                    if self.headers.get("If-None-Match") == etag:
+                        with lock:
+                            requests_served["not_modified"] += 1
+                        return self._send(304, headers={"ETag": etag})
+                    return self._send(200, body, headers={"ETag": etag})
+            return self._send(404)
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}", requests_served
+
+
+def cpu_seconds() -> float:
+    """CPU time of this process plus finished children (parse pool workers)"""
+    if resource is None:
+        return time.process_time()
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_ingest(service: WebsiteIngestService, session_factory, source_id: int, served: dict) -> dict:
+    served_before = dict(served)
+    db = session_factory()
+    try:
+        cpu_start = cpu_seconds()
+        start = time.perf_counter()
+        result = service.ingest_website(db, source_id, request_id="bench")
+        elapsed = time.perf_counter() - start
+        cpu = cpu_seconds() - cpu_start
+    finally:
+        db.close()
+    progress = result.get("progress") or {}
+    processed = progress.get("pages_fetched", 0) + progress.get("pages_failed", 0)
+    return {
+        "result": result,
+        "elapsed": elapsed,
+        "cpu": cpu,
+        "processed": processed,
+        "requests": served["count"] - served_before["count"],
+        "not_modified": served["not_modified"] - served_before["not_modified"],
+    }
+
+
+def report(label: str, run: dict):
+    result = run["result"]
+    rate = run["processed"] / run["elapsed"] if run["elapsed"] > 0 else float("inf")
+    print(f"{label}:")
+    print(f"  success:        {result.get('success')} ({result.get('message')})")
+    print(f"  pages:          {run['processed']} in {run['elapsed']:.2f}s -> {rate:.1f} pages/sec")
+    print(f"  HTTP requests:  {run['requests']} ({run['not_modified']} answered 304)")
+    print(f"  bytes:          {result.get('bytes_downloaded', 0) / 1024:.1f} KiB downloaded")
+    print(f"  CPU time:       {run['cpu']:.2f}s ({run['cpu'] / run['elapsed'] * 100 if run['elapsed'] else 0:.0f}% of wall)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark website ingestion against a local generated site")
+    parser.add_argument("--pages", type=int, default=200, help="Pages on the generated site")
+    parser.add_argument("--page-kb", type=float, default=20, help="Approximate HTML size per page (KiB)")
+    parser.add_argument("--fanout", type=int, default=5, help="Links per page")
+    parser.add_argument("--no-sitemap", action="store_true", help="Discover pages by following links")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Server latency injected per request")
+    parser.add_argument("--crawl-delay", type=int, default=None, help="Crawl-delay (whole seconds) advertised in robots.txt")
+    parser.add_argument("--parse-workers", type=int, default=settings.INGEST_PARSE_WORKERS)
+    parser.add_argument("--recrawl", action="store_true", help="Run a second, incremental crawl")
+    args = parser.parse_args()
+
+    # Per-page ingest logs would dominate the output
+    logging.disable(logging.INFO)
+
+    site = GeneratedSite(args.pages, args.page_kb, args.fanout, not args.no_sitemap, args.crawl_delay)
+    server, base_url, served = start_server(site, args.latency_ms)
+
+    # Crawl the whole generated site, paced only by robots.txt
+    settings.MAX_CRAWL_PAGES = args.pages
+    settings.CRAWL_RATE_LIMIT_DELAY = 0
+    settings.INGEST_PARSE_WORKERS = args.parse_workers
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite'}")
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine)
+
+        db = session_factory()
+        source = WebsiteSource(base_url=base_url, enabled=True)
+        db.add(source)
+        db.commit()
+        source_id = source.id
+        db.close()
+
+        print(
+            f"Site: {args.pages} pages x ~{args.page_kb:g} KiB, fanout {args.fanout}, "
+            f"sitemap {'off' if args.no_sitemap else 'on'}, latency {args.latency_ms:g} ms, "
+            f"parse workers {args.parse_workers}"
+        )
+        service = WebsiteIngestService()
+        report("Initial crawl", run_ingest(service, session_factory, source_id, served))
+        if args.recrawl:
+            report("Recrawl", run_ingest(service, session_factory, source_id, served))
+
+        engine.dispose()
+
+    server.shutdown()
+    rss = peak_rss_mb()
+    print(f"Peak RSS: {rss:.1f} MiB" if rss is not None else "Peak RSS: n/a on this platform")
+
+
+if __name__ == "__main__":
+    main()
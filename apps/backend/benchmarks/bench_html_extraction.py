@@ -0,0 +1,68 @@
+"""
+Benchmark HTML extraction engines (lxml vs BeautifulSoup html.parser)
+
+Usage:
+    python -m benchmarks.bench_html_extraction
+    python -m benchmarks.bench_html_extraction --dir /path/to/saved/pages --repeat 20
+"""
+
+import argparse
+import time
+from pathlib import Path
+from typing import List
+
+from app.services.html_extractor import HTMLExtractorService
+
+DEFAULT_FIXTURES_DIR = Path(__file__).resolve().parent.parent / "tests" / "fixtures" / "html"
+
+
+def load_pages(directory: Path) -> List[str]:
+    """Load all saved .html/.htm files from a directory"""
+    paths = sorted(list(directory.glob("*.html")) + list(directory.glob("*.htm")))
+    return [p.read_text(encoding="utf-8", errors="replace") for p in paths]
+
+
+def run_engine(engine: str, pages: List[str], repeat: int) -> float:
+    """Return pages/sec for one engine over all pages"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for html in pages:
+            HTMLExtractorService.extract(html, engine=engine)
+    elapsed = time.perf_counter() - start
+    return (len(pages) * repeat) / elapsed if elapsed > 0 else float("inf")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark HTML extraction engines")
+    parser.add_argument("--dir", type=Path, default=DEFAULT_FIXTURES_DIR, help="Directory of saved HTML pages")
+    parser.add_argument("--repeat", type=int, default=50, help="Passes over the page set per engine")
+    args = parser.parse_args()
+
+    pages = load_pages(args.dir)
+    if not pages:
+        print(f"No HTML files found in {args.dir}")
+        return
+
+    # Count mismatches so a speedup is never reported for a divergent engine
+    mismatches = sum(
+        1 for html in pages
+        if HTMLExtractorService.extract_with_lxml(html) != HTMLExtractorService.extract_with_soup(html)
+    )
+
+    total_bytes = sum(len(html.encode("utf-8")) for html in pages)
+    print(f"Pages: {len(pages)} ({total_bytes / 1024:.1f} KiB), repeat: {args.repeat}")
+    print(f"Parity mismatches: {mismatches}")
+
+    results = {}
+    for engine in HTMLExtractorService.ENGINES:
+        # Warm up imports and parser state
+        run_engine(engine, pages, 1)
+        results[engine] = run_engine(engine, pages, args.repeat)
+        print(f"  {engine:5s}: {results[engine]:10.1f} pages/sec")
+
+    if results.get("soup"):
+        print(f"Speedup (lxml / soup): {results['lxml'] / results['soup']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Benchmark RetrievalService.retrieve_all on synthetic Persian/English corpora
+
+Generates a deterministic corpus (half KB entries, half website pages) per
+scale in a throwaway SQLite database, runs a fixed query set through
+retrieve_all and reports p50/p95/p99 latency, candidates scored per query and
+peak Python memory of a single query. Results can be saved as a baseline and
+later runs compared against it.
+
+Usage:
+    python -m benchmarks.bench_retrieval
+    python -m benchmarks.bench_retrieval --scales 1000,10000 --repeat 3
+    python -m benchmarks.bench_retrieval --scales 1000,10000,100000 --save-baseline benchmarks/baselines/retrieval.json
+    python -m benchmarks.bench_retrieval --baseline benchmarks/baselines/retrieval.json --max-regression 0.25
+
+retrieve_all scores every document, so expect about a second per query at 1k
+documents and proportionally longer at 10k/100k (a full 1k/10k/100k run, as
+recorded in the baseline, takes around 40 minutes).
+"""
+
+import argparse
+import json
+import logging
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Dict, List
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base import Base
+from app.models import *  # noqa: F401,F403 - register all tables
+from app.models.kb_qa import KBQA
+from app.models.website_page import WebsitePage
+from app.models.website_source import WebsiteSource
+from app.services.retrieval import CorpusVocabulary, RetrievalService
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baselines" / "retrieval.json"
+
+PERSIAN_WORDS = (
+    "سفارش ارسال پرداخت پشتیبانی محصول قیمت گارانتی مرجوعی تخفیف فروشگاه "
+    "ساعت کاری تماس آدرس شعبه حساب کاربری رمز عبور تحویل هزینه پیگیری "
+    "کارت بانکی اقساط فاکتور موجودی رنگ اندازه کیفیت نصب آموزش خدمات "
+    "مشتری شکایت بازگشت وجه زمان روز هفته شهر تهران اصفهان شیراز"
+).split()
+ENGLISH_WORDS = (
+    "order shipping payment support product price warranty return discount store "
+    "hours contact address branch account password delivery cost tracking invoice"
+).split()
+QUESTION_TEMPLATES = [
+    "{a} {b} چگونه است؟",
+    "چطور می‌توانم {a} {b} را انجام دهم؟",
+    "آیا {a} برای {b} وجود دارد؟",
+    "هزینه {a} و {b} چقدر است؟",
+    "how does {a} {b} work?",
+    "what is the {a} {b} policy?",
+]
+OFF_TOPIC_QUERIES = [
+    "بهترین فیلم سال چیست؟",
+    "what is the capital of France?",
+    "دستور پخت قورمه سبزی",
+]
+
+
+def _words(rng: random.Random, count: int) -> str:
+    vocab = PERSIAN_WORDS if rng.random() < 0.8 else ENGLISH_WORDS
+    return " ".join(rng.choice(vocab) for _ in range(count))
+
+
+def generate_corpus(scale: int, seed: int):
+    """Return (kb_rows, page_rows) with scale documents in total"""
+    rng = random.Random(seed)
+    kb_rows = []
+    for i in range(scale // 2):
+        template = rng.choice(QUESTION_TEMPLATES)
+        vocab = ENGLISH_WORDS if template.startswith(("how", "what")) else PERSIAN_WORDS
+        question = template.format(a=rng.choice(vocab), b=rng.choice(vocab)) + f" {i}"
+        kb_rows.append({"question": question, "answer": _words(rng, rng.randint(15, 60))})
+    page_rows = []
+    for i in range(scale - scale // 2):
+        page_rows.append({
+            "website_source_id": 1,
+            "url": f"https://example.com/page/{i}",
+            "title": _words(rng, rng.randint(3, 8)),
+            "content_text": _words(rng, rng.randint(150, 400)),
+            "content_hash": f"{i:064x}",
+        })
+    return kb_rows, page_rows
+
+
+def build_queries(kb_rows: List[dict], page_rows: List[dict], seed: int) -> List[str]:
+    """Fixed mix of exact, paraphrased, Arabic-script variant, page and off-topic queries"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for row in rng.sample(kb_rows, min(6, len(kb_rows))):
+        queries.append(row["question"])
+    for row in rng.sample(kb_rows, min(6, len(kb_rows))):
+        words = row["question"].split()
+        rng.shuffle(words)
+        queries.append(" ".join(words[:-1]))
+    for row in rng.sample(kb_rows, min(3, len(kb_rows))):
+        queries.append(row["question"].replace("ی", "ي").replace("ک", "ك"))
+    for row in rng.sample(page_rows, min(5, len(page_rows))):
+        queries.append(row["title"])
+    queries.extend(OFF_TOPIC_QUERIES)
+    return queries
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def run_scale(scale: int, repeat: int, seed: int) -> Dict[str, float]:
+    kb_rows, page_rows = generate_corpus(scale, seed)
+    queries = build_queries(kb_rows, page_rows, seed)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'bench.sqlite'}")
+        Base.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+        db.add(WebsiteSource(id=1, base_url="https://example.com", enabled=True))
+        db.flush()
+        db.execute(insert(KBQA), kb_rows)
+        db.execute(insert(WebsitePage), page_rows)
+        db.commit()
+        # The vocabulary is cached per process; rebuild it for this scale's corpus
+        CorpusVocabulary.invalidate()
+
+        # Count scorer calls to report candidates scored per query
+        calls = {"count": 0}
+        original_score = RetrievalService.calculate_score
+
+        def counting_score(query, text):
+            calls["count"] += 1
+            return original_score(query, text)
+
+        RetrievalService.calculate_score = staticmethod(counting_score)
+        try:
+            RetrievalService.retrieve_all(db, queries[0])  # Warm up
+            calls["count"] = 0
+            latencies = []
+            answered = 0
+            for _ in range(repeat):
+                for query in queries:
+                    start = time.perf_counter()
+                    result = RetrievalService.retrieve_all(db, query)
+                    latencies.append((time.perf_counter() - start) * 1000)
+                    answered += 1 if result["has_results"] else 0
+            scored = calls["count"]
+
+            # Memory is traced in a separate call; tracemalloc would distort latencies
+            tracemalloc.start()
+            RetrievalService.retrieve_all(db, queries[0])
+            _, peak_bytes = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        finally:
+            RetrievalService.calculate_score = staticmethod(original_score)
+            db.close()
+            engine.dispose()
+
+    runs = len(queries) * repeat
+    return {
+        "documents": scale,
+        "queries": runs,
+        "p50_ms": round(percentile(latencies, 50), 2),
+        "p95_ms": round(percentile(latencies, 95), 2),
+        "p99_ms": round(percentile(latencies, 99), 2),
+        "mean_ms": round(statistics.mean(latencies), 2),
+        "candidates_scored": round(scored / runs, 1),
+        "answered_ratio": round(answered / runs, 3),
+        "peak_memory_mb": round(peak_bytes / (1024 * 1024), 2),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> bool:
+    """Print p95/p99 deltas against baseline; return False on a regression beyond max_regression"""
+    ok = True
+    for scale, current in results.items():
+        base = baseline.get(scale)
+        if not base:
+            print(f"  {scale}: no baseline")
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms", "candidates_scored"):
+            if not base.get(metric):
+                continue
+            change = (current[metric] - base[metric]) / base[metric]
+            flag = ""
+            if metric in ("p95_ms", "p99_ms") and change > max_regression:
+                flag = "  <-- REGRESSION"
+                ok = False
+            print(f"  {scale:>7} {metric:18s} {base[metric]:10.2f} -> {current[metric]:10.2f} ({change:+.0%}){flag}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RetrievalService.retrieve_all")
+    parser.add_argument("--scales", default="1000", help="Comma-separated corpus sizes, e.g. 1000,10000,100000")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes over the query set per scale")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--baseline", type=Path, default=None, help="Compare against this baseline JSON")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Write results as a baseline JSON")
+    parser.add_argument("--max-regression", type=float, default=0.25, help="Allowed p95/p99 slowdown vs baseline")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    scales = [int(s) for s in args.scales.split(",") if s.strip()]
+
+    results = {}
+    print(f"{'docs':>7} {'queries':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'scored/q':>9} {'answered':>8} {'peak MB':>8}")
+    for scale in scales:
+        r = run_scale(scale, args.repeat, args.seed)
+        results[str(scale)] = r
+        print(
+            f"{scale:>7} {r['queries']:>7} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f} {r['p99_ms']:>9.2f} "
+            f"{r['candidates_scored']:>9.1f} {r['answered_ratio']:>8.0%} {r['peak_memory_mb']:>8.2f}"
+        )
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        existing = json.loads(args.save_baseline.read_text()) if args.save_baseline.exists() else {}
+        existing.update(results)
+        args.save_baseline.write_text(json.dumps(existing, indent=2, sort_keys=True) + "\n")
+        print(f"Baseline written to {args.save_baseline}")
+
+    baseline_path = args.baseline
+    if baseline_path is None and not args.save_baseline and DEFAULT_BASELINE.exists():
+        baseline_path = DEFAULT_BASELINE
+    if baseline_path:
+        print(f"Compared with {baseline_path}:")
+        if not compare(results, json.loads(baseline_path.read_text()), args.max_regression):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
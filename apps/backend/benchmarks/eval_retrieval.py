@@ -0,0 +1,340 @@
+"""
+Evaluate retrieval quality against speed for each retrieval mode
+
+Runs a labeled query set through every mode and prints recall@k, MRR,
+refusal rates at MIN_CONFIDENCE_SCORE (plus a threshold sweep) and latency
+side by side, so a faster scorer can be checked for lost relevance.
+
+Modes:
+    hybrid   RetrievalService scoring of every document (what /chat uses today)
+    indexed  BM25 picks --candidates documents, hybrid scoring ranks them
+    bm25     BM25 alone; scores are divided by the query's maximum attainable
+             score so they sit in 0..1 and can be compared with the threshold
+    dense    listed for completeness; there is no embedding backend in this
+             tree yet, so it is reported as unavailable
+
+Labels are JSON lines: {"query": "...", "expected": ["kb:12", "page:https://..."]}.
+An empty "expected" list marks a query that should be refused. Without
+--labels a synthetic corpus is generated (see bench_retrieval) together with
+matching labels; --write-labels saves those for reuse.
+
+Usage:
+    python -m benchmarks.eval_retrieval
+    python -m benchmarks.eval_retrieval --scale 1000 --modes hybrid,indexed --candidates 100
+    python -m benchmarks.eval_retrieval --database-url sqlite:///./app.db --labels labels.jsonl
+"""
+
+import argparse
+import json
+import logging
+import math
+import random
+import statistics
+import tempfile
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.db.base import Base
+from app.models import *  # noqa: F401,F403 - register all tables
+from app.models.kb_qa import KBQA
+from app.models.website_page import WebsitePage
+from app.models.website_source import WebsiteSource
+from app.services.retrieval import RetrievalService
+from benchmarks.bench_retrieval import OFF_TOPIC_QUERIES, generate_corpus, percentile
+
+# Content prefix scored per page, as in RetrievalService.retrieve_website
+PAGE_SCORE_CHARS = 1000
+UNAVAILABLE_MODES = {"dense": "no embedding backend in this tree"}
+
+
+class Document:
+    __slots__ = ("key", "kind", "row", "tokens")
+
+    def __init__(self, key: str, kind: str, row, text: str):
+        self.key = key
+        self.kind = kind
+        self.row = row
+        self.tokens = RetrievalService.normalize_text(text).split()
+
+
+class BM25Index:
+    """In-memory Okapi BM25 over RetrievalService tokenization"""
+
+    def __init__(self, documents: List[Document], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self.lengths = []
+        for doc_index, doc in enumerate(documents):
+            self.lengths.append(len(doc.tokens))
+            for term, tf in Counter(doc.tokens).items():
+                self.postings[term].append((doc_index, tf))
+        self.avg_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0
+        count = len(documents)
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query: str, limit: int) -> List[Tuple[Document, float]]:
+        """Top documents with scores normalised by the query's maximum attainable score"""
+        terms = set(RetrievalService.normalize_text(query).split())
+        scores: Dict[int, float] = defaultdict(float)
+        ceiling = 0.0
+        for term in terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            ceiling += idf * (self.k1 + 1)
+            for doc_index, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.lengths[doc_index] / (self.avg_length or 1))
+                scores[doc_index] += idf * tf * (self.k1 + 1) / (tf + norm)
+        if not scores:
+            return []
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+        return [(self.documents[i], score / ceiling) for i, score in ranked]
+
+
+def load_documents(db: Session) -> List[Document]:
+    """Everything retrieve_kb/retrieve_website would consider"""
+    documents = [
+        Document(f"kb:{row.id}", "kb", row, f"{row.question} {row.answer}")
+        for row in db.query(KBQA).all()
+    ]
+    source_ids = [s.id for s in db.query(WebsiteSource).filter(WebsiteSource.enabled == True).all()]
+    if source_ids:
+        pages = db.query(WebsitePage).filter(
+            WebsitePage.website_source_id.in_(source_ids),
+            WebsitePage.near_duplicate_of.is_(None)
+        ).all()
+        documents += [
+            Document(f"page:{page.url}", "page", page, f"{page.title or ''} {page.content_text}")
+            for page in pages
+        ]
+    return documents
+
+
+def hybrid_score(doc: Document, query: str) -> float:
+    """Same combination as retrieve_kb/retrieve_website"""
+    if doc.kind == "kb":
+        return max(
+            RetrievalService.calculate_score(query, doc.row.question),
+            RetrievalService.calculate_score(query, doc.row.answer) * 0.8
+        )
+    return max(
+        RetrievalService.calculate_score(query, doc.row.title or ""),
+        RetrievalService.calculate_score(query, doc.row.content_text[:PAGE_SCORE_CHARS]) * 0.7
+    )
+
+
+@contextmanager
+def unthresholded(limit: int):
+    """Let RetrievalService return full rankings; thresholds are applied by the evaluator"""
+    saved = (settings.MIN_CONFIDENCE_SCORE, settings.KB_TOP_K, settings.WEBSITE_TOP_K)
+    settings.MIN_CONFIDENCE_SCORE = 0.0
+    settings.KB_TOP_K = settings.WEBSITE_TOP_K = limit
+    try:
+        yield
+    finally:
+        settings.MIN_CONFIDENCE_SCORE, settings.KB_TOP_K, settings.WEBSITE_TOP_K = saved
+
+
+def build_modes(db: Session, documents: List[Document], index: BM25Index, candidates: int) -> Dict[str, Callable]:
+    """name -> rank(query, limit) returning [(doc_key, score)] best first"""
+
+    def hybrid(query: str, limit: int):
+        with unthresholded(limit):
+            kb = RetrievalService.retrieve_kb(db, query)
+            pages = RetrievalService.retrieve_website(db, query)
+        ranked = [(f"kb:{row.id}", score) for row, score in kb]
+        ranked += [(f"page:{page.url}", score) for page, score in pages]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:limit]
+
+    def indexed(query: str, limit: int):
+        rescored = [(doc.key, hybrid_score(doc, query)) for doc, _ in index.search(query, candidates)]
+        rescored.sort(key=lambda item: item[1], reverse=True)
+        return rescored[:limit]
+
+    def bm25(query: str, limit: int):
+        return [(doc.key, score) for doc, score in index.search(query, limit)]
+
+    return {"hybrid": hybrid, "indexed": indexed, "bm25": bm25}
+
+
+def synthetic_labels(db: Session, seed: int) -> List[dict]:
+    """Exact, shuffled, Arabic-script variant, page-title and off-topic queries with their answers"""
+    rng = random.Random(seed + 1)
+    kb_rows = db.query(KBQA).order_by(KBQA.id).all()
+    pages = db.query(WebsitePage).order_by(WebsitePage.id).all()
+    labels = []
+    for row in rng.sample(kb_rows, min(8, len(kb_rows))):
+        labels.append({"query": row.question, "expected": [f"kb:{row.id}"], "kind": "exact"})
+    for row in rng.sample(kb_rows, min(8, len(kb_rows))):
+        words = row.question.split()
+        rng.shuffle(words)
+        labels.append({"query": " ".join(words), "expected": [f"kb:{row.id}"], "kind": "shuffled"})
+    for row in rng.sample(kb_rows, min(4, len(kb_rows))):
+        variant = row.question.replace("ی", "ي").replace("ک", "ك")
+        labels.append({"query": variant, "expected": [f"kb:{row.id}"], "kind": "arabic-script"})
+    for page in rng.sample(pages, min(6, len(pages))):
+        labels.append({"query": page.title, "expected": [f"page:{page.url}"], "kind": "page-title"})
+    for query in OFF_TOPIC_QUERIES:
+        labels.append({"query": query, "expected": [], "kind": "off-topic"})
+    return labels
+
+
+def seed_synthetic(db: Session, scale: int, seed: int):
+    kb_rows, page_rows = generate_corpus(scale, seed)
+    db.add(WebsiteSource(id=1, base_url="https://example.com", enabled=True))
+    db.flush()
+    db.execute(insert(KBQA), kb_rows)
+    db.execute(insert(WebsitePage), page_rows)
+    db.commit()
+
+
+def evaluate(rank: Callable, labels: List[dict], ks: List[int], thresholds: List[float]) -> dict:
+    depth = max(ks)
+    latencies = []
+    hits = {k: 0 for k in ks}
+    reciprocal_ranks = []
+    refused_at = {t: 0 for t in thresholds}
+    false_refusals = 0
+    false_answers = 0
+    answerable = [label for label in labels if label["expected"]]
+
+    rank(labels[0]["query"], depth)  # Warm up caches
+    for label in labels:
+        start = time.perf_counter()
+        ranked = rank(label["query"], depth)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        top_score = ranked[0][1] if ranked else 0.0
+        for threshold in thresholds:
+            refused_at[threshold] += top_score < threshold
+        refused = top_score < settings.MIN_CONFIDENCE_SCORE
+        if not label["expected"]:
+            false_answers += not refused
+            continue
+        false_refusals += refused
+
+        keys = [key for key, _ in ranked]
+        expected = set(label["expected"])
+        first = next((i for i, key in enumerate(keys) if key in expected), None)
+        reciprocal_ranks.append(1 / (first + 1) if first is not None else 0.0)
+        for k in ks:
+            hits[k] += first is not None and first < k
+
+    off_topic = len(labels) - len(answerable)
+    return {
+        "recall": {k: hits[k] / max(len(answerable), 1) for k in ks},
+        "mrr": statistics.mean(reciprocal_ranks) if reciprocal_ranks else 0.0,
+        "refusal_rate": refused_at.get(settings.MIN_CONFIDENCE_SCORE, 0) / len(labels),
+        "refusal_sweep": {t: refused_at[t] / len(labels) for t in thresholds},
+        "false_refusals": false_refusals / max(len(answerable), 1),
+        "false_answers": false_answers / off_topic if off_topic else 0.0,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+    }
+
+
+def print_report(results: Dict[str, dict], ks: List[int], thresholds: List[float]):
+    header = f"{'mode':8s}" + "".join(f" {'R@' + str(k):>6}" for k in ks)
+    header += f" {'MRR':>6} {'refused':>8} {'false-ref':>9} {'false-ans':>9} {'p50 ms':>9} {'p95 ms':>9}"
+    print(header)
+    for mode, r in results.items():
+        if "unavailable" in r:
+            print(f"{mode:8s} unavailable: {r['unavailable']}")
+            continue
+        line = f"{mode:8s}" + "".join(f" {r['recall'][k]:>6.2f}" for k in ks)
+        line += (
+            f" {r['mrr']:>6.3f} {r['refusal_rate']:>8.0%} {r['false_refusals']:>9.0%} "
+            f"{r['false_answers']:>9.0%} {r['p50_ms']:>9.2f} {r['p95_ms']:>9.2f}"
+        )
+        print(line)
+
+    print(f"\nRefusal rate by threshold (MIN_CONFIDENCE_SCORE = {settings.MIN_CONFIDENCE_SCORE:g}):")
+    print(f"{'mode':8s}" + "".join(f" {t:>6.2f}" for t in thresholds))
+    for mode, r in results.items():
+        if "unavailable" not in r:
+            print(f"{mode:8s}" + "".join(f" {r['refusal_sweep'][t]:>6.0%}" for t in thresholds))
+
+
+def parse_floats(value: str) -> List[float]:
+    return [float(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare retrieval modes on recall, MRR, refusals and latency")
+    parser.add_argument("--labels", type=Path, default=None, help="Labeled queries (JSON lines)")
+    parser.add_argument("--database-url", default=None, help="Evaluate against this database instead of a synthetic one")
+    parser.add_argument("--scale", type=int, default=300, help="Synthetic corpus size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--write-labels", type=Path, default=None, help="Save the synthetic labels")
+    parser.add_argument("--modes", default="hybrid,indexed,bm25,dense")
+    parser.add_argument("--k", default="1,3,5", help="Cut-offs for recall@k")
+    parser.add_argument("--candidates", type=int, default=50, help="BM25 candidates rescored in indexed mode")
+    parser.add_argument("--thresholds", default="0.4,0.5,0.6,0.72,0.8", help="Confidence thresholds to sweep")
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    ks = sorted(int(k) for k in args.k.split(",") if k.strip())
+    thresholds = sorted(set(parse_floats(args.thresholds)) | {settings.MIN_CONFIDENCE_SCORE})
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+
+    tmp: Optional[tempfile.TemporaryDirectory] = None
+    if args.database_url:
+        engine = create_engine(args.database_url)
+    else:
+        tmp = tempfile.TemporaryDirectory()
+        engine = create_engine(f"sqlite:///{Path(tmp.name) / 'eval.sqlite'}")
+        Base.metadata.create_all(engine)
+    db = sessionmaker(bind=engine)()
+    try:
+        if not args.database_url:
+            seed_synthetic(db, args.scale, args.seed)
+        if args.labels:
+            labels = [json.loads(line) for line in args.labels.read_text(encoding="utf-8").splitlines() if line.strip()]
+        elif args.database_url:
+            parser.error("--labels is required with --database-url")
+        else:
+            labels = synthetic_labels(db, args.seed)
+        if args.write_labels:
+            args.write_labels.write_text(
+                "".join(json.dumps(label, ensure_ascii=False) + "\n" for label in labels), encoding="utf-8"
+            )
+
+        documents = load_documents(db)
+        start = time.perf_counter()
+        index = BM25Index(documents)
+        index_ms = (time.perf_counter() - start) * 1000
+        available = build_modes(db, documents, index, args.candidates)
+        print(
+            f"{len(documents)} documents, {len(labels)} labeled queries "
+            f"({sum(1 for l in labels if not l['expected'])} should be refused); BM25 index built in {index_ms:.0f} ms\n"
+        )
+
+        results = {}
+        for mode in modes:
+            if mode in available:
+                results[mode] = evaluate(available[mode], labels, ks, thresholds)
+            else:
+                results[mode] = {"unavailable": UNAVAILABLE_MODES.get(mode, "unknown mode")}
+        print_report(results, ks, thresholds)
+    finally:
+        db.close()
+        engine.dispose()
+        if tmp:
+            tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+"""
+Load test POST /chat at a fixed request rate against a stub OpenAI server
+
+By default this starts everything locally: the OpenAI stub
+(app/testing/openai_stub.py), a throwaway SQLite database migrated to head and
+seeded with synthetic KB entries, and the app under uvicorn with
+OPENAI_BASE_URL pointing at the stub. Requests are sent open-loop (on a fixed
+schedule, whether or not earlier ones finished), so latencies include queueing
+delay. Reports throughput, latency percentiles, error rates and how many
+requests reached the LLM.
+
+Usage:
+    python -m benchmarks.load_chat --rps 10 --duration 30
+    python -m benchmarks.load_chat --rps 40 --workers 4 --latency-ms 800 --tokens-per-sec 40 --error-rate 0.05
+    python -m benchmarks.load_chat --target http://127.0.0.1:8000 --rps 5   # existing deployment
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+from sqlalchemy import create_engine, insert
+
+from benchmarks.bench_retrieval import OFF_TOPIC_QUERIES, generate_corpus
+from app.testing.openai_stub import add_stub_arguments, config_from_args, start_stub
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(db_path: Path, kb_size: int, seed: int) -> List[str]:
+    """Migrate a fresh SQLite database, seed KB entries and return the query mix"""
+    env = {**os.environ, "DATABASE_URL": f"sqlite:///{db_path}"}
+    subprocess.run(
+        [sys.executable, "-m", "alembic", "upgrade", "head"],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True
+    )
+    from app.models.kb_qa import KBQA
+    kb_rows, _ = generate_corpus(kb_size * 2, seed)
+    kb_rows = kb_rows[:kb_size]
+    engine = create_engine(f"sqlite:///{db_path}")
+    with engine.begin() as conn:
+        conn.execute(insert(KBQA), kb_rows)
+    engine.dispose()
+
+    # ~70% answerable (LLM called), ~30% refused before the LLM
+    rng = random.Random(seed)
+    queries = [row["question"] for row in rng.sample(kb_rows, min(len(kb_rows), 35))]
+    queries += OFF_TOPIC_QUERIES * 5
+    rng.shuffle(queries)
+    return queries
+
+
+def start_app(port: int, db_path: Path, openai_base_url: str, workers: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "ENV": "production",
+        "DATABASE_URL": f"sqlite:///{db_path}",
+        "OPENAI_API_KEY": "stub-key",
+        "OPENAI_BASE_URL": openai_base_url,
+        "CRAWL_WORKER_ENABLED": "false",
+        "CRAWL_SCHEDULER_ENABLED": "false",
+    }
+    return subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def wait_ready(base_url: str, timeout: float = 30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"App at {base_url} did not become ready in {timeout}s")
+
+
+async def drive(base_url: str, queries: List[str], rps: float, duration: float, timeout: float, max_in_flight: int):
+    """Send requests on a fixed schedule; latency is measured from each request's scheduled time"""
+    results = []
+    limits = httpx.Limits(max_connections=max_in_flight, max_keepalive_connections=max_in_flight)
+    total = int(rps * duration)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        async def one(index: int, scheduled: float):
+            outcome = {"status": None, "openai_called": None, "refused": None}
+            try:
+                response = await client.post("/chat", json={
+                    "message": queries[index % len(queries)],
+                    "session_id": f"load-{index % 50}",
+                })
+                outcome["status"] = response.status_code
+                if response.status_code == 200:
+                    data = response.json()
+                    outcome["openai_called"] = data.get("openai_called")
+                    outcome["refused"] = data.get("refused")
+            except httpx.TimeoutException:
+                outcome["status"] = "timeout"
+            except httpx.HTTPError as e:
+                outcome["status"] = type(e).__name__
+            outcome["latency_ms"] = (time.perf_counter() - scheduled) * 1000
+            results.append(outcome)
+
+        start = time.perf_counter()
+        tasks = []
+        for i in range(total):
+            scheduled = start + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(i, scheduled)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    return results, elapsed
+
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def report(results: List[dict], elapsed: float, rps: float, stub_stats: Optional[dict]):
+    statuses = Counter(r["status"] for r in results)
+    ok = [r for r in results if r["status"] == 200]
+    latencies = [r["latency_ms"] for r in ok]
+    print(f"Requests:    {len(results)} at {rps:g} rps target, {elapsed:.1f}s")
+    print(f"Throughput:  {len(ok) / elapsed:.2f} successful req/s")
+    print(f"Statuses:    {dict(statuses)}")
+    print(f"Error rate:  {(len(results) - len(ok)) / max(len(results), 1):.2%}")
+    if latencies:
+        print(
+            "Latency ms:  "
+            f"p50 {percentile(latencies, 50):.0f}  p90 {percentile(latencies, 90):.0f}  "
+            f"p95 {percentile(latencies, 95):.0f}  p99 {percentile(latencies, 99):.0f}  max {max(latencies):.0f}"
+        )
+        llm = sum(1 for r in ok if r["openai_called"])
+        refused = sum(1 for r in ok if r["refused"])
+        print(f"LLM called:  {llm}/{len(ok)}  refused: {refused}/{len(ok)}")
+    if stub_stats:
+        print(
+            f"Stub:        {stub_stats['requests']} completions, {stub_stats['errors']} injected errors, "
+            f"{stub_stats['prompt_tokens']} prompt / {stub_stats['completion_tokens']} completion tokens"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /chat against a stub OpenAI server")
+    parser.add_argument("--rps", type=float, default=5)
+    parser.add_argument("--duration", type=float, default=20, help="Seconds of load")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--kb-size", type=int, default=100, help="Synthetic KB entries to seed")
+    parser.add_argument("--timeout", type=float, default=60, help="Client timeout per request")
+    parser.add_argument("--max-in-flight", type=int, default=500, help="Client connection cap")
+    parser.add_argument("--target", default=None, help="Load an already running app instead of starting one")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    stub_config = None
+    app_process = None
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        if args.target:
+            base_url = args.target.rstrip("/")
+            queries = [f"سوال شماره {i}" for i in range(20)] + OFF_TOPIC_QUERIES
+        else:
+            stub_config = config_from_args(args)
+            stub_server, stub_url = start_stub(stub_config)
+            db_path = Path(tmp.name) / "load.sqlite"
+            queries = prepare_database(db_path, args.kb_size, args.seed if args.seed is not None else 7)
+            port = free_port()
+            base_url = f"http://127.0.0.1:{port}"
+            app_process = start_app(port, db_path, stub_url, args.workers)
+            wait_ready(base_url)
+            print(
+                f"App: {base_url} ({args.workers} worker(s), {args.kb_size} KB entries); stub: {stub_url} "
+                f"(latency {args.latency_ms:g} ms, {args.tokens_per_sec:g} tok/s, error rate {args.error_rate:g})"
+            )
+
+        results, elapsed = asyncio.run(
+            drive(base_url, queries, args.rps, args.duration, args.timeout, args.max_in_flight)
+        )
+        report(results, elapsed, args.rps, stub_config.stats if stub_config else None)
+    finally:
+        if app_process:
+            app_process.terminate()
+            app_process.wait(timeout=10)
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
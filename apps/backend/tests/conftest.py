@@ -21,12 +21,20 @@ os.environ["SESSION_SECRET"] = "test-secret-key-for-testing-only"
 os.environ["FRONTEND_ORIGIN"] = "http://localhost:3000"
 os.environ["SESSION_IDLE_MINUTES"] = "5"
 os.environ["SESSION_ABSOLUTE_MINUTES"] = "30"
+os.environ["CRAWL_WORKER_ENABLED"] = "false"  # Tests drive CrawlWorker.run_once directly
+os.environ["CRAWL_SCHEDULER_ENABLED"] = "false"
+os.environ["CRAWL_RESPECT_ROBOTS_TXT"] = "false"  # No robots.txt requests from mocked sessions
+os.environ["CRAWL_RATE_LIMIT_DELAY"] = "0"
+os.environ["OPENAI_HEALTH_PROBE_ENABLED"] = "false"  # /health/components probes inline on demand
+os.environ["CONTEXT_TOKENIZER"] = ""  # Byte estimate; tiktoken would download its BPE file
+os.environ["RETRIEVAL_VOCAB_CHECK_SECONDS"] = "0"  # Tests write KB rows directly, bypassing invalidation
 
 # Now import app after env vars are set
 from app.main import app
 from app.db.session import get_db
 from app.db.base import Base
 from app.models import *  # Import all models to ensure they're registered
+from app.services.session_history import session_history
 
 # Create test database engine using absolute path
 # Use absolute path for SQLite to avoid path issues
@@ -104,6 +112,7 @@ def client(db):
             pass
     
     app.dependency_overrides[get_db] = override_get_db
+    session_history.clear()  # Cached turns belong to an earlier test's database
     with TestClient(app) as test_client:
         yield test_client
     app.dependency_overrides.clear()
@@ -0,0 +1,38 @@
+"""
+Test bulk upserts on dialects with and without ON CONFLICT
+"""
+from unittest.mock import patch
+from app.db.bulk import upsert_rows
+from app.models.website_source import WebsiteSource
+from app.models.website_page import WebsitePage
+
+
+def _page(source_id, url, title):
+    return {"website_source_id": source_id, "url": url, "title": title, "content_text": title, "content_hash": url}
+
+
+def test_upsert_without_on_conflict_updates_existing_rows(db):
+    """
+    Test that dialects without ON CONFLICT update rows matching the unique
+    index and insert the rest instead of failing on the duplicates
+    """
+    source = WebsiteSource(base_url="https://example.com", enabled=True)
+    db.add(source)
+    db.commit()
+    upsert_rows(
+        db, WebsitePage, [_page(source.id, "https://example.com/a", "A")],
+        index_elements=["website_source_id", "url"], update_columns=["title"]
+    )
+    db.commit()
+
+    with patch('app.db.bulk.dialect_insert', return_value=None):
+        upsert_rows(
+            db, WebsitePage,
+            [_page(source.id, "https://example.com/a", "A v2"), _page(source.id, "https://example.com/b", "B")],
+            index_elements=["website_source_id", "url"], update_columns=["title"]
+        )
+    db.commit()
+
+    db.expire_all()
+    pages = {p.url: p.title for p in db.query(WebsitePage)}
+    assert pages == {"https://example.com/a": "A v2", "https://example.com/b": "B"}
@@ -82,3 +82,36 @@ def test_chat_refusal_when_kb_empty_and_no_website_sources(client, db):
     assert "reason" in data["missing_info"]
     assert "threshold" in data["missing_info"]
 
+
+
+def test_off_domain_query_refused_by_vocabulary_prefilter(client, db, seed_admin_user):
+    """
+    Test that a query sharing no token with the corpus is refused with
+    NO_VOCAB_OVERLAP without scoring, and KB writes through the admin API
+    refresh the vocabulary
+    """
+    from app.core.config import settings
+    from app.models.kb_qa import KBQA
+    from app.services.retrieval import CorpusVocabulary, RetrievalService
+    
+    db.add(KBQA(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است."))
+    db.commit()
+    
+    with patch.object(RetrievalService, "calculate_score", wraps=RetrievalService.calculate_score) as scorer:
+        response = client.post("/chat", json={"message": "بهترین فیلم سال"})
+        assert not scorer.called
+    
+    data = response.json()
+    assert data["refused"] is True
+    assert data["missing_info"]["reason"] == "NO_VOCAB_OVERLAP"
+    
+    cookies = client.post("/auth/login", json={"username": "admin", "password": "admin123"}).cookies
+    with patch.object(settings, "RETRIEVAL_VOCAB_CHECK_SECONDS", 3600):
+        assert not CorpusVocabulary.may_match(db, "بهترین فیلم سال")
+        created = client.post(
+            "/admin/kb/qa",
+            json={"question": "بهترین فیلم سال", "answer": "فیلم سال در منابع معرفی شده است."},
+            cookies=cookies
+        )
+        assert created.status_code == 201
+        assert CorpusVocabulary.may_match(db, "بهترین فیلم سال")
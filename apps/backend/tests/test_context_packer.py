@@ -0,0 +1,77 @@
+"""
+Test token-budgeted context packing
+"""
+from types import SimpleNamespace
+from unittest.mock import patch
+from app.core.config import settings
+from app.services.answer_guard import AnswerGuardService
+from app.services.context_packer import ContextPackerService
+
+FILLER = "The store also sells gift cards, stationery and seasonal decorations in every branch."
+
+
+def _kb(question, answer):
+    return SimpleNamespace(question=question, answer=answer)
+
+
+def _page(title, content, url="https://example.com/page"):
+    return SimpleNamespace(title=title, content_text=content, url=url)
+
+
+def _result(kb=(), web=()):
+    return {"kb_results": list(kb), "website_results": list(web)}
+
+
+def test_context_stays_within_budget_and_drops_lowest_scores():
+    """
+    Test that sources are taken best score first and the rest are dropped once the budget is spent
+    """
+    kb = [(_kb(f"Question {i}?", " ".join([FILLER] * 3)), score) for i, score in enumerate((0.8, 0.95, 0.75))]
+
+    with patch.object(settings, "CONTEXT_TOKEN_BUDGET", 200):
+        stats = {}
+        context = AnswerGuardService.build_context(_result(kb=kb), query="gift cards", stats=stats)
+
+    assert ContextPackerService.count_tokens(context) <= 200
+    assert stats["context_tokens"] <= 200
+    assert stats["sources_dropped"] >= 1
+    assert stats["tokens_saved"] > 0
+    assert stats["tokens_saved"] == stats["baseline_tokens"] - stats["context_tokens"]
+    assert stats["tokenizer"] == "estimate"
+    # Highest scored source comes first, the lowest is dropped
+    assert context.index("Question 1?") < context.index("Question 0?")
+    assert "Question 2?" not in context
+
+
+def test_long_page_keeps_query_relevant_sentences():
+    """
+    Test that a page longer than its share of the budget is cut down to the sentences matching the query
+    """
+    content = " ".join([FILLER] * 30) + " Orders over 50 dollars ship free to Tehran. " + " ".join([FILLER] * 30)
+    web = [(_page("Shipping", content), 0.9)]
+
+    with patch.object(settings, "CONTEXT_SOURCE_TOKEN_CAP", 60):
+        stats = {}
+        context = AnswerGuardService.build_context(_result(web=web), query="free shipping to Tehran", stats=stats)
+
+    assert "Orders over 50 dollars ship free to Tehran." in context
+    assert "=== Website Content ===" in context
+    assert "URL: https://example.com/page" in context
+    assert stats["sources_trimmed"] == 1
+    assert stats["context_tokens"] < stats["baseline_tokens"]
+
+
+def test_short_sources_are_kept_whole():
+    """
+    Test that sources within budget are passed through unchanged
+    """
+    kb = [(_kb("ساعات کاری شما چیست؟", "ساعات کاری ما از 9 صبح تا 6 عصر است."), 1.0)]
+
+    stats = {}
+    context = AnswerGuardService.build_context(_result(kb=kb), stats=stats)
+
+    assert context.startswith("=== Knowledge Base ===\nQ: ساعات کاری شما چیست؟\nA: ساعات کاری ما از 9 صبح تا 6 عصر است.")
+    assert stats["sources_included"] == 1
+    assert stats["sources_trimmed"] == 0
+    assert stats["sources_dropped"] == 0
+    assert stats["tokens_saved"] == 0  # Same text the unpacked context would have sent
@@ -0,0 +1,256 @@
+"""
+Test persistent crawl job queue and worker
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch
+from sqlalchemy.orm import sessionmaker
+from app.models.crawl_job import CrawlJob
+from app.models.website_source import WebsiteSource
+from app.models.website_page import WebsitePage
+from app.services.crawl_queue import CrawlQueueService
+from app.services.crawl_worker import CrawlWorker
+from app.services.crawl_progress import CrawlProgressRegistry
+
+BASE_URL = "https://example.com"
+PAGE_HTML = "<html><head><title>{title}</title></head><body><p>{title} page body text that is long enough to be stored by the crawler.</p></body></html>"
+
+
+def _login(client):
+    response = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200
+    return response.cookies
+
+
+def _session_factory(db):
+    """Sessions on the test database for the worker (it opens its own)"""
+    return sessionmaker(autocommit=False, autoflush=False, bind=db.get_bind())
+
+
+def _create_source(db):
+    source = WebsiteSource(base_url=BASE_URL, enabled=True)
+    db.add(source)
+    db.commit()
+    db.refresh(source)
+    return source
+
+
+def test_recrawl_enqueues_single_active_job(client, db, seed_admin_user):
+    """
+    Test that repeated recrawl requests share one queued job per source
+    """
+    source = _create_source(db)
+    cookies = _login(client)
+
+    first = client.post(f"/admin/website/{source.id}/recrawl", cookies=cookies)
+    second = client.post(f"/admin/website/{source.id}/recrawl", cookies=cookies)
+
+    assert first.status_code == 200
+    assert first.json()["status"] == "queued"
+    assert first.json()["message"] == "Crawl queued"
+    assert second.json()["job_id"] == first.json()["job_id"]
+    assert second.json()["message"] == "Crawl already in progress"
+    assert db.query(CrawlJob).count() == 1
+
+    # Only one worker can claim the job
+    job = CrawlQueueService.claim_next(db, "worker-a")
+    assert job.id == first.json()["job_id"]
+    assert job.status == "running"
+    assert CrawlQueueService.claim_next(db, "worker-b") is None
+
+
+def test_worker_runs_job_and_allows_next_crawl(db):
+    """
+    Test that the worker completes a queued job and frees the source for a new one
+    """
+    source = _create_source(db)
+    site = {f"{BASE_URL}/{name}": PAGE_HTML.format(title=name) for name in ("a", "b")}
+    job, _ = CrawlQueueService.enqueue(db, source.id)
+
+    worker = CrawlWorker(session_factory=_session_factory(db), worker_id="worker-test")
+    with patch.object(worker.ingest_service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(worker.ingest_service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)):
+        assert worker.run_once() is True
+    assert worker.run_once() is False
+
+    db.expire_all()
+    job = db.query(CrawlJob).filter(CrawlJob.id == job.id).first()
+    assert job.status == "done"
+    assert job.frontier is None
+    assert db.query(WebsitePage).count() == 2
+
+    new_job, created = CrawlQueueService.enqueue(db, source.id)
+    assert created is True
+    assert new_job.id != job.id
+
+
+def test_stale_job_resumes_from_checkpointed_frontier(db):
+    """
+    Test that a job abandoned mid-crawl is requeued and resumes without rediscovery
+    """
+    source = _create_source(db)
+    site = {f"{BASE_URL}/{name}": PAGE_HTML.format(title=name) for name in ("a", "b", "c")}
+    job = CrawlJob(
+        website_source_id=source.id,
+        status="running",
+        locked_by="dead-worker",
+        attempts=1,
+        frontier=[f"{BASE_URL}/b", f"{BASE_URL}/c"],
+        heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+    )
+    db.add(job)
+    db.commit()
+
+    worker = CrawlWorker(session_factory=_session_factory(db), worker_id="worker-test")
+    with patch.object(worker.ingest_service.fetcher, 'crawl_from_base') as mock_discover, \
+         patch.object(worker.ingest_service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)) as mock_download:
+        assert worker.run_once() is True
+
+    mock_discover.assert_not_called()
+    assert [c.args[0] for c in mock_download.call_args_list] == [f"{BASE_URL}/b", f"{BASE_URL}/c"]
+
+    db.expire_all()
+    job = db.query(CrawlJob).filter(CrawlJob.id == job.id).first()
+    assert job.status == "done"
+    assert job.attempts == 2
+    assert sorted(p.url for p in db.query(WebsitePage)) == [f"{BASE_URL}/b", f"{BASE_URL}/c"]
+
+
+def test_crawl_progress_is_live_during_crawl_and_persisted_on_job(client, db, seed_admin_user):
+    """
+    Test that progress counters are visible while crawling and kept on the job afterwards
+    """
+    source = _create_source(db)
+    site = {f"{BASE_URL}/{name}": PAGE_HTML.format(title=name) for name in ("a", "b", "c")}
+    site[f"{BASE_URL}/c"] = None  # fetch failure
+    job, _ = CrawlQueueService.enqueue(db, source.id)
+    cookies = _login(client)
+    seen = []
+
+    def download(url, **kwargs):
+        progress = CrawlProgressRegistry.get(source.id)
+        seen.append((progress.phase, progress.urls_discovered, progress.pages_fetched))
+        return site.get(url)
+
+    worker = CrawlWorker(session_factory=_session_factory(db), worker_id="worker-test")
+    with patch.object(worker.ingest_service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(worker.ingest_service.fetcher, 'download_page', side_effect=download):
+        assert worker.run_once() is True
+
+    assert seen == [("fetching", 3, 0), ("fetching", 3, 1), ("fetching", 3, 2)]
+    assert CrawlProgressRegistry.get(source.id) is None
+
+    db.expire_all()  # The endpoint shares the test session
+    response = client.get(f"/admin/website/{source.id}/status", cookies=cookies)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["job_id"] == job.id
+    progress = data["progress"]
+    assert progress["phase"] == "finished"
+    assert progress["live"] is False
+    assert progress["urls_discovered"] == 3
+    assert progress["pages_fetched"] == 2
+    assert progress["pages_failed"] == 1
+    assert progress["eta_seconds"] == 0.0
+
+
+def test_requeue_stale_resets_source_status(db):
+    """
+    Test that requeueing an abandoned job also moves its source out of "running"
+    """
+    source = _create_source(db)
+    source.crawl_status = "running"
+    db.add(CrawlJob(
+        website_source_id=source.id,
+        status="running",
+        locked_by="dead-worker",
+        heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+    ))
+    db.commit()
+
+    assert CrawlQueueService.requeue_stale(db, 60) == 1
+
+    db.expire_all()
+    assert db.query(CrawlJob).one().status == "queued"
+    assert db.query(WebsiteSource).one().crawl_status == "queued"
+
+
+def test_requeue_stale_fails_jobs_out_of_attempts(db):
+    """
+    Test that an abandoned job already claimed max_attempts times is failed
+    instead of being requeued again
+    """
+    source = _create_source(db)
+    source.crawl_status = "running"
+    db.add(CrawlJob(
+        website_source_id=source.id,
+        status="running",
+        locked_by="dead-worker",
+        attempts=3,
+        heartbeat_at=datetime.utcnow() - timedelta(hours=1)
+    ))
+    db.commit()
+
+    assert CrawlQueueService.requeue_stale(db, 60, max_attempts=3) == 0
+
+    db.expire_all()
+    job = db.query(CrawlJob).one()
+    assert job.status == "failed"
+    assert job.locked_by is None
+    assert job.finished_at is not None
+    assert db.query(WebsiteSource).one().crawl_status == "failed"
+
+
+def test_worker_does_not_report_a_job_it_no_longer_holds_as_finished(db):
+    """
+    Test that when finish() finds the lock gone the worker logs a warning
+    instead of "Crawl job finished"
+    """
+    source = _create_source(db)
+    CrawlQueueService.enqueue(db, source.id)
+    worker = CrawlWorker(session_factory=_session_factory(db), worker_id="worker-a")
+
+    with patch.object(worker.ingest_service, 'ingest_website', return_value={"success": True, "message": "ok"}), \
+         patch.object(CrawlQueueService, 'finish', return_value=False), \
+         patch('app.services.crawl_worker.logger') as mock_logger:
+        assert worker.run_once() is True
+
+    messages = [c.args[0] for c in mock_logger.info.call_args_list]
+    assert "Crawl job finished" not in messages
+    assert any("lock lost" in c.args[0] for c in mock_logger.warning.call_args_list)
+
+
+def test_lost_heartbeat_aborts_the_running_crawl(db):
+    """
+    Test that once the heartbeat finds the job held by another worker, the ingest
+    stops before writing further pages
+    """
+    import time
+    source = _create_source(db)
+    site = {f"{BASE_URL}/{name}": PAGE_HTML.format(title=name) for name in ("a", "b", "c")}
+    job, _ = CrawlQueueService.enqueue(db, source.id)
+    session_factory = _session_factory(db)
+
+    def download(url, **kwargs):
+        if url.endswith("/b"):
+            # Another worker takes the job over while this page downloads
+            other = session_factory()
+            other.query(CrawlJob).filter(CrawlJob.id == job.id).update({"locked_by": "worker-other"})
+            other.commit()
+            other.close()
+            time.sleep(0.3)
+        return site.get(url)
+
+    worker = CrawlWorker(session_factory=session_factory, worker_id="worker-test")
+    with patch('app.services.crawl_worker.settings.CRAWL_JOB_HEARTBEAT_SECONDS', 0.05), \
+         patch('app.services.website_ingest.settings.INGEST_BATCH_SIZE', 1), \
+         patch.object(worker.ingest_service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(worker.ingest_service.fetcher, 'download_page', side_effect=download) as mock_download:
+        assert worker.run_once() is True
+
+    assert [c.args[0] for c in mock_download.call_args_list] == [f"{BASE_URL}/a", f"{BASE_URL}/b"]
+    db.expire_all()
+    # Page a was still waiting for its batch flush when the job was lost
+    assert db.query(WebsitePage).count() == 0
+    job = db.query(CrawlJob).filter(CrawlJob.id == job.id).one()
+    assert job.status == "running"
+    assert job.locked_by == "worker-other"
@@ -0,0 +1,115 @@
+"""
+Test scheduled recrawls and conditional GET on recrawl
+"""
+from datetime import datetime, timedelta
+from unittest.mock import patch, MagicMock
+from app.models.crawl_job import CrawlJob
+from app.models.website_source import WebsiteSource
+from app.models.website_page import WebsitePage
+from app.services.crawl_queue import CrawlQueueService
+from app.services.crawl_scheduler import CrawlScheduler
+from app.services.website_ingest import WebsiteIngestService
+
+BASE_URL = "https://example.com"
+PAGE_HTML = "<html><head><title>{title}</title></head><body><p>{title} page body text that is long enough to be stored by the crawler.</p></body></html>"
+
+
+def _add_source(db, base_url, last_crawled_hours_ago=None, interval=None, enabled=True):
+    source = WebsiteSource(base_url=base_url, enabled=enabled, recrawl_interval_hours=interval)
+    if last_crawled_hours_ago is not None:
+        source.last_crawled_at = datetime.utcnow() - timedelta(hours=last_crawled_hours_ago)
+    db.add(source)
+    db.commit()
+    db.refresh(source)
+    return source
+
+
+def test_schedule_due_queues_staggered_jobs_and_skips_recent_sources(db):
+    """
+    Test that only due, enabled sources are queued, with start times inside the stagger window
+    """
+    never_crawled = _add_source(db, "https://a.example.com")
+    recent = _add_source(db, "https://b.example.com", last_crawled_hours_ago=1)
+    short_interval = _add_source(db, "https://c.example.com", last_crawled_hours_ago=3, interval=2)
+    unscheduled = _add_source(db, "https://d.example.com", last_crawled_hours_ago=100, interval=0)
+    disabled = _add_source(db, "https://e.example.com", enabled=False)
+
+    now = datetime.utcnow()
+    with patch('app.services.crawl_scheduler.settings.CRAWL_DEFAULT_RECRAWL_HOURS', 24), \
+         patch('app.services.crawl_scheduler.settings.CRAWL_SCHEDULE_STAGGER_SECONDS', 600):
+        created = CrawlScheduler.schedule_due(db, now=now)
+        # Already queued sources are not queued twice
+        assert CrawlScheduler.schedule_due(db, now=now) == []
+
+    jobs = {job.website_source_id: job for job in db.query(CrawlJob)}
+    assert sorted(created) == sorted(job.id for job in jobs.values())
+    assert set(jobs) == {never_crawled.id, short_interval.id}
+    for job in jobs.values():
+        assert job.request_id == "scheduler"
+        assert now <= job.run_after < now + timedelta(seconds=600)
+
+    # Staggered jobs are not claimed before their start time
+    db.query(CrawlJob).update({"run_after": now + timedelta(hours=1)})
+    db.commit()
+    assert CrawlQueueService.claim_next(db, "worker-test") is None
+    db.query(CrawlJob).filter(CrawlJob.website_source_id == never_crawled.id).update({"run_after": now})
+    db.commit()
+    assert CrawlQueueService.claim_next(db, "worker-test").website_source_id == never_crawled.id
+
+
+def _conditional_response(html, etag, request_headers):
+    """Mock a streamed response that answers 304 when If-None-Match matches etag"""
+    mock_response = MagicMock()
+    if request_headers and request_headers.get('If-None-Match') == etag:
+        mock_response.status_code = 304
+        mock_response.headers = {'ETag': etag}
+        mock_response.iter_content.side_effect = AssertionError("304 has no body")
+    else:
+        body = html.encode("utf-8")
+        mock_response.status_code = 200
+        mock_response.headers = {'Content-Type': 'text/html; charset=utf-8', 'ETag': etag}
+        mock_response.iter_content.side_effect = lambda chunk_size: iter([body])
+    mock_response.__enter__.return_value = mock_response
+    return mock_response
+
+
+def test_recrawl_uses_conditional_get_for_stored_pages(db):
+    """
+    Test that a recrawl sends stored ETags and treats 304 responses as unchanged
+    """
+    source = _add_source(db, BASE_URL)
+    site = {
+        f"{BASE_URL}/a": (PAGE_HTML.format(title="a"), '"a-v1"'),
+        f"{BASE_URL}/b": (PAGE_HTML.format(title="b"), '"b-v1"'),
+    }
+    service = WebsiteIngestService()
+
+    def get(url, headers=None, **kwargs):
+        html, etag = site[url]
+        return _conditional_response(html, etag, headers)
+
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(service.fetcher.session, 'get', side_effect=get) as mock_get:
+        first = service.ingest_website(db, source.id)
+        assert first["pages_count"] == 2
+        assert all(call.kwargs["headers"] is None for call in mock_get.call_args_list)
+
+        # b changes on the server; a is answered with 304
+        site[f"{BASE_URL}/b"] = (PAGE_HTML.format(title="b2"), '"b-v2"')
+        mock_get.reset_mock()
+        second = service.ingest_website(db, source.id)
+
+    assert [call.kwargs["headers"] for call in mock_get.call_args_list] == [
+        {'If-None-Match': '"a-v1"'},
+        {'If-None-Match': '"b-v1"'},
+    ]
+    assert second["success"] is True
+    assert second["pages_not_modified"] == 1
+    assert second["pages_unchanged"] == 1
+    assert second["pages_count"] == 1
+
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage)}
+    assert pages[f"{BASE_URL}/a"].etag == '"a-v1"'
+    assert pages[f"{BASE_URL}/b"].etag == '"b-v2"'
+    assert pages[f"{BASE_URL}/b"].title == "b2"
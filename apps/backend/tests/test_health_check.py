@@ -58,3 +58,43 @@ def test_health_components_checks_all_components(client, db):
 
 
 
+
+
+def test_lifespan_shares_one_pooled_llm_client():
+    """
+    Test that chat and health use the same LLM service, whose pooled client is
+    opened in lifespan and closed on shutdown
+    """
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.routers import chat, health
+    from app.services.llm import llm_service
+
+    assert chat.llm_service is health.openai_health_probe.service is llm_service
+
+    with TestClient(app):
+        http_client = llm_service._http_client
+        assert http_client is not None
+        assert llm_service.client._client is http_client
+
+    assert http_client.is_closed
+    assert llm_service._http_client is None
+
+
+def test_openai_status_is_served_from_cached_probe(client, db):
+    """
+    Test that repeated /health/components calls reuse the cached OpenAI probe
+    instead of calling the upstream every time
+    """
+    from app.services.health_probe import openai_health_probe
+
+    openai_health_probe._result = None
+    with patch.object(openai_health_probe.service, "test_connection", return_value=(True, "ok")) as probe:
+        first = client.get("/health/components")
+        second = client.get("/health/components")
+
+    assert probe.call_count == 1
+    assert first.json()["openai"]["status"] == "ok"
+    assert second.json()["openai"]["status"] == "ok"
+    assert "checked" in second.json()["openai"]["message"]
+    openai_health_probe._result = None
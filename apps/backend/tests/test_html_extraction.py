@@ -0,0 +1,79 @@
+"""
+Test lxml HTML extraction matches the BeautifulSoup reference implementation
+"""
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+from app.services.html_extractor import HTMLExtractorService
+from app.services.website_fetcher import WebsiteFetcherService
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "html"
+FIXTURE_FILES = sorted(FIXTURES_DIR.glob("*.html"))
+
+
+@pytest.mark.parametrize("fixture_path", FIXTURE_FILES, ids=[p.name for p in FIXTURE_FILES])
+def test_lxml_extraction_matches_soup(fixture_path):
+    """
+    Test that the lxml engine produces the same title and text as html.parser
+    """
+    html = fixture_path.read_text(encoding="utf-8")
+
+    lxml_result = HTMLExtractorService.extract_with_lxml(html)
+    soup_result = HTMLExtractorService.extract_with_soup(html)
+
+    assert lxml_result == soup_result
+
+
+def test_lxml_extraction_strips_unwanted_content():
+    """
+    Test that scripts, navigation and ad/analytics classes are removed but tails kept
+    """
+    html = (FIXTURES_DIR / "main_with_nested_noise.html").read_text(encoding="utf-8")
+
+    title, content_text = HTMLExtractorService.extract_with_lxml(html)
+
+    assert title == "Pricing & Plans"
+    assert "track(" not in content_text
+    assert "tracking pixel" not in content_text
+    assert "We use cookies" not in content_text
+    assert "Enable JavaScript" not in content_text
+    # main wins over the following article
+    assert "Secondary article" not in content_text
+    # Text following a removed <script> is preserved
+    assert "per month. It includes phone support." in content_text
+
+
+def test_lxml_extraction_handles_empty_and_xml_declared_documents():
+    """
+    Test that empty input returns None and XML-declared documents still parse
+    """
+    assert HTMLExtractorService.extract_with_lxml("") is None
+    assert HTMLExtractorService.extract_with_lxml("   \n") is None
+
+    html = '<?xml version="1.0" encoding="utf-8"?><html><head><title>T</title></head><body><p>سلام دنیا</p></body></html>'
+    assert HTMLExtractorService.extract_with_lxml(html) == ("T", "سلام دنیا")
+
+
+def test_fetch_page_uses_configured_engine():
+    """
+    Test that fetch_page returns extracted content and hash through the extractor
+    """
+    fetcher = WebsiteFetcherService()
+    html = (FIXTURES_DIR / "div_content_class.html").read_text(encoding="utf-8")
+
+    with patch.object(fetcher.session, 'get') as mock_get:
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {'Content-Type': 'text/html; charset=utf-8'}
+        mock_response.iter_content.side_effect = lambda chunk_size: iter([html.encode('utf-8')])
+        mock_response.__enter__.return_value = mock_response
+        mock_get.return_value = mock_response
+
+        with patch('app.services.website_fetcher.settings.HTML_EXTRACTOR_ENGINE', 'lxml'):
+            lxml_result = fetcher.fetch_page("https://example.com/shipping")
+        with patch('app.services.website_fetcher.settings.HTML_EXTRACTOR_ENGINE', 'soup'):
+            soup_result = fetcher.fetch_page("https://example.com/shipping")
+
+    assert lxml_result is not None
+    assert lxml_result == soup_result
+    assert lxml_result[0] == "Shipping information"
@@ -0,0 +1,166 @@
+"""
+Test LLM retries, hedging and the circuit breaker
+"""
+import threading
+import time
+import httpx
+import pytest
+from unittest.mock import MagicMock, patch
+from openai import APITimeoutError, BadRequestError, InternalServerError
+from app.core.config import settings
+from app.services.llm import LLMService
+from app.services.llm_resilience import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+REQUEST = httpx.Request("POST", "https://api.openai.com/v1/chat/completions")
+
+
+def _timeout():
+    return APITimeoutError(request=REQUEST)
+
+
+def _status_error(cls, status):
+    return cls("upstream error", response=httpx.Response(status, request=REQUEST), body=None)
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff():
+    with patch.object(settings, "LLM_RETRY_BASE_BACKOFF_SECONDS", 0), \
+         patch.object(settings, "LLM_RETRY_MAX_BACKOFF_SECONDS", 0):
+        yield
+
+
+def test_transient_errors_are_retried():
+    """
+    Test that timeouts and 5xx are retried and the call succeeds within LLM_MAX_RETRIES
+    """
+    outcomes = [_timeout(), _status_error(InternalServerError, 503), "answer"]
+    timeouts = []
+
+    def call(timeout):
+        timeouts.append(timeout)
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    stats = {}
+    with patch.object(settings, "LLM_MAX_RETRIES", 2):
+        assert ResilientCaller().call(call, stats=stats) == "answer"
+    assert stats["attempts"] == 3
+    # Every attempt gets at most the per-attempt timeout
+    assert all(t <= settings.OPENAI_TIMEOUT for t in timeouts)
+
+
+def test_non_transient_errors_are_not_retried():
+    """
+    Test that a 400 is raised straight away
+    """
+    call = MagicMock(side_effect=_status_error(BadRequestError, 400))
+    with pytest.raises(BadRequestError):
+        ResilientCaller().call(call)
+    assert call.call_count == 1
+
+
+def test_circuit_opens_fails_fast_and_recovers():
+    """
+    Test that consecutive failures open the breaker, calls then fail without reaching
+    the upstream, and a successful trial call after the cool-down closes it again
+    """
+    with patch.object(settings, "LLM_MAX_RETRIES", 0), \
+         patch.object(settings, "LLM_BREAKER_FAILURE_THRESHOLD", 2), \
+         patch.object(settings, "LLM_BREAKER_OPEN_SECONDS", 0.2):
+        caller = ResilientCaller()
+        failing = MagicMock(side_effect=_timeout())
+        for _ in range(2):
+            with pytest.raises(APITimeoutError):
+                caller.call(failing)
+        assert caller.breaker.state == CircuitBreaker.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            caller.call(failing)
+        assert failing.call_count == 2
+
+        time.sleep(0.25)
+        assert caller.call(lambda timeout: "ok") == "ok"
+        assert caller.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_slow_call_is_hedged():
+    """
+    Test that a call running past the latency percentile is raced by a duplicate
+    request from the hedge pool, while the primary runs in the caller's thread
+    """
+    caller_thread = threading.current_thread()
+    threads = []
+
+    def call(timeout):
+        threads.append(threading.current_thread())
+        if len(threads) == 1:
+            time.sleep(0.5)  # The first request hangs until it times out
+            raise _timeout()
+        return "fast"
+
+    with patch.object(settings, "LLM_HEDGE_PERCENTILE", 95), \
+         patch.object(settings, "LLM_HEDGE_MIN_SAMPLES", 3):
+        caller = ResilientCaller()
+        for _ in range(3):
+            caller.latency.record(0.05)
+        stats = {}
+        assert caller.call(call, stats=stats) == "fast"
+        caller.close()
+
+    assert stats["hedged"] is True
+    assert stats["attempts"] == 1
+    assert threads[0] is caller_thread
+    assert threads[1] is not caller_thread
+
+
+def test_fast_call_is_not_hedged():
+    """
+    Test that a primary finishing before the percentile never starts a hedge
+    """
+    calls = []
+
+    def call(timeout):
+        calls.append(timeout)
+        return "ok"
+
+    with patch.object(settings, "LLM_HEDGE_PERCENTILE", 95), \
+         patch.object(settings, "LLM_HEDGE_MIN_SAMPLES", 3):
+        caller = ResilientCaller()
+        for _ in range(3):
+            caller.latency.record(0.2)
+        stats = {}
+        assert caller.call(call, stats=stats) == "ok"
+        time.sleep(0.3)
+
+    assert stats["hedged"] is False
+    assert len(calls) == 1
+
+
+def test_open_circuit_serves_cached_answer():
+    """
+    Test that while the circuit is open LLMService answers repeated questions from its
+    cache and refuses others without calling OpenAI
+    """
+    service = LLMService()
+    context = "Q: ساعات کاری شما چیست؟\nA: ساعات کاری ما از 9 صبح تا 6 عصر است."
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "ساعات کاری ما از 9 صبح تا 6 عصر است."
+    service.client = MagicMock()
+    service.client.chat.completions.create.return_value = response
+
+    answer = service.generate_answer("ساعات کاری شما چیست؟", context, [])
+    assert "9 صبح" in answer
+
+    service.resilience.breaker.state = CircuitBreaker.OPEN
+    service.resilience.breaker.opened_at = time.monotonic()
+    service.client.chat.completions.create.reset_mock()
+
+    assert service.generate_answer("ساعات کاری شما چیست؟", context, []) == answer
+    assert service.generate_answer("هزینه ارسال چقدر است؟", context, []) == LLMService.UNAVAILABLE_MESSAGE
+    routed = service.generate_routed_answer("هزینه ارسال چقدر است؟", context, [], {"kb_results": []})
+    assert routed["answer"] == LLMService.UNAVAILABLE_MESSAGE
+    assert routed["llm_called"] is False
+    service.client.chat.completions.create.assert_not_called()
@@ -0,0 +1,71 @@
+"""
+Test answer routing: stored KB answers, fast model and default model
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.core.config import settings
+from app.models.kb_qa import KBQA
+from app.services.llm import LLMRouteStats, LLMService
+
+CONTEXT = "=== Knowledge Base ===\nQ: ساعات کاری شما چیست؟\nA: ساعات کاری ما از 9 صبح تا 6 عصر است.\n"
+
+
+def _mock_client(content="ساعات کاری ما از 9 صبح تا 6 عصر است."):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage = SimpleNamespace(prompt_tokens=120, completion_tokens=15, total_tokens=135)
+    client = MagicMock()
+    client.chat.completions.create.return_value = response
+    return client
+
+
+def test_high_confidence_kb_hit_returns_stored_answer(client, db):
+    """
+    Test that a KB hit above LLM_DIRECT_ANSWER_MIN_SCORE is answered without calling OpenAI
+    """
+    db.add(KBQA(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است."))
+    db.commit()
+    mock_client = _mock_client()
+
+    with patch.object(settings, "LLM_DIRECT_ANSWER_MIN_SCORE", 0.95), \
+         patch('app.routers.chat.llm_service.client', mock_client):
+        response = client.post("/chat", json={"message": "ساعات کاری شما چیست؟"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["answer"] == "ساعات کاری ما از 9 صبح تا 6 عصر است."
+    assert data["refused"] is False
+    assert data["openai_called"] is False
+    assert len(data["sources"]) == 1
+    mock_client.chat.completions.create.assert_not_called()
+
+
+def test_short_context_uses_fast_model_and_records_usage():
+    """
+    Test that short contexts go to OPENAI_FAST_MODEL, longer ones to OPENAI_MODEL,
+    and per-route latency and tokens are recorded
+    """
+    LLMRouteStats.reset()
+    service = LLMService()
+    service.client = _mock_client()
+    kb_item = SimpleNamespace(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است.")
+    retrieval_result = {"kb_results": [(kb_item, 0.8)], "website_results": []}
+
+    with patch.object(settings, "OPENAI_FAST_MODEL", "fast-model"), \
+         patch.object(settings, "LLM_FAST_MODEL_MAX_CONTEXT_TOKENS", 100):
+        fast = service.generate_routed_answer("ساعات کاری؟", CONTEXT, [], retrieval_result, context_tokens=40)
+        default = service.generate_routed_answer("ساعات کاری؟", CONTEXT, [], retrieval_result, context_tokens=400)
+
+    assert fast["route"] == LLMService.ROUTE_FAST_MODEL
+    assert fast["model"] == "fast-model"
+    assert default["route"] == LLMService.ROUTE_DEFAULT_MODEL
+    assert default["model"] == settings.OPENAI_MODEL
+    models = [c.kwargs["model"] for c in service.client.chat.completions.create.call_args_list]
+    assert models == ["fast-model", settings.OPENAI_MODEL]
+    assert fast["prompt_tokens"] == 120 and fast["completion_tokens"] == 15
+
+    stats = LLMRouteStats.snapshot()
+    assert stats[LLMService.ROUTE_FAST_MODEL]["calls"] == 1
+    assert stats[LLMService.ROUTE_FAST_MODEL]["prompt_tokens"] == 120
+    assert stats[LLMService.ROUTE_DEFAULT_MODEL]["completion_tokens"] == 15
@@ -0,0 +1,135 @@
+"""
+Test SimHash near-duplicate detection at ingest
+"""
+import pytest
+from unittest.mock import patch
+from app.models.website_source import WebsiteSource
+from app.models.website_page import WebsitePage
+from app.services.near_duplicate import SimHashIndex, SimHashService
+from app.services.retrieval import RetrievalService
+from app.services.website_ingest import WebsiteIngestService
+
+BASE_URL = "https://shop.example.com"
+
+TEMPLATE_PARAGRAPHS = [
+    "Our store ships every order from the central warehouse within two business days of payment confirmation.",
+    "Customers can track each parcel online and receive email updates at every step of the delivery process.",
+    "Returns are accepted within fourteen days when the product is unused and still in its original packaging.",
+    "The support team answers questions by phone and chat from nine in the morning until six in the evening.",
+    "Gift wrapping is available for a small fee and can be selected on the checkout page before payment.",
+]
+
+
+def _product_page(name: str, price: str) -> str:
+    paragraphs = "".join(f"<p>{text}</p>" for text in TEMPLATE_PARAGRAPHS)
+    return (
+        f"<html><head><title>{name}</title></head><body><main>"
+        f"<h1>{name}</h1>{paragraphs}<p>Price: {price}</p>"
+        f"</main></body></html>"
+    )
+
+
+def test_simhash_distance_small_for_near_duplicates():
+    """
+    Test that one changed sentence keeps signatures within the LSH distance
+    """
+    text = " ".join(TEMPLATE_PARAGRAPHS)
+    base = SimHashService.compute(text + " Price: 10 dollars")
+    variant = SimHashService.compute(text + " Price: 12 dollars")
+    unrelated = SimHashService.compute(
+        "Persian calligraphy developed over centuries with many distinct scripts such as "
+        "nastaliq and shekasteh used in poetry manuscripts and official court documents"
+    )
+
+    assert SimHashService.compute("too short") is None
+    assert SimHashService.hamming_distance(base, variant) <= 3
+
+    index = SimHashIndex(max_distance=3)
+    index.add("a", base)
+    index.add("b", unrelated)
+    assert index.find(variant) == "a"
+    assert index.find(variant, exclude="a") is None
+
+
+def test_ingest_collapses_near_duplicate_pages(db):
+    """
+    Test that near-duplicate pages are stored but excluded from retrieval
+    """
+    source = WebsiteSource(base_url=BASE_URL, enabled=True)
+    db.add(source)
+    db.commit()
+    db.refresh(source)
+
+    site = {
+        f"{BASE_URL}/red-mug": _product_page("Red mug", "10 dollars"),
+        f"{BASE_URL}/blue-mug": _product_page("Red mug", "12 dollars"),
+    }
+    service = WebsiteIngestService()
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)):
+        result = service.ingest_website(db, source.id)
+
+    assert result["pages_near_duplicate"] == 1
+    pages = {p.url: p for p in db.query(WebsitePage).all()}
+    assert pages[f"{BASE_URL}/red-mug"].near_duplicate_of is None
+    assert pages[f"{BASE_URL}/blue-mug"].near_duplicate_of == f"{BASE_URL}/red-mug"
+    assert all(p.simhash for p in pages.values())
+
+    results = RetrievalService.retrieve_website(db, "Red mug")
+    assert [page.url for page, _ in results] == [f"{BASE_URL}/red-mug"]
+
+    # Pages stored before signatures existed get them on the next crawl, even if unchanged
+    db.query(WebsitePage).update({"simhash": None, "near_duplicate_of": None})
+    db.commit()
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=list(site)), \
+         patch.object(service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)):
+        result = service.ingest_website(db, source.id)
+
+    assert result["pages_unchanged"] == 2
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage).all()}
+    assert pages[f"{BASE_URL}/blue-mug"].near_duplicate_of == f"{BASE_URL}/red-mug"
+    assert all(p.simhash for p in pages.values())
+
+
+@pytest.mark.parametrize("canonical_change", ["rewritten", "deleted"])
+def test_near_duplicate_is_released_when_its_canonical_goes_away(db, canonical_change):
+    """
+    Test that a page marked near-duplicate is matched again once its canonical
+    page is rewritten or deleted, instead of staying hidden from retrieval
+    """
+    source = WebsiteSource(base_url=BASE_URL, enabled=True)
+    db.add(source)
+    db.commit()
+    db.refresh(source)
+
+    red, blue, about = f"{BASE_URL}/red-mug", f"{BASE_URL}/blue-mug", f"{BASE_URL}/about"
+    about_html = (
+        "<html><head><title>About</title></head><body><main><h1>About us</h1>"
+        "<p>Persian calligraphy developed over centuries with many distinct scripts such as "
+        "nastaliq and shekasteh used in poetry manuscripts and official court documents.</p>"
+        "</main></body></html>"
+    )
+    site = {red: _product_page("Red mug", "10 dollars"), blue: _product_page("Red mug", "12 dollars"), about: about_html}
+    service = WebsiteIngestService()
+
+    def crawl(urls):
+        with patch.object(service.fetcher, 'crawl_from_base', return_value=urls), \
+             patch.object(service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)):
+            return service.ingest_website(db, source.id)
+
+    crawl([red, blue, about])
+    assert db.query(WebsitePage).filter(WebsitePage.url == blue).one().near_duplicate_of == red
+
+    # The near-duplicate is fetched (unchanged) before its canonical changes
+    if canonical_change == "rewritten":
+        site[red] = about_html.replace("About us", "Red mug").replace("calligraphy", "ceramics")
+    else:
+        site[red] = about_html  # now an exact duplicate of /about: its row is deleted
+    crawl([blue, about, red])
+
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage).all()}
+    assert (red in pages) == (canonical_change == "rewritten")
+    assert pages[blue].near_duplicate_of is None
+    assert blue in [page.url for page, _ in RetrievalService.retrieve_website(db, "Red mug")]
@@ -0,0 +1,79 @@
+"""
+Test the LLM path end to end against the local OpenAI-compatible stub
+"""
+from unittest.mock import patch
+import pytest
+from app.core.config import settings
+from app.models.kb_qa import KBQA
+from app.services.llm import LLMService
+from app.services.llm_client import create_openai_client
+from app.testing.openai_stub import StubConfig, build_answer, start_stub
+
+
+@pytest.fixture
+def stub():
+    config = StubConfig(latency_ms=0, seed=1)
+    server, base_url = start_stub(config)
+    yield config, base_url
+    server.shutdown()
+    server.server_close()
+
+
+def test_chat_answers_from_context_through_stub(client, db, stub):
+    """
+    Test that /chat gets a context-grounded answer and token usage from the stub
+    """
+    config, base_url = stub
+    db.add(KBQA(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است."))
+    db.commit()
+
+    with patch.object(settings, "OPENAI_BASE_URL", base_url):
+        openai_client = create_openai_client()
+    with patch('app.routers.chat.llm_service.client', openai_client):
+        response = client.post("/chat", json={"message": "ساعات کاری شما چیست؟"})
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["refused"] is False
+    assert data["openai_called"] is True
+    assert "9 صبح تا 6 عصر" in data["answer"]
+    assert config.stats["requests"] == 1
+    assert config.stats["completion_tokens"] > 0
+
+
+def test_stub_streams_the_same_answer(stub):
+    """
+    Test that stream=True yields chunks that join to the non-streamed answer, then usage
+    """
+    _, base_url = stub
+    with patch.object(settings, "OPENAI_BASE_URL", base_url):
+        openai_client = create_openai_client()
+    messages = [
+        {"role": "system", "content": "=== Knowledge Base ===\nQ: ساعات کاری؟\nA: ساعات کاری ما از 9 صبح تا 6 عصر است.\n"},
+        {"role": "user", "content": "ساعات کاری شما چیست؟"},
+    ]
+
+    full = openai_client.chat.completions.create(model="stub", messages=messages)
+    chunks = list(openai_client.chat.completions.create(
+        model="stub", messages=messages, stream=True, stream_options={"include_usage": True}
+    ))
+
+    streamed = "".join(chunk.choices[0].delta.content or "" for chunk in chunks if chunk.choices)
+    assert streamed == full.choices[0].message.content
+    assert chunks[-1].usage.completion_tokens == full.usage.completion_tokens
+
+
+def test_stub_answers_go_through_context_validation():
+    """
+    Test that stub answers are checked against the context rather than being
+    accepted as refusals
+    """
+    messages = [
+        {"role": "system", "content": "Q: ساعات کاری؟\nA: ساعات کاری ما از 9 صبح تا 6 عصر است."},
+        {"role": "user", "content": "ساعات کاری شما چیست؟"},
+    ]
+    answer = build_answer(messages, max_tokens=40)
+
+    service = LLMService()
+    assert service._validate_answer(answer, messages[0]["content"]) is True
+    assert service._validate_answer(answer, "Content: قیمت محصول 100 هزار تومان است") is False
@@ -0,0 +1,49 @@
+"""
+Test that the system prompt is a stable prefix across requests
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+from app.schemas.chat import SourceInfo
+from app.services.llm import LLMService
+
+
+def _mock_client():
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "طبق پایگاه دانش"
+    response.usage = SimpleNamespace(
+        prompt_tokens=200, completion_tokens=5, total_tokens=205,
+        prompt_tokens_details=SimpleNamespace(cached_tokens=128)
+    )
+    client = MagicMock()
+    client.chat.completions.create.return_value = response
+    return client
+
+
+def test_static_prefix_is_byte_identical_across_requests():
+    """
+    Test that requests with different context and sources share the same leading
+    system message, and the context follows it in a separate message
+    """
+    service = LLMService()
+    service.client = _mock_client()
+    requests = [
+        ("ساعات کاری شما چیست؟", "Q: ساعات کاری؟\nA: 9 صبح تا 6 عصر",
+         [SourceInfo(type="kb", id=1, title="ساعات کاری")]),
+        ("قیمت محصول چقدر است؟", "Content: قیمت محصول 100 هزار تومان است",
+         [SourceInfo(type="web", url="https://example.com/price", title="قیمت")]),
+    ]
+
+    stats = {}
+    for message, context, sources in requests:
+        service.generate_answer(message, context, sources, stats=stats)
+
+    calls = service.client.chat.completions.create.call_args_list
+    first, second = (c.kwargs["messages"] for c in calls)
+    assert first[0]["content"].encode("utf-8") == second[0]["content"].encode("utf-8")
+    assert first[0]["content"] == LLMService.SYSTEM_PROMPT
+    assert "9 صبح" not in first[0]["content"]
+    assert "9 صبح" in first[1]["content"] and "ID: 1" in first[1]["content"]
+    assert second[1]["content"].startswith("متن:\nContent: قیمت")
+    assert first[-1] == {"role": "user", "content": "ساعات کاری شما چیست؟"}
+    assert stats["cached_tokens"] == 128
@@ -0,0 +1,93 @@
+"""
+Test conversation history: follow-up retrieval, prompt history and bounded memory
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.core.config import settings
+from app.models.kb_qa import KBQA
+from app.services.llm import LLMService
+from app.services.session_history import SessionHistoryStore, session_history
+
+
+def _mock_client(content):
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = content
+    response.usage = SimpleNamespace(prompt_tokens=100, completion_tokens=10, total_tokens=110)
+    client = MagicMock()
+    client.chat.completions.create.return_value = response
+    return client
+
+
+def test_follow_up_uses_previous_turn(client, db):
+    """
+    Test that a follow-up refused on its own is answered by expanding it with the
+    previous question, and the earlier turn is sent to the LLM as history
+    """
+    db.add(KBQA(
+        question="قیمت اشتراک ماهانه سرویس ابری چقدر است؟",
+        answer="قیمت اشتراک ماهانه سرویس ابری 200 هزار تومان است."
+    ))
+    db.commit()
+    mock_client = _mock_client("قیمت اشتراک ماهانه سرویس ابری 200 هزار تومان است.")
+
+    with patch('app.routers.chat.llm_service.client', mock_client):
+        standalone = client.post("/chat", json={"message": "قیمت اشتراک چقدر است؟", "session_id": "other"})
+        first = client.post("/chat", json={"message": "اشتراک ماهانه سرویس ابری چقدر است؟", "session_id": "h1"})
+        follow_up = client.post("/chat", json={"message": "قیمت اشتراک چقدر است؟", "session_id": "h1"})
+
+    assert standalone.json()["refused"] is True
+    assert first.json()["refused"] is False
+    assert follow_up.json()["refused"] is False
+    messages = mock_client.chat.completions.create.call_args_list[-1].kwargs["messages"]
+    assert messages[2] == {"role": "user", "content": "اشتراک ماهانه سرویس ابری چقدر است؟"}
+    assert messages[3]["role"] == "assistant"
+    assert messages[-1] == {"role": "user", "content": "قیمت اشتراک چقدر است؟"}
+
+    # A restarted worker reloads the same turns from chat_logs
+    session_history.clear()
+    turns = session_history.get(db, "h1")
+    assert [user for user, _ in turns] == ["اشتراک ماهانه سرویس ابری چقدر است؟", "قیمت اشتراک چقدر است؟"]
+
+
+def test_store_is_bounded_and_history_fits_budget(db):
+    """
+    Test that the LRU keeps at most SESSION_HISTORY_MAX_SESSIONS sessions and
+    SESSION_HISTORY_TURNS turns, and for_prompt drops the oldest turns over budget
+    """
+    store = SessionHistoryStore()
+    with patch.object(settings, "SESSION_HISTORY_MAX_SESSIONS", 2), \
+         patch.object(settings, "SESSION_HISTORY_TURNS", 2):
+        for session_id in ("a", "b", "c"):
+            store.get(db, session_id)
+            for i in range(3):
+                store.append(session_id, f"question {i}", f"answer {i}")
+
+        assert store.stats() == {"sessions": 2, "turns": 4}
+        assert store.get(db, "c") == [("question 1", "answer 1"), ("question 2", "answer 2")]
+
+    turns = [("old " * 50, "answer " * 50), ("recent question", "recent answer")]
+    assert SessionHistoryStore.for_prompt(turns, budget=20) == [("recent question", "recent answer")]
+
+
+def test_fallback_answers_are_not_kept_as_history(client, db):
+    """
+    Test that error and "not in sources" replies are neither cached as turns nor
+    reloaded from chat_logs, and follow-up answers are cached per conversation
+    """
+    db.add(KBQA(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است."))
+    db.commit()
+    failing = MagicMock()
+    failing.chat.completions.create.side_effect = RuntimeError("boom")
+
+    with patch('app.routers.chat.llm_service.client', failing):
+        client.post("/chat", json={"message": "ساعات کاری شما چیست؟", "session_id": "h2"})
+    with patch('app.routers.chat.llm_service.client', _mock_client("در منابع موجود نیست")):
+        client.post("/chat", json={"message": "ساعات کاری شما چیست؟", "session_id": "h2"})
+
+    assert session_history.get(db, "h2") == []
+    session_history.clear()
+    assert session_history.get(db, "h2") == []
+
+    turns = [("قیمت محصول؟", "قیمت 100 تومان است.")]
+    assert LLMService._cache_key("و رنگ؟", "متن") != LLMService._cache_key("و رنگ؟", "متن", turns)
@@ -0,0 +1,63 @@
+"""
+Test per-chat token recording and the per session/day usage rollup
+"""
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+from app.models.chat_log import ChatLog
+from app.models.chat_usage import ChatUsageDaily
+from app.models.kb_qa import KBQA
+
+
+def _login(client):
+    response = client.post("/auth/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200
+    return response.cookies
+
+
+def _mock_client():
+    response = MagicMock()
+    response.choices = [MagicMock()]
+    response.choices[0].message.content = "ساعات کاری ما از 9 صبح تا 6 عصر است."
+    response.usage = SimpleNamespace(prompt_tokens=300, completion_tokens=20, total_tokens=320)
+    client = MagicMock()
+    client.chat.completions.create.return_value = response
+    return client
+
+
+def test_chat_tokens_are_logged_and_rolled_up(client, db, seed_admin_user):
+    """
+    Test that answered chats store token usage on ChatLog, refusals count without
+    tokens, and /admin/usage reports the per-day and per-session totals
+    """
+    db.add(KBQA(question="ساعات کاری شما چیست؟", answer="ساعات کاری ما از 9 صبح تا 6 عصر است."))
+    db.commit()
+
+    with patch('app.routers.chat.llm_service.client', _mock_client()):
+        for message in ("ساعات کاری شما چیست؟", "ساعات کاری شما چیست؟", "بهترین فیلم سال چیست؟"):
+            response = client.post("/chat", json={"message": message, "session_id": "usage-session"})
+            assert response.status_code == 200
+
+    db.expire_all()
+    answered = db.query(ChatLog).filter(ChatLog.refused == "false").all()
+    assert len(answered) == 2
+    assert all(log.prompt_tokens == 300 and log.completion_tokens == 20 for log in answered)
+    assert answered[0].answer_route == "default_model"
+
+    rollup = db.query(ChatUsageDaily).filter(ChatUsageDaily.session_id == "usage-session").one()
+    assert rollup.requests == 3
+    assert rollup.llm_calls == 2
+    assert rollup.refused == 1
+    assert rollup.prompt_tokens == 600
+    assert rollup.completion_tokens == 40
+
+    cookies = _login(client)
+    summary = client.get("/admin/usage?days=1", cookies=cookies)
+    assert summary.status_code == 200
+    totals = summary.json()["totals"]
+    assert totals["total_tokens"] == 640
+    assert totals["avg_prompt_tokens"] == 300
+    assert totals["estimated_cost_usd"] > 0
+
+    sessions = client.get("/admin/usage/sessions", cookies=cookies).json()["sessions"]
+    assert sessions[0]["session_id"] == "usage-session"
+    assert sessions[0]["requests"] == 3
@@ -93,3 +93,209 @@ def test_crawl_respects_max_pages():
         # Should not exceed max_pages
         assert len(urls) <= max_pages, f"Should not crawl more than {max_pages} pages"
 
+
+
+def _streaming_response(body: bytes, headers: dict, chunk_size: int = 7):
+    """Mock a streamed requests response yielding body in small chunks"""
+    mock_response = MagicMock()
+    mock_response.status_code = 200
+    mock_response.headers = headers
+    mock_response.iter_content.side_effect = lambda **kwargs: iter(
+        [body[i:i + chunk_size] for i in range(0, len(body), chunk_size)]
+    )
+    mock_response.__enter__.return_value = mock_response
+    return mock_response
+
+
+def test_download_page_streams_and_decodes_incrementally():
+    """
+    Test that multibyte characters split across chunks decode correctly
+    """
+    from collections import Counter
+    fetcher = WebsiteFetcherService()
+    html = "<html><body><p>ساعات کاری ما از ۹ صبح تا ۶ عصر است</p></body></html>"
+    body = html.encode("utf-8")
+    stats = Counter()
+
+    with patch.object(fetcher.session, 'get', return_value=_streaming_response(
+        body, {'Content-Type': 'text/html; charset=UTF-8'}
+    )) as mock_get:
+        result = fetcher.download_page("https://example.com/hours", stats=stats)
+
+    assert result == html
+    assert stats["bytes_downloaded"] == len(body)
+    assert mock_get.call_args.kwargs["stream"] is True
+
+
+def test_download_page_sniffs_bom_and_meta_charset():
+    """
+    Test that without a header charset the page is decoded using its BOM or
+    <meta charset>, even when the meta tag is split across chunks
+    """
+    fetcher = WebsiteFetcherService()
+    text = "ساعات کار ما از 9 صبح تا 6 عصر است"
+    pages = {
+        "meta": (
+            b'<html><head><meta http-equiv="Content-Type" content="text/html; charset=windows-1256">'
+            b"</head><body><p>" + text.encode("windows-1256") + b"</p></body></html>"
+        ),
+        "meta5": b'<meta charset="windows-1256"><p>' + text.encode("windows-1256") + b"</p>",
+        "bom": b"\xef\xbb\xbf<p>" + text.encode("utf-8") + b"</p>",
+    }
+
+    results = {}
+    for name, body in pages.items():
+        with patch.object(fetcher.session, 'get', return_value=_streaming_response(body, {'Content-Type': 'text/html'})):
+            results[name] = fetcher.download_page(f"https://example.com/{name}")
+
+    assert text in results["meta"] and text in results["meta5"]
+    assert results["bom"] == f"<p>{text}</p>"
+    assert WebsiteFetcherService._response_encoding("text/html; charset=utf-8", b'<meta charset="windows-1256">') == "utf-8"
+
+
+def test_download_page_skips_oversize_and_non_html():
+    """
+    Test that oversize bodies and non-HTML content types are skipped and counted
+    """
+    from collections import Counter
+    fetcher = WebsiteFetcherService()
+    body = ("<html><body>" + "x" * 200 + "</body></html>").encode("utf-8")
+    stats = Counter()
+
+    with patch('app.services.website_fetcher.settings.CRAWL_MAX_PAGE_BYTES', 100):
+        # Declared too large: rejected from headers without reading the body
+        declared = _streaming_response(body, {'Content-Type': 'text/html', 'Content-Length': str(len(body))})
+        with patch.object(fetcher.session, 'get', return_value=declared):
+            assert fetcher.download_page("https://example.com/big", stats=stats) is None
+        declared.iter_content.assert_not_called()
+
+        # No Content-Length: aborted once the cap is crossed mid-stream
+        undeclared = _streaming_response(body, {'Content-Type': 'text/html'})
+        with patch.object(fetcher.session, 'get', return_value=undeclared):
+            assert fetcher.download_page("https://example.com/big2", stats=stats) is None
+
+    pdf = _streaming_response(b"%PDF-1.4", {'Content-Type': 'application/pdf'})
+    with patch.object(fetcher.session, 'get', return_value=pdf):
+        assert fetcher.download_page("https://example.com/file.pdf", stats=stats) is None
+    pdf.iter_content.assert_not_called()
+
+    assert stats["skipped_oversize"] == 2
+    assert stats["skipped_non_html"] == 1
+
+
+def test_robots_txt_disallow_and_crawl_delay_are_cached_per_host():
+    """
+    Test that robots.txt is fetched once per host, disallowed paths are skipped and
+    Crawl-delay paces requests to that host only
+    """
+    from collections import Counter
+    fetcher = WebsiteFetcherService()
+    robots_txt = "User-agent: ChatbotCrawler\nDisallow: /private/\nCrawl-delay: 2\n\nUser-agent: *\nDisallow: /\n"
+    page = "<html><body><p>Public page</p></body></html>".encode("utf-8")
+    stats = Counter()
+
+    def get(url, **kwargs):
+        if url.endswith("/robots.txt"):
+            response = MagicMock()
+            response.status_code = 200 if "example.com" in url else 404
+            response.text = robots_txt
+            return response
+        return _streaming_response(page, {'Content-Type': 'text/html'})
+
+    with patch('app.services.robots.settings.CRAWL_RESPECT_ROBOTS_TXT', True), \
+         patch('app.services.robots.settings.CRAWL_RATE_LIMIT_DELAY', 0.5), \
+         patch('app.services.robots.time.sleep') as mock_sleep, \
+         patch.object(fetcher.session, 'get', side_effect=get) as mock_get:
+        assert fetcher.download_page("https://example.com/private/a", stats=stats) is None
+        assert fetcher.download_page("https://example.com/public", stats=stats) is not None
+        assert fetcher.download_page("https://example.com/public2", stats=stats) is not None
+        # No robots.txt (404): allowed, default delay
+        assert fetcher.download_page("https://other.org/page", stats=stats) is not None
+        assert fetcher.robots.crawl_delay("https://other.org/x") == 0.5
+
+    requested = [call.args[0] for call in mock_get.call_args_list]
+    assert requested.count("https://example.com/robots.txt") == 1
+    assert "https://example.com/private/a" not in requested
+    assert stats["skipped_robots"] == 1
+    # Only the second request to example.com waited, for about its Crawl-delay
+    assert mock_sleep.call_count == 1
+    assert 1.5 < mock_sleep.call_args.args[0] <= 2
+
+
+def _sitemap(tag, locs):
+    entry = "url" if tag == "urlset" else "sitemap"
+    body = "".join(f"<{entry}><loc>{loc}</loc></{entry}>" for loc in locs)
+    return f'<?xml version="1.0" encoding="UTF-8"?><{tag} xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{body}</{tag}>'.encode("utf-8")
+
+
+def test_sitemap_index_fetches_nested_gzip_sitemaps_and_stops_at_limit():
+    """
+    Test that nested (and gzipped) sitemaps are parsed incrementally and fetching
+    stops once MAX_CRAWL_PAGES URLs are collected
+    """
+    import gzip
+    fetcher = WebsiteFetcherService()
+    base = "https://example.com"
+    big_sitemap = _sitemap("urlset", [f"{base}/big{i}" for i in range(1000)])
+    chunks_read = []
+    bodies = {
+        f"{base}/sitemap.xml": _sitemap("sitemapindex", [
+            "https://other.com/sitemap.xml",
+            f"{base}/a.xml.gz",
+            f"{base}/big.xml",
+            f"{base}/never.xml",
+        ]),
+        f"{base}/a.xml.gz": gzip.compress(_sitemap("urlset", [f"{base}/a1", "https://other.com/x", f"{base}/a2"])),
+        f"{base}/big.xml": big_sitemap,
+        f"{base}/never.xml": _sitemap("urlset", [f"{base}/never"]),
+    }
+
+    def get(url, **kwargs):
+        if url not in bodies:
+            return _streaming_response(b"", {'Content-Type': 'text/html'})
+        response = _streaming_response(bodies[url], {'Content-Type': 'application/xml'})
+        if url.endswith("big.xml"):
+            chunks = [big_sitemap[i:i + 7] for i in range(0, len(big_sitemap), 7)]
+            response.iter_content.side_effect = lambda chunk_size: (chunks_read.append(c) or c for c in chunks)
+        return response
+
+    with patch('app.services.website_fetcher.settings.MAX_CRAWL_PAGES', 10), \
+         patch.object(fetcher.session, 'get', side_effect=get) as mock_get:
+        urls = fetcher.get_sitemap_urls(base)
+
+    assert urls == [f"{base}/a1", f"{base}/a2"] + [f"{base}/big{i}" for i in range(8)]
+    requested = [call.args[0] for call in mock_get.call_args_list]
+    assert "https://other.com/sitemap.xml" not in requested
+    assert f"{base}/sitemap_index.xml" not in requested
+    # The big sitemap was abandoned early instead of downloaded in full
+    assert len(chunks_read) < len(big_sitemap) // 7 / 10
+
+
+def test_sitemap_fetches_wait_for_crawl_delay_and_cap_gunzipped_size():
+    """
+    Test that every sitemap request waits for the host's crawl slot and a gzip
+    sitemap stops at CRAWL_SITEMAP_MAX_BYTES of decompressed XML
+    """
+    import gzip
+    fetcher = WebsiteFetcherService()
+    base = "https://example.com"
+    bomb = gzip.compress(_sitemap("urlset", [f"{base}/p{i}" for i in range(3)]) + b" " * 5_000_000)
+    bodies = {
+        f"{base}/sitemap.xml": _sitemap("sitemapindex", [f"{base}/a.xml", f"{base}/b.xml.gz"]),
+        f"{base}/a.xml": _sitemap("urlset", [f"{base}/a1"]),
+        f"{base}/b.xml.gz": bomb,
+    }
+
+    def get(url, **kwargs):
+        return _streaming_response(bodies.get(url, b""), {'Content-Type': 'application/xml'}, chunk_size=1024)
+
+    with patch('app.services.website_fetcher.settings.CRAWL_SITEMAP_MAX_BYTES', 4096), \
+         patch.object(fetcher.robots, 'wait') as mock_wait, \
+         patch.object(fetcher.session, 'get', side_effect=get) as mock_get:
+        urls = fetcher.get_sitemap_urls(base)
+        gunzipped = list(WebsiteFetcherService._sitemap_chunks(get(f"{base}/b.xml.gz"), f"{base}/b.xml.gz"))
+
+    assert urls == [f"{base}/a1"] + [f"{base}/p{i}" for i in range(3)]
+    waited = sorted(call.args[0] for call in mock_wait.call_args_list)
+    assert waited == sorted(call.args[0] for call in mock_get.call_args_list)
+    assert sum(len(chunk) for chunk in gunzipped) == 4096
@@ -0,0 +1,189 @@
+"""
+Test website ingestion stores fetched pages
+"""
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+from app.models.website_source import WebsiteSource
+from app.models.website_page import WebsitePage
+from app.services.website_ingest import WebsiteIngestService
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures" / "html"
+BASE_URL = "https://example.com"
+
+
+def _fixture_site():
+    """Map example.com URLs to saved fixture pages"""
+    return {
+        f"{BASE_URL}/{path.stem}": path.read_text(encoding="utf-8")
+        for path in sorted(FIXTURES_DIR.glob("*.html"))
+    }
+
+
+def _create_source(db):
+    source = WebsiteSource(base_url=BASE_URL, enabled=True)
+    db.add(source)
+    db.commit()
+    db.refresh(source)
+    return source
+
+
+def _run_ingest(db, source, site, parse_workers):
+    service = WebsiteIngestService()
+    urls = list(site.keys()) + [f"{BASE_URL}/missing", "https://other.com/page"]
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=urls), \
+         patch.object(service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)), \
+         patch('app.services.website_ingest.settings.INGEST_PARSE_WORKERS', parse_workers), \
+         patch('app.services.website_ingest.settings.INGEST_MAX_IN_FLIGHT', 2):
+        return service.ingest_website(db, source.id)
+
+
+@pytest.mark.parametrize("parse_workers", [0, 2])
+def test_ingest_stores_pages_inline_and_with_process_pool(db, parse_workers):
+    """
+    Test that inline and process-pool parsing store the same pages
+    """
+    site = _fixture_site()
+    source = _create_source(db)
+
+    result = _run_ingest(db, source, site, parse_workers)
+
+    assert result["success"] is True
+    assert result["pages_count"] == len(site)
+
+    pages = {p.url: p for p in db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id)}
+    assert set(pages) == set(site)
+    assert pages[f"{BASE_URL}/div_content_id"].title == "Returns"
+    assert all(p.content_hash for p in pages.values())
+
+    db.refresh(source)
+    assert source.crawl_status == "done"
+
+
+def test_recrawl_updates_changed_pages_in_batches(db):
+    """
+    Test that a recrawl upserts changed pages, skips unchanged ones and writes in batches
+    """
+    site = _fixture_site()
+    source = _create_source(db)
+
+    with patch('app.services.website_ingest.settings.INGEST_BATCH_SIZE', 2):
+        first = _run_ingest(db, source, site, parse_workers=0)
+        changed_url = f"{BASE_URL}/body_fallback"
+        site[changed_url] = site[changed_url].replace("forty", "fifty")
+        second = _run_ingest(db, source, site, parse_workers=0)
+
+    assert first["pages_count"] == len(site)
+    assert second["pages_count"] == 1
+    assert second["pages_unchanged"] == len(site) - 1
+
+    db.expire_all()
+    pages = db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id).all()
+    assert len(pages) == len(site)
+    changed = next(p for p in pages if p.url == changed_url)
+    assert "fifty engineers" in changed.content_text
+
+    db.refresh(source)
+    assert source.crawl_status == "done"
+
+
+def test_identical_content_under_multiple_urls_is_stored_once(db):
+    """
+    Test that duplicate content across URLs becomes one canonical page with aliases
+    """
+    site = _fixture_site()
+    canonical_url = f"{BASE_URL}/div_content_id"
+    site[f"{canonical_url}?print=1"] = site[canonical_url]
+    site[f"{canonical_url}?utm_source=mail"] = site[canonical_url]
+    source = _create_source(db)
+
+    result = _run_ingest(db, source, site, parse_workers=0)
+
+    assert result["pages_deduplicated"] == 2
+    assert result["dedupe_bytes_saved"] > 0
+
+    pages = {p.url: p for p in db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id)}
+    assert len(pages) == len(site) - 2
+    assert sorted(pages[canonical_url].alias_urls) == [
+        f"{canonical_url}?print=1",
+        f"{canonical_url}?utm_source=mail",
+    ]
+
+    # Recrawl after one alias stops duplicating: it becomes its own page again
+    site[f"{canonical_url}?print=1"] = site[canonical_url].replace("14 days", "30 days")
+    _run_ingest(db, source, site, parse_workers=0)
+
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id)}
+    assert f"{canonical_url}?print=1" in pages
+    assert pages[canonical_url].alias_urls == [f"{canonical_url}?utm_source=mail"]
+
+
+def test_interrupted_crawl_keeps_aliases_of_deleted_duplicates(db):
+    """
+    Test that a duplicate row deleted mid-crawl has its alias written in the same
+    batch, so an interruption before the end of the crawl does not lose it
+    """
+    site = _fixture_site()
+    canonical_url = f"{BASE_URL}/div_content_id"
+    print_url = f"{canonical_url}?print=1"
+    site[print_url] = site[canonical_url].replace("14 days", "30 days")
+    source = _create_source(db)
+    _run_ingest(db, source, site, parse_workers=0)
+
+    # The print page now duplicates the canonical one; the crawl dies afterwards
+    site[print_url] = site[canonical_url]
+    urls = [canonical_url, print_url] + [url for url in site if url not in (canonical_url, print_url)]
+
+    def download(url, **kwargs):
+        if url == urls[-1]:
+            raise RuntimeError("worker killed")
+        return site.get(url)
+
+    service = WebsiteIngestService()
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=urls), \
+         patch.object(service.fetcher, 'download_page', side_effect=download), \
+         patch('app.services.website_ingest.settings.INGEST_PARSE_WORKERS', 0), \
+         patch('app.services.website_ingest.settings.INGEST_BATCH_SIZE', 1):
+        result = service.ingest_website(db, source.id)
+
+    assert result["success"] is False
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id)}
+    assert print_url not in pages
+    assert pages[canonical_url].alias_urls == [print_url]
+
+
+@pytest.mark.parametrize("batch_size", [1, 50])
+def test_alias_fetched_before_its_changed_canonical_is_stored_as_a_page(db, batch_size):
+    """
+    Test that a page matching the canonical's stored content, fetched before the
+    canonical whose content has since changed, is kept as its own page
+    """
+    site = _fixture_site()
+    canonical_url = f"{BASE_URL}/div_content_id"
+    print_url = f"{canonical_url}?print=1"
+    old_content = site[canonical_url]
+    site[print_url] = old_content.replace("14 days", "30 days")
+    source = _create_source(db)
+    _run_ingest(db, source, site, parse_workers=0)
+
+    # The print page now matches the stored canonical, which has moved on
+    site[print_url] = old_content
+    site[canonical_url] = old_content.replace("14 days", "60 days")
+    urls = [print_url, canonical_url] + [url for url in site if url not in (canonical_url, print_url)]
+
+    service = WebsiteIngestService()
+    with patch.object(service.fetcher, 'crawl_from_base', return_value=urls), \
+         patch.object(service.fetcher, 'download_page', side_effect=lambda url, **kwargs: site.get(url)), \
+         patch('app.services.website_ingest.settings.INGEST_PARSE_WORKERS', 0), \
+         patch('app.services.website_ingest.settings.INGEST_BATCH_SIZE', batch_size):
+        result = service.ingest_website(db, source.id)
+
+    assert result["success"] is True
+    assert result["pages_deduplicated"] == 0
+    db.expire_all()
+    pages = {p.url: p for p in db.query(WebsitePage).filter(WebsitePage.website_source_id == source.id)}
+    assert "14 days" in pages[print_url].content_text
+    assert "60 days" in pages[canonical_url].content_text
+    assert not pages[canonical_url].alias_urls
@@ -13,6 +13,31 @@ module.exports = {
       watch: false,
       max_memory_restart: "1G",
     },
+    {
+      name: "chatbot-crawl-worker",
+      cwd: "./apps/backend",
+      script: ".venv/bin/python",
+      args: "-m app.services.crawl_worker",
+      exec_mode: "fork",
+      env: {
+        ENV: "production",
+      },
+      autorestart: true,
+      watch: false,
+      max_memory_restart: "1G",
+    },
+    {
+      name: "chatbot-crawl-scheduler",
+      cwd: "./apps/backend",
+      script: ".venv/bin/python",
+      args: "-m app.services.crawl_scheduler",
+      exec_mode: "fork",
+      env: {
+        ENV: "production",
+      },
+      autorestart: true,
+      watch: false,
+    },
     {
       name: "chatbot-frontend",
       cwd: "./apps/frontend",